@@ -0,0 +1,267 @@
+"""ASGI version of the analysis API.
+
+Uploads are parsed while they stream in, without a temporary file, and the
+analysis runs in a process pool so large chats do not block other requests.
+
+Run with: uvicorn asgi:app
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from whatsapp_analyzer import ChatAnalysisService, __version__
+from whatsapp_analyzer.exporters.json_exporter import dumps
+from whatsapp_analyzer.models import MessageStore
+from whatsapp_analyzer.services import IncrementalChatParser
+from whatsapp_analyzer.services.analyzers import AnalyzerRegistry
+from whatsapp_analyzer.services.instrumentation import Instrumentation
+from whatsapp_analyzer.services.metrics import AnalysisMetrics
+from whatsapp_analyzer.services.result_cache import ResultCache
+from whatsapp_analyzer.services.zip_export import ChatTextReader
+
+# Example heart emojis
+heart_emojis = {
+    '❤️', '🧡', '💛', '💚', '💙', '💜', '🖤', '🤍', '🤎', '💔', '❤️‍🔥', '❤️‍🩹', '♥️', '💗'
+}
+
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', os.cpu_count() or 1))
+PARSE_BATCH_BYTES = 256 * 1024
+# Timings of every analysis, aggregated at /metrics. Tracing memory makes analyses noticeably slower.
+ANALYSIS_METRICS = os.environ.get('ANALYSIS_METRICS', '1') == '1'
+ANALYSIS_TRACE_MEMORY = os.environ.get('ANALYSIS_TRACE_MEMORY', '0') == '1'
+
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    cache_dir=os.environ.get('RESULT_CACHE_DIR'),
+    ttl_seconds=float(os.environ.get('RESULT_CACHE_TTL_SECONDS', 24 * 60 * 60))
+)
+registry = AnalyzerRegistry()
+analysis_metrics = AnalysisMetrics()
+
+# Created on first use so importing the module does not start processes
+_analysis_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _analyze_store(messages: MessageStore, heart_emojis, analyzer_names: List[str],
+                   instrumentation: Optional[Instrumentation] = None) -> Dict[str, Any]:
+    """Run the analysis in a worker process."""
+    return ChatAnalysisService(None, heart_emojis, analyzers=analyzer_names,
+                               instrumentation=instrumentation).analyze_messages(messages)
+
+
+def _parse(parser: IncrementalChatParser, data: bytes, instrumentation: Optional[Instrumentation]):
+    """Feed part of the upload to the parser, timing it in the parsing thread."""
+    if instrumentation is None:
+        return parser.feed(data)
+    with instrumentation.measure('parse'):
+        parser.feed(data)
+
+
+def _pools():
+    global _analysis_pool, _parse_pool
+    if _analysis_pool is None:
+        _analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+        _parse_pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    return _analysis_pool, _parse_pool
+
+
+class UploadFieldReader:
+    """Pulls the data of one field out of a streamed multipart/form-data body."""
+
+    def __init__(self, boundary: bytes, field_name: bytes = b'file'):
+        self.field_name = field_name
+        self.found = False
+        self.filename = None
+        self._chunks: List[bytes] = []
+        self._in_field = False
+        self._header_field = b''
+        self._header_value = b''
+        self._parser = MultipartParser(boundary, {
+            'on_part_begin': self._on_part_begin,
+            'on_part_data': self._on_part_data,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+        })
+
+    def write(self, body: bytes) -> List[bytes]:
+        """Parse part of the request body and return the field data it contained."""
+        self._parser.write(body)
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def finalize(self):
+        self._parser.finalize()
+
+    def _on_part_begin(self):
+        self._in_field = False
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_field:
+            self._chunks.append(data[start:end])
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_field.lower() == b'content-disposition':
+            _, options = parse_options_header(self._header_value)
+            if options.get(b'name') == self.field_name and not self.found:
+                self.found = True
+                self._in_field = True
+                self.filename = options.get(b'filename', b'').decode('utf-8', 'replace')
+        self._header_field = b''
+        self._header_value = b''
+
+
+async def _send_json(send, status: int, payload: Any = None, body: bytes = None, headers=()):
+    if body is None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                    *headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def analyze_chat(scope, receive, send):
+    """
+    Endpoint to analyze a WhatsApp chat file.
+    Accepts a chat file upload and returns the analysis results.
+    """
+    content_type = dict(scope['headers']).get(b'content-type', b'')
+    mimetype, options = parse_options_header(content_type)
+    if mimetype != b'multipart/form-data' or b'boundary' not in options:
+        return await _send_json(send, 400, {"error": "No file provided"})
+
+    # Analyzers selected with ?analyzers=emoji,word
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    selection = [name.strip() for value in query.get('analyzers', []) for name in value.split(',') if name.strip()]
+    try:
+        analyzer_names = registry.resolve(selection or None)
+    except ValueError as e:
+        return await _send_json(send, 400, {"error": str(e)})
+
+    analysis_pool, parse_pool = _pools()
+    loop = asyncio.get_running_loop()
+    reader = UploadFieldReader(options[b'boundary'])
+    # The chat of a zip export is decompressed as it arrives, and its media are skipped
+    chat_reader = ChatTextReader()
+    parser = IncrementalChatParser(fields=registry.required_fields(analyzer_names))
+    instrumentation = Instrumentation(ANALYSIS_TRACE_MEMORY) if ANALYSIS_METRICS else None
+    content_hash = hashlib.sha256()
+    batch, batch_size = [], 0
+
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        more_body = message.get('more_body', False)
+        try:
+            chunks = [data for chunk in reader.write(message.get('body', b'')) for data in chat_reader.write(chunk)]
+            if not more_body:
+                chunks += chat_reader.finalize()
+        except ValueError as e:
+            return await _send_json(send, 400, {"error": str(e)})
+        for chunk in chunks:
+            content_hash.update(chunk)
+            batch.append(chunk)
+            batch_size += len(chunk)
+        # Parse in batches off the event loop
+        if batch_size >= PARSE_BATCH_BYTES or (not more_body and batch):
+            await loop.run_in_executor(parse_pool, _parse, parser, b''.join(batch), instrumentation)
+            batch, batch_size = [], 0
+    reader.finalize()
+
+    if not reader.found:
+        return await _send_json(send, 400, {"error": "No file provided"})
+    if reader.filename == '':
+        return await _send_json(send, 400, {"error": "No file selected"})
+
+    # Identical uploads with the same settings are answered from the cache
+    cache_key = ResultCache.make_key(content_hash.hexdigest(), analyzer_names, heart_emojis, __version__)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return await _send_json(send, 200, body=cached, headers=[(b'x-cache', b'HIT')])
+
+    try:
+        messages = parser.close()
+        if instrumentation is not None:
+            instrumentation.add('parse', 0.0, 0.0, len(messages))
+        results = await loop.run_in_executor(analysis_pool, _analyze_store, messages, heart_emojis,
+                                             analyzer_names, instrumentation)
+    except Exception as e:
+        return await _send_json(send, 500, {"error": f"Error analyzing chat file: {str(e)}"})
+
+    # Measurements are not cached, as they only describe this analysis
+    meta = results.pop("_meta", None)
+    if meta is not None:
+        analysis_metrics.observe(meta)
+    body = dumps(results)
+    result_cache.put(cache_key, body)
+    if meta is not None and query.get('meta', [''])[0] in ('1', 'true'):
+        body = dumps({**results, "_meta": meta})
+    await _send_json(send, 200, body=body, headers=[(b'x-cache', b'MISS')])
+
+
+async def _lifespan(receive, send):
+    global _analysis_pool, _parse_pool
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            result_cache.purge_expired()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _analysis_pool is not None:
+                _analysis_pool.shutdown()
+                _parse_pool.shutdown()
+                _analysis_pool = _parse_pool = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    path, method = scope['path'], scope['method']
+    if path == '/analyze' and method == 'POST':
+        await analyze_chat(scope, receive, send)
+    elif path == '/hello' and method == 'GET':
+        await _send_json(send, 200, {"message": "Hello, World!"})
+    elif path == '/cache/stats' and method == 'GET':
+        await _send_json(send, 200, result_cache.stats())
+    elif path == '/metrics' and method == 'GET':
+        body = analysis_metrics.render().encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', AnalysisMetrics.CONTENT_TYPE.encode()),
+                        (b'content-length', str(len(body)).encode())]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+    elif path == '/' and method == 'GET':
+        await _send_json(send, 200, {
+            "message": "WhatsApp Chat Analyzer API",
+            "usage": "POST /analyze with a chat file to analyze WhatsApp conversations"
+        })
+    else:
+        await _send_json(send, 404, {"error": "Not found"})
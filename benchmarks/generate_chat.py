@@ -0,0 +1,190 @@
+"""Generator for synthetic WhatsApp chat exports.
+
+The exports look like real ones: a few users write most of the messages,
+conversations come in bursts of quick replies separated by quiet hours and
+nights, and messages contain emoji (including skin tones, flags and ZWJ
+sequences), laughter, call log lines, media placeholders and multi-line text.
+Output is deterministic for a given seed.
+
+Usage: python -m benchmarks.generate_chat OUTPUT MESSAGES [options]
+"""
+
+import argparse
+import random
+from datetime import date, timedelta
+from typing import Iterator, List
+
+ZWJ = '\N{ZERO WIDTH JOINER}'
+VS16 = '\N{VARIATION SELECTOR-16}'
+NARROW_SPACE = '\N{NARROW NO-BREAK SPACE}'
+
+TIME_FORMATS = ('ampm', '24h')
+
+FIRST_NAMES = [
+    'Anna', 'Ben', 'Carla', 'David', 'Elif', 'Fatima', 'Gabriel', 'Hana', 'Igor', 'Julia', 'Kofi',
+    'Léa', 'Mateo', 'Nour', 'Olga', 'Priya', 'Quentin', 'Rosa', 'Søren', 'Tomás', 'Uma', 'Victor',
+    'Wei', 'Xenia', 'Yusuf', 'Zoë',
+]
+
+WORDS = (
+    'the a to and i you it is that of in for on was we me my so but what just not this be have '
+    'are with at do can get if no ok okay yes yeah go going now when will all up out know like '
+    'time see one good today tomorrow tonight home work later back think there they here how '
+    'why dinner lunch coffee call meet weekend movie train late sorry thanks thank love great '
+    'nice awesome sad bad happy tired sure maybe really well still again soon already right'
+).split()
+FOREIGN_WORDS = ['gracias', 'merci', 'danke', 'bitte', 'hoşça', 'İstanbul', '東京', 'приве́т', 'ça', 'niño']
+LAUGHTER = ['haha', 'hahaha', 'hahahaha', 'lol', 'lmao', 'jajaja', 'xD', '😂', '🤣', '😆']
+
+EMOJIS = ['😂', '😊', '😍', '🥰', '😢', '😭', '😡', '😕', '👍', '👎', '🙏', '🎉', '🔥', '💯', '😘', '🤔',
+          '😅', '🙈', '💪', '✨', '☀' + VS16, '✌' + VS16]
+HEARTS = ['❤' + VS16, '🧡', '💛', '💚', '💙', '💜', '🖤', '🤍', '💔', '💗', '♥' + VS16,
+          '❤' + VS16 + ZWJ + '🔥', '❤' + VS16 + ZWJ + '🩹']
+SEQUENCES = ['👍🏽', '👋🏻', '🙏🏾', '👨' + ZWJ + '👩' + ZWJ + '👧', '🏳' + VS16 + ZWJ + '🌈',
+             '🧑🏽' + ZWJ + '💻', '🇵🇰', '🇧🇷', '🇩🇪', '1' + VS16 + '\N{COMBINING ENCLOSING KEYCAP}']
+
+CALLS = ['Voice call, {min} min {sec} sec', 'Video call, {min} min', 'Video call, 1 hr {min} min',
+         'Missed voice call', 'Missed video call']
+MEDIA = ['<Media omitted>', 'image omitted', 'sticker omitted', 'This message was deleted']
+
+
+class ChatGenerator:
+    """Generates the lines of a synthetic chat export."""
+
+    def __init__(self, users: int = 8, time_format: str = 'ampm', emoji_density: float = 0.25,
+                 laughter_density: float = 0.1, call_density: float = 0.01, burst_probability: float = 0.7,
+                 multiline_density: float = 0.02, start: date = date(2021, 1, 1), seed: int = 0):
+        if time_format not in TIME_FORMATS:
+            raise ValueError(f"Unknown time format '{time_format}', expected one of: {', '.join(TIME_FORMATS)}")
+        if users < 1:
+            raise ValueError("users must be at least 1")
+        self.users = self._user_names(users)
+        self.time_format = time_format
+        self.emoji_density = emoji_density
+        self.laughter_density = laughter_density
+        self.call_density = call_density
+        self.burst_probability = burst_probability
+        self.multiline_density = multiline_density
+        self.start = start
+        self.seed = seed
+        # A few users write most of the messages
+        self._user_weights = [1 / rank for rank in range(1, users + 1)]
+
+    @staticmethod
+    def _user_names(count: int) -> List[str]:
+        names = []
+        for i in range(count):
+            name = FIRST_NAMES[i % len(FIRST_NAMES)]
+            names.append(name if i < len(FIRST_NAMES) else f'{name} {i // len(FIRST_NAMES) + 1}')
+        return names
+
+    def lines(self, messages: int) -> Iterator[str]:
+        """Yield the lines of an export with the given number of messages."""
+        rng = random.Random(self.seed)
+        day = self.start
+        seconds = 8 * 3600
+        date_text = self._format_date(day)
+        speakers = self.users[:2]
+
+        yield self._format_line(date_text, seconds, self.users[0],
+                                'Messages and calls are end-to-end encrypted. '
+                                'No one outside of this chat, not even WhatsApp, can read or listen to them.')
+
+        for _ in range(messages):
+            # Quick replies within a conversation, or a pause before the next one
+            if rng.random() < self.burst_probability:
+                seconds += rng.randint(2, 90)
+            else:
+                seconds += int(rng.expovariate(1 / 3600)) + 60
+                speakers = rng.choices(self.users, self._user_weights, k=min(len(self.users), rng.randint(2, 4)))
+                # Nobody writes between 1 and 7 in the morning
+                if 3600 <= seconds % 86400 < 7 * 3600:
+                    seconds += 6 * 3600
+            if seconds >= 86400:
+                day += timedelta(days=seconds // 86400)
+                seconds %= 86400
+                date_text = self._format_date(day)
+
+            sender = rng.choice(speakers)
+            text = self._message(rng)
+            # Multi-line messages continue on lines without a header
+            if rng.random() < self.multiline_density:
+                text += '\n' + self._text(rng)
+            yield self._format_line(date_text, seconds, sender, text)
+
+    def write(self, path: str, messages: int) -> str:
+        """Write an export with the given number of messages to path."""
+        with open(path, 'w', encoding='utf-8') as file:
+            batch = []
+            for line in self.lines(messages):
+                batch.append(line)
+                if len(batch) >= 10000:
+                    file.write('\n'.join(batch) + '\n')
+                    batch = []
+            if batch:
+                file.write('\n'.join(batch) + '\n')
+        return path
+
+    def _message(self, rng: random.Random) -> str:
+        kind = rng.random()
+        if kind < self.call_density:
+            return rng.choice(CALLS).format(min=rng.randint(1, 59), sec=rng.randint(1, 59))
+        if kind < self.call_density + 0.03:
+            return rng.choice(MEDIA)
+
+        text = self._text(rng)
+        if rng.random() < self.laughter_density:
+            text = f'{rng.choice(LAUGHTER)} {text}' if rng.random() < 0.5 else f'{text} {rng.choice(LAUGHTER)}'
+        if rng.random() < self.emoji_density:
+            emojis = rng.choices((EMOJIS, HEARTS, SEQUENCES), (6, 2, 1))[0]
+            text += ' ' + ''.join(rng.choice(emojis) for _ in range(rng.randint(1, 3)))
+        return text
+
+    @staticmethod
+    def _text(rng: random.Random) -> str:
+        words = rng.choices(WORDS, k=rng.randint(1, 14))
+        if rng.random() < 0.05:
+            words.append(rng.choice(FOREIGN_WORDS))
+        return ' '.join(words)
+
+    @staticmethod
+    def _format_date(day: date) -> str:
+        return f'{day.day:02d}/{day.month:02d}/{day.year}'
+
+    def _format_line(self, date_text: str, seconds: int, sender: str, text: str) -> str:
+        hour, rest = divmod(seconds, 3600)
+        minute, second = divmod(rest, 60)
+        if self.time_format == 'ampm':
+            time_text = f'{(hour - 1) % 12 + 1}:{minute:02d}:{second:02d}{NARROW_SPACE}{"PM" if hour >= 12 else "AM"}'
+        else:
+            time_text = f'{hour:02d}:{minute:02d}:{second:02d}'
+        return f'[{date_text}, {time_text}] {sender}: {text}'
+
+
+def generate_chat(path: str, messages: int, **options) -> str:
+    """Write a synthetic export to path; options are those of ChatGenerator."""
+    return ChatGenerator(**options).write(path, messages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic WhatsApp chat export.")
+    parser.add_argument('output', help="File to write the export to")
+    parser.add_argument('messages', type=int, help="Number of messages")
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--time-format', choices=TIME_FORMATS, default='ampm',
+                        help="12-hour times with a narrow no-break space before AM/PM, or 24-hour times")
+    parser.add_argument('--emoji-density', type=float, default=0.25, help="Share of messages with emoji")
+    parser.add_argument('--laughter-density', type=float, default=0.1, help="Share of messages with laughter")
+    parser.add_argument('--call-density', type=float, default=0.01, help="Share of call log lines")
+    parser.add_argument('--burst-probability', type=float, default=0.7,
+                        help="Chance that a message is a quick reply within a conversation")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate_chat(args.output, args.messages, users=args.users, time_format=args.time_format,
+                  emoji_density=args.emoji_density, laughter_density=args.laughter_density,
+                  call_density=args.call_density, burst_probability=args.burst_probability, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
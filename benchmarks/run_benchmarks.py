@@ -0,0 +1,225 @@
+"""Benchmarks for parsing and analysis.
+
+Measures parse throughput, every registered analyzer on its own and the whole
+``ChatAnalysisService.analyze`` on synthetic exports of several sizes. The
+exports are generated on first use and kept in ``benchmarks/data``.
+
+Results can be saved as a baseline; later runs are compared against it and a
+benchmark that became slower than the baseline by more than the threshold is
+reported as a regression, which makes the run exit with status 1.
+
+Usage: python -m benchmarks.run_benchmarks [--sizes 10k,1m,10m] [--save-baseline]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from whatsapp_analyzer import ChatAnalysisService
+from whatsapp_analyzer.services import ChatParser, MmapChatParser
+from whatsapp_analyzer.services.analyzers import AnalyzerRegistry
+from .generate_chat import TIME_FORMATS, generate_chat
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_SIZES = ('10k', '1m', '10m')
+DEFAULT_THRESHOLD = 0.10
+
+# Example heart emojis
+heart_emojis = {
+    '❤️', '🧡', '💛', '💚', '💙', '💜', '🖤', '🤍', '🤎', '💔', '❤️‍🔥', '❤️‍🩹', '♥️', '💗'
+}
+
+Results = Dict[str, Dict[str, Dict[str, float]]]
+
+
+def parse_size(size: str) -> int:
+    """Turn a size such as ``10k`` or ``1m`` into a number of messages."""
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    size = size.strip().lower()
+    if size and size[-1] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+    return int(size)
+
+
+def chat_file(size: str, time_format: str = 'ampm', data_dir: str = DATA_DIR) -> str:
+    """Path of the synthetic export for a size, generating it if needed."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'chat_{size}_{time_format}.txt')
+    if not os.path.exists(path):
+        print(f"Generating {path}...", file=sys.stderr)
+        generate_chat(path + '.tmp', parse_size(size), time_format=time_format)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def measure(function: Callable[[], Any], repeat: int = 1) -> Tuple[float, Any]:
+    """Best wall-clock time of several calls, and the result of the last one."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _benchmarks(path: str, only: Optional[str] = None) -> Iterator[Tuple[str, Callable[[], Any]]]:
+    """Yield the named benchmarks for one export, in the order they run."""
+    def selected(name: str) -> bool:
+        return not only or only in name
+
+    if selected('parse.ChatParser'):
+        yield 'parse.ChatParser', lambda: ChatParser(path).parse()
+    if selected('parse.MmapChatParser'):
+        yield 'parse.MmapChatParser', lambda: MmapChatParser(path).parse()
+
+    # The analyzers share one parse of the export, which is dropped again
+    # before the end-to-end runs
+    messages = None
+    for name in AnalyzerRegistry().get_available_analyzers():
+        if selected(f'analyzer.{name}'):
+            if messages is None:
+                messages = MmapChatParser(path).parse()
+            yield f'analyzer.{name}', partial(_analyze_messages, messages, name)
+    messages = None
+
+    if selected('analyze'):
+        yield 'analyze', lambda: ChatAnalysisService(path, heart_emojis).analyze()
+    if selected('analyze.use_mmap'):
+        yield 'analyze.use_mmap', lambda: ChatAnalysisService(path, heart_emojis, use_mmap=True).analyze()
+
+
+def _analyze_messages(messages, analyzer: str) -> Dict[str, Any]:
+    return ChatAnalysisService(None, heart_emojis, analyzers=[analyzer]).analyze_messages(messages)
+
+
+def run_benchmarks(sizes: Sequence[str] = DEFAULT_SIZES, repeat: int = 1, time_format: str = 'ampm',
+                   only: Optional[str] = None, data_dir: str = DATA_DIR) -> Results:
+    """Run all benchmarks, or those whose name contains ``only``, for each size."""
+    results: Results = {}
+    for size in sizes:
+        path = chat_file(size, time_format, data_dir)
+        message_count = parse_size(size)
+        megabytes = os.path.getsize(path) / 1024 / 1024
+        results[size] = {}
+
+        for name, function in _benchmarks(path, only):
+            seconds, _ = measure(function, repeat)
+            results[size][name] = {
+                'seconds': seconds,
+                'messages_per_second': message_count / seconds if seconds else 0.0,
+            }
+            if name.startswith('parse.'):
+                results[size][name]['megabytes_per_second'] = megabytes / seconds if seconds else 0.0
+            print(f"{size:>5}  {name:<40} {seconds:9.3f}s  {message_count / seconds if seconds else 0:12,.0f} msg/s",
+                  file=sys.stderr)
+    return results
+
+
+def compare(results: Results, baseline: Results, threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Benchmarks that took longer than their baseline by more than threshold (0.1 = 10%)."""
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            reference = baseline.get(size, {}).get(name)
+            if not reference or not reference.get('seconds'):
+                continue
+            ratio = result['seconds'] / reference['seconds']
+            if ratio > 1 + threshold:
+                regressions.append({
+                    'size': size,
+                    'benchmark': name,
+                    'baseline_seconds': reference['seconds'],
+                    'seconds': result['seconds'],
+                    'slowdown': ratio - 1,
+                })
+    return regressions
+
+
+def environment() -> Dict[str, str]:
+    """Where the benchmarks ran; timings are only comparable on the same setup."""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpu_count': str(os.cpu_count()),
+    }
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path: str, results: Results, merge_with: Optional[Dict[str, Any]] = None):
+    """Save results as the baseline, keeping baseline entries that did not run again."""
+    baseline = merge_with.get('results', {}) if merge_with else {}
+    for size, benchmarks in results.items():
+        baseline.setdefault(size, {}).update(benchmarks)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump({'environment': environment(), 'results': baseline}, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark parsing and analysis of WhatsApp chats.")
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                        help="Comma-separated numbers of messages, e.g. 10k,1m,10m")
+    parser.add_argument('--only', help="Only run benchmarks whose name contains this, e.g. parse or analyzer.word")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per benchmark; the fastest counts")
+    parser.add_argument('--time-format', choices=TIME_FORMATS, default='ampm')
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Where generated exports are kept")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown that counts as a regression, e.g. 0.1 for 10%%")
+    parser.add_argument('--output', help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    results = run_benchmarks(sizes, args.repeat, args.time_format, args.only, args.data_dir)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'environment': environment(), 'results': results}, file, indent=2, sort_keys=True)
+
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline:
+        save_baseline(args.baseline, results, baseline)
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return 0
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one", file=sys.stderr)
+        return 0
+
+    if baseline.get('environment') != environment():
+        print("Warning: the baseline was recorded in a different environment", file=sys.stderr)
+    regressions = compare(results, baseline.get('results', {}), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression['size']} {regression['benchmark']}: "
+              f"{regression['seconds']:.3f}s vs {regression['baseline_seconds']:.3f}s "
+              f"(+{regression['slowdown']:.0%})", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
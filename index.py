@@ -1,8 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from werkzeug.utils import secure_filename
+import hashlib
 import tempfile
 import os
-from whatsapp_analyzer import ChatAnalysisService
+from whatsapp_analyzer import ChatAnalysisService, __version__
+from whatsapp_analyzer.services.analyzers import AnalyzerRegistry
+from whatsapp_analyzer.services.instrumentation import Instrumentation
+from whatsapp_analyzer.services.metrics import AnalysisMetrics
+from whatsapp_analyzer.services.result_cache import ResultCache
+from whatsapp_analyzer.services.jobs import JobManager, JobQueueFullError
+from whatsapp_analyzer.services.zip_export import ChatTextReader
 
 app = Flask(__name__)
 
@@ -11,6 +18,31 @@ heart_emojis = {
     '❤️', '🧡', '💛', '💚', '💙', '💜', '🖤', '🤍', '🤎', '💔', '❤️‍🔥', '❤️‍🩹', '♥️', '💗'
 }
 
+# Results of recent uploads, kept in memory and optionally on disk
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    cache_dir=os.environ.get('RESULT_CACHE_DIR'),
+    ttl_seconds=float(os.environ.get('RESULT_CACHE_TTL_SECONDS', 24 * 60 * 60))
+)
+result_cache.purge_expired()
+registry = AnalyzerRegistry()
+
+# Timings of every analysis, aggregated at /metrics. Tracing memory makes analyses noticeably slower.
+ANALYSIS_METRICS = os.environ.get('ANALYSIS_METRICS', '1') == '1'
+ANALYSIS_TRACE_MEMORY = os.environ.get('ANALYSIS_TRACE_MEMORY', '0') == '1'
+analysis_metrics = AnalysisMetrics()
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Background analysis of large uploads
+job_manager = JobManager(
+    jobs_dir=os.environ.get('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'whatsapp_analyzer_jobs')),
+    heart_emojis=heart_emojis,
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', 16)),
+    ttl_seconds=float(os.environ.get('JOB_TTL_SECONDS', 60 * 60))
+)
+
 @app.route('/hello')
 def hello():
     return {"message": "Hello, World!"}
@@ -28,28 +60,141 @@ def analyze_chat():
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
 
-    # Create a temporary file to store the upload
+    try:
+        analyzer_names = _selected_analyzers()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Store the chat in a temporary file, hashing it on the way. Of a zip
+    # export only the chat is decompressed; its media are never written.
+    content_hash = hashlib.sha256()
+    reader = ChatTextReader()
     with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        file.save(temp_file.name)
         temp_file_path = temp_file.name
+        try:
+            while chunk := file.stream.read(UPLOAD_CHUNK_SIZE):
+                for data in reader.write(chunk):
+                    content_hash.update(data)
+                    temp_file.write(data)
+            for data in reader.finalize():
+                content_hash.update(data)
+                temp_file.write(data)
+        except ValueError as e:
+            temp_file.close()
+            os.unlink(temp_file_path)
+            return jsonify({"error": str(e)}), 400
+
+    # Identical uploads with the same settings are answered from the cache
+    cache_key = ResultCache.make_key(content_hash.hexdigest(), analyzer_names, heart_emojis, __version__)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        os.unlink(temp_file_path)
+        return _json_response(cached, "HIT")
 
     try:
         # Initialize and run the analysis service
-        service = ChatAnalysisService(temp_file_path, heart_emojis)
+        instrumentation = Instrumentation(ANALYSIS_TRACE_MEMORY) if ANALYSIS_METRICS else None
+        service = ChatAnalysisService(temp_file_path, heart_emojis, analyzers=analyzer_names,
+                                      instrumentation=instrumentation)
         service.analyze()
         
         # Get the analysis results
         results = service.get_results()
+        meta = results.pop("_meta", None)
+        if meta is not None:
+            analysis_metrics.observe(meta)
         
         # Clean up the temporary file
         os.unlink(temp_file_path)
         
-        return jsonify(results)
+        # Measurements are not cached, as they only describe this analysis
+        response = jsonify(results)
+        result_cache.put(cache_key, response.get_data())
+        if meta is not None and _wants_meta():
+            response = jsonify({**results, "_meta": meta})
+        response.headers['X-Cache'] = "MISS"
+        return response
     except Exception as e:
         # Clean up the temporary file in case of error
         os.unlink(temp_file_path)
         return jsonify({"error": f"Error analyzing chat file: {str(e)}"}), 500
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Endpoint to analyze a WhatsApp chat file in the background.
+    Accepts a chat file upload and returns the ID of the analysis job.
+    """
+    if 'file' not in request.files:
+        return jsonify({"error": "No file provided"}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No file selected"}), 400
+
+    try:
+        analyzer_names = _selected_analyzers()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        job_id = job_manager.submit(file.stream, UPLOAD_CHUNK_SIZE, analyzer_names)
+    except JobQueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"id": job_id, "status_url": f"/jobs/{job_id}",
+                    "result_url": f"/jobs/{job_id}/result"}), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status and per-analyzer progress of an analysis job."""
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Results of a finished analysis job."""
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if status["status"] == "failed":
+        return jsonify({"error": f"Error analyzing chat file: {status['error']}"}), 500
+
+    result_path = job_manager.result_path(job_id)
+    if result_path is None:
+        return jsonify(status), 202
+    return send_file(result_path, mimetype='application/json')
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Hit and miss counters of the result cache."""
+    return jsonify(result_cache.stats())
+
+@app.route('/metrics')
+def metrics():
+    """Histograms of the time and memory spent per analysis stage, in Prometheus text format."""
+    return app.response_class(analysis_metrics.render(), content_type=AnalysisMetrics.CONTENT_TYPE)
+
+def _selected_analyzers():
+    """Analyzers selected with the ``analyzers`` query parameter, e.g. ``?analyzers=emoji,word``."""
+    selection = request.args.get('analyzers')
+    names = [name.strip() for name in selection.split(',') if name.strip()] if selection else None
+    return registry.resolve(names)
+
+def _wants_meta() -> bool:
+    """Whether ``?meta=1`` asked for the measurements of the analysis in the results."""
+    return request.args.get('meta', '') in ('1', 'true')
+
+def _json_response(body: bytes, cache_status: str):
+    """Build a JSON response from an already serialized body."""
+    response = app.response_class(body, mimetype=app.json.mimetype)
+    response.headers['X-Cache'] = cache_status
+    return response
+
 @app.route('/')
 def root():
     """Root endpoint that returns API information."""
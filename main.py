@@ -1,17 +1,24 @@
-"""Main entry point for WhatsApp chat analysis."""
+"""Main entry point for WhatsApp chat analysis.
+
+Without arguments, analyzes ``data/_chat.txt`` into
+``data/chat_analysis_results.json``. With arguments, runs the batch command
+line interface, see ``python main.py --help``.
+"""
+
+import sys
 
 from whatsapp_analyzer import ChatAnalysisService
+from whatsapp_analyzer.cli import heart_emojis, main as cli_main
 
 def main():
-    # Example heart emojis
-    heart_emojis = {
-        '❤️', '🧡', '💛', '💚', '💙', '💜', '🖤', '🤍', '🤎', '💔', '❤️‍🔥', '❤️‍🩹', '♥️', '💗'
-    }
+    if len(sys.argv) > 1:
+        return cli_main(sys.argv[1:])
 
     # Initialize and run the analysis service
     service = ChatAnalysisService('data/_chat.txt', heart_emojis)
     service.analyze()
     service.export_results()
+    return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""Command line interface for analyzing many chat exports at once.
+
+Inputs can be files, directories (searched recursively for exports) and glob
+patterns. Every export is analyzed in a pool of worker processes and its
+results are written to the output directory, mirroring where the export was
+found, or all of them to one newline-delimited JSON file. A file that fails
+to parse or analyze is reported without stopping the others. Exports whose
+results are already newer than the export are skipped, so an interrupted run
+picks up where it stopped.
+
+Usage: python -m whatsapp_analyzer [-j JOBS] [-a emoji,word] [-o OUTPUT_DIR | --ndjson FILE] [--parse-cache DIR] INPUT...
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .exporters import NdjsonWriter, available_compressions
+from .exporters.compression import SUFFIXES, detect_compression
+from .exporters.json_exporter import ChatExporter
+from .services.analysis_service import ChatAnalysisService
+from .services.analyzers import AnalyzerRegistry
+from .services.parse_cache import ParseCache
+
+# Example heart emojis
+heart_emojis = {
+    '❤️', '🧡', '💛', '💚', '💙', '💜', '🖤', '🤍', '🤎', '💔', '❤️‍🔥', '❤️‍🩹', '♥️', '💗'
+}
+
+DEFAULT_PATTERN = '*.txt'
+DEFAULT_OUTPUT_DIR = 'results'
+WORKER_DIED = "The worker process analyzing this export exited unexpectedly"
+
+
+def find_exports(inputs: Iterable[str], pattern: str = DEFAULT_PATTERN) -> List[str]:
+    """Expand files, directories and glob patterns into a sorted list of export files.
+
+    Directories are searched recursively for files matching ``pattern``.
+    """
+    found = set()
+    for entry in inputs:
+        paths = sorted(glob.glob(entry, recursive=True)) if glob.has_magic(entry) else [entry]
+        if not paths:
+            raise FileNotFoundError(f"No files match '{entry}'")
+        for path in paths:
+            if os.path.isdir(path):
+                found.update(glob.glob(os.path.join(glob.escape(path), '**', pattern), recursive=True))
+            elif os.path.exists(path):
+                found.add(path)
+            else:
+                raise FileNotFoundError(f"No such file or directory: '{path}'")
+    return sorted(os.path.abspath(path) for path in found if os.path.isfile(path))
+
+
+def output_paths(exports: Sequence[str], output_dir: str, suffix: str = '.json') -> List[str]:
+    """Where the results of each export go.
+
+    Paths mirror the exports relative to the directory they all share, as
+    exports are often all called ``_chat.txt``. The same inputs always map
+    to the same outputs, which is what lets a run be resumed.
+    """
+    if not exports:
+        return []
+    root = os.path.commonpath([os.path.dirname(path) for path in exports])
+    return [
+        os.path.join(output_dir, os.path.splitext(os.path.relpath(path, root))[0] + suffix)
+        for path in exports
+    ]
+
+
+def is_complete(export: str, output: str) -> bool:
+    """Whether the results of an export were written after the export last changed."""
+    try:
+        return os.path.getmtime(output) >= os.path.getmtime(export)
+    except OSError:
+        return False
+
+
+def completed_in_ndjson(path: str) -> Set[str]:
+    """Exports whose results an earlier run wrote to an NDJSON file.
+
+    An uncompressed file is cut off after its last complete record, in case
+    that run was stopped while writing one. A compressed file that was not
+    finished cannot be continued.
+    """
+    if not os.path.exists(path):
+        return set()
+    if detect_compression(path) is not None:
+        try:
+            return {record["export"] for record in ChatExporter.read_ndjson(path)}
+        except Exception as e:
+            raise ValueError(f"Cannot continue {path}, it is incomplete or damaged ({e}); "
+                             f"use --force to start over")
+
+    completed = set()
+    end = 0
+    with open(path, 'r+b') as file:
+        for line in file:
+            try:
+                if not line.endswith(b'\n'):
+                    break
+                completed.add(json.loads(line)["export"])
+            except (ValueError, KeyError, TypeError):
+                break
+            end += len(line)
+        file.truncate(end)
+    return completed
+
+
+def analyze_export(export: str, output: Optional[str], heart_emojis: Set[str], analyzer_names: Sequence[str],
+                   use_mmap: bool = False, compact: bool = False,
+                   compression: Optional[str] = None, parse_cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Analyze one export and write its results; runs in a worker process.
+
+    Without an output, the results are returned in the summary instead. With
+    ``parse_cache_dir``, parsed messages are cached there and reused while
+    the export is unchanged. Errors are returned rather than raised, so one
+    broken export does not affect the others.
+    """
+    summary = _summary(export, output)
+    start = time.perf_counter()
+    try:
+        summary["bytes"] = os.path.getsize(export)
+        parse_cache = ParseCache(parse_cache_dir) if parse_cache_dir else None
+        service = ChatAnalysisService(export, heart_emojis, use_mmap=use_mmap, analyzers=analyzer_names,
+                                      parse_cache=parse_cache)
+        service.analyze()
+        summary["messages"] = len(service.messages)
+        if output is None:
+            summary["results"] = service.results
+        else:
+            os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+            service.export_results(output, compact, compression)
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {e}"
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def _summary(export: str, output: str, error: Optional[str] = None) -> Dict[str, Any]:
+    return {"export": export, "output": output, "messages": 0, "bytes": 0, "seconds": 0.0, "error": error}
+
+
+def run_batch(tasks: Sequence[Tuple[str, Optional[str]]], jobs: int, analyzer_names: Sequence[str],
+              use_mmap: bool = False, on_done=None, compact: bool = False,
+              compression: Optional[str] = None, parse_cache_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Analyze (export, output) pairs with ``jobs`` worker processes.
+
+    Results are written as ``analyze_export`` does; summaries with results
+    are only passed to ``on_done``, so the results are not kept. ``on_done``
+    is called with the summary of every export as it finishes. Only a bounded
+    number of exports are queued at a time, so memory does not grow with the
+    number of exports. If a worker process dies, the exports it may have been
+    working on are reported as failed and a new pool is started for the rest.
+    """
+    summaries = []
+
+    def done(summary):
+        if on_done is not None:
+            on_done(summary)
+        summary.pop("results", None)
+        summaries.append(summary)
+
+    if jobs <= 1:
+        for export, output in tasks:
+            done(analyze_export(export, output, heart_emojis, analyzer_names, use_mmap, compact, compression,
+                                parse_cache_dir))
+        return summaries
+
+    pending = iter(tasks)
+    in_flight = {}
+    pool = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        while True:
+            while len(in_flight) < jobs * 2:
+                task = next(pending, None)
+                if task is None:
+                    break
+                future = pool.submit(analyze_export, *task, heart_emojis, analyzer_names, use_mmap, compact,
+                                     compression, parse_cache_dir)
+                in_flight[future] = task
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                task = in_flight.pop(future)
+                try:
+                    done(future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    done(_summary(*task, WORKER_DIED))
+            if broken:
+                # Nothing more can run in this pool, and it is unknown which
+                # export brought it down
+                for future, task in in_flight.items():
+                    if future.done() and future.exception() is None:
+                        done(future.result())
+                    else:
+                        done(_summary(*task, WORKER_DIED))
+                in_flight.clear()
+                pool.shutdown(cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=jobs)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return summaries
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='whatsapp_analyzer', description="Analyze WhatsApp chat exports.")
+    parser.add_argument('inputs', nargs='+', help="Export files, directories or glob patterns")
+    parser.add_argument('-o', '--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help=f"Where to write the results (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Number of exports analyzed at the same time (default: number of CPUs)")
+    parser.add_argument('-a', '--analyzers',
+                        help="Comma-separated analyzers to run, e.g. emoji,word (default: all)")
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN,
+                        help=f"Exports to look for in directories (default: {DEFAULT_PATTERN})")
+    parser.add_argument('--ndjson', metavar='FILE',
+                        help="Write all results to this newline-delimited JSON file instead, one line per export; "
+                             "compressed if it ends in .gz or .zst")
+    parser.add_argument('--compact', action='store_true', help="Write the results without indentation")
+    parser.add_argument('--compress', choices=available_compressions(),
+                        help="Compress every results file")
+    parser.add_argument('--force', action='store_true', help="Analyze exports again even if their results exist")
+    parser.add_argument('--mmap', action='store_true', help="Use the memory-mapped parser, faster for large exports")
+    parser.add_argument('--parse-cache', metavar='DIR',
+                        help="Cache parsed exports in this directory, so unchanged exports are not parsed again")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only print failures and the summary")
+    args = parser.parse_args(argv)
+
+    try:
+        selection = [name.strip() for name in args.analyzers.split(',') if name.strip()] if args.analyzers else None
+        analyzer_names = AnalyzerRegistry().resolve(selection)
+        exports = find_exports(args.inputs, args.pattern)
+        completed = completed_in_ndjson(args.ndjson) if args.ndjson and not args.force else set()
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+
+    tasks = []
+    skipped = 0
+    if args.ndjson:
+        for export in exports:
+            if export in completed:
+                skipped += 1
+            else:
+                tasks.append((export, None))
+    else:
+        suffix = '.json' + SUFFIXES[args.compress] if args.compress else '.json'
+        for export, output in zip(exports, output_paths(exports, args.output_dir, suffix)):
+            if not args.force and is_complete(export, output):
+                skipped += 1
+            else:
+                tasks.append((export, output))
+
+    print(f"{len(exports)} exports, {skipped} already done, analyzing {len(tasks)} with {args.jobs} jobs",
+          file=sys.stderr)
+
+    count = 0
+    writer = NdjsonWriter(args.ndjson, append=bool(completed)) if args.ndjson else None
+
+    def report(summary):
+        nonlocal count
+        count += 1
+        if writer is not None and not summary["error"]:
+            writer.write({"export": summary["export"], "results": summary["results"]})
+            writer.flush()
+        if summary["error"]:
+            print(f"[{count}/{len(tasks)}] FAILED {summary['export']}: {summary['error']}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"[{count}/{len(tasks)}] {summary['export']}: {summary['messages']} messages "
+                  f"in {summary['seconds']:.2f}s", file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        summaries = run_batch(tasks, args.jobs, analyzer_names, args.mmap, report, args.compact, args.compress,
+                              args.parse_cache)
+    finally:
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - start
+
+    succeeded = [summary for summary in summaries if not summary["error"]]
+    failed = [summary for summary in summaries if summary["error"]]
+    messages = sum(summary["messages"] for summary in succeeded)
+    megabytes = sum(summary["bytes"] for summary in succeeded) / 1024 / 1024
+    per_second = 1 / elapsed if elapsed > 0 else 0.0
+    print(f"\nAnalyzed {len(succeeded)} exports, {len(failed)} failed, {skipped} skipped in {elapsed:.2f}s",
+          file=sys.stderr)
+    print(f"{messages:,} messages, {megabytes:,.1f} MB: {len(succeeded) * per_second:,.1f} exports/s, "
+          f"{messages * per_second:,.0f} messages/s, {megabytes * per_second:,.1f} MB/s", file=sys.stderr)
+    for summary in failed:
+        print(f"  FAILED {summary['export']}: {summary['error']}", file=sys.stderr)
+    return 1 if failed else 0
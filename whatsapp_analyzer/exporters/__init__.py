@@ -1,5 +1,6 @@
 """Exporters for WhatsApp chat analysis."""
 
-from .json_exporter import ChatExporter
+from .json_exporter import ChatExporter, NdjsonWriter
+from .compression import available_compressions
 
-__all__ = ['ChatExporter'] 
\ No newline at end of file
+__all__ = ['ChatExporter', 'NdjsonWriter', 'available_compressions']
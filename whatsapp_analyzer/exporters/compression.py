@@ -0,0 +1,48 @@
+import gzip
+import io
+from typing import BinaryIO, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional
+    zstandard = None
+
+COMPRESSIONS = ('gzip', 'zstd')
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def available_compressions() -> List[str]:
+    """Compressions that can be used with the installed packages."""
+    return [compression for compression in COMPRESSIONS if compression != 'zstd' or zstandard is not None]
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """The compression implied by a file name, e.g. ``gzip`` for ``results.json.gz``."""
+    for compression, suffix in SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def open_compressed(path: str, mode: str = 'rb', compression: Optional[str] = 'auto') -> BinaryIO:
+    """Open a file for binary reading (``rb``), writing (``wb``) or appending (``ab``).
+
+    With ``compression='auto'`` the compression follows from the file name.
+    Appending to a compressed file adds a new frame, which readers decompress
+    as if the file had been written in one go.
+    """
+    if compression == 'auto':
+        compression = detect_compression(path)
+    if compression is None:
+        return open(path, mode)
+    if compression == 'gzip':
+        # Compresses nearly as well as the default level 9 in a fraction of the time
+        return gzip.open(path, mode, compresslevel=6)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        if mode == 'rb':
+            reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+            return io.BufferedReader(reader)
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, mode))
+    raise ValueError(f"Unknown compression '{compression}', expected one of: {', '.join(COMPRESSIONS)}")
@@ -1,11 +1,171 @@
 import json
-from typing import Dict
+import os
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+from .compression import detect_compression, open_compressed
+
+try:
+    import orjson
+except ImportError:  # Faster JSON encoding when installed
+    orjson = None
+
+# Nested objects down to this depth are written key by key, so only one
+# value below it needs to be encoded in memory at a time. Large objects of
+# plain values, like word counts, are encoded in one go, which is much faster.
+STREAM_DEPTH = 3
+STREAM_MAX_PLAIN_KEYS = 64
+# Encoded pieces are collected up to this size before they are written
+WRITE_BUFFER_SIZE = 1 << 16
+
+_compact_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_indented_encoder = json.JSONEncoder(ensure_ascii=False, indent=4)
+
+
+def dumps(data: Any, compact: bool = True) -> bytes:
+    """Encode data as UTF-8 JSON, compact or indented by four spaces.
+
+    Compact output uses orjson when it is installed. Values orjson rejects,
+    such as integers beyond 64 bits, fall back to the json module.
+    """
+    if compact:
+        if orjson is not None:
+            try:
+                return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                pass
+        return _compact_encoder.encode(data).encode('utf-8')
+    return _indented_encoder.encode(data).encode('utf-8')
+
+
+def write_json(data: Any, file: BinaryIO, compact: bool = False):
+    """Write data as JSON to a binary file without encoding all of it at once.
+
+    The output is the same as that of ``dumps``.
+    """
+    buffer = []
+    size = 0
+
+    def write(piece: bytes):
+        nonlocal buffer, size
+        buffer.append(piece)
+        size += len(piece)
+        if size >= WRITE_BUFFER_SIZE:
+            file.write(b''.join(buffer))
+            buffer, size = [], 0
+
+    _write_value(data, write, compact, 0)
+    file.write(b''.join(buffer))
+
+
+def _write_value(value: Any, write, compact: bool, depth: int):
+    if not isinstance(value, (dict, list, tuple)):
+        # Numbers, strings and the like look the same compact or not
+        write(_compact_encoder.encode(value).encode('utf-8'))
+        return
+    if not _streamed(value, depth):
+        encoded = dumps(value, compact)
+        # Nested values are indented to their depth; encoded strings never
+        # contain line breaks
+        write(encoded if compact or not depth else encoded.replace(b'\n', b'\n' + b'    ' * depth))
+        return
+
+    if compact:
+        separator, colon, opening, closing = b',', b':', b'{', b'}'
+    else:
+        indent = b'\n' + b'    ' * (depth + 1)
+        separator, colon, opening, closing = b',' + indent, b': ', b'{' + indent, b'\n' + b'    ' * depth + b'}'
+
+    write(opening)
+    for i, (key, item) in enumerate(value.items()):
+        if i:
+            write(separator)
+        write(_compact_encoder.encode(key if isinstance(key, str) else _key(key)).encode('utf-8'))
+        write(colon)
+        _write_value(item, write, compact, depth + 1)
+    write(closing)
+
+
+def _streamed(value: Any, depth: int) -> bool:
+    """Whether an object is written key by key rather than encoded as a whole."""
+    if not isinstance(value, dict) or not value or depth >= STREAM_DEPTH:
+        return False
+    return len(value) <= STREAM_MAX_PLAIN_KEYS or isinstance(next(iter(value.values())), (dict, list, tuple))
+
+
+def _key(key: Any) -> str:
+    """A key that is not a string as the json module turns it into one, e.g. ``1`` into ``"1"``."""
+    return next(iter(json.loads(json.dumps({key: None}))))
+
+
+class NdjsonWriter:
+    """Writes records as newline-delimited JSON, one compact object per line.
+
+    Each line is written as soon as the record is, so batch results can be
+    written while further exports are still being analyzed.
+    """
+
+    def __init__(self, file_path: str, compression: Optional[str] = 'auto', append: bool = False):
+        self.file_path = file_path
+        self.count = 0
+        self._file = open_compressed(file_path, 'ab' if append else 'wb', compression)
+
+    def write(self, record: Any):
+        self._file.write(dumps(record) + b'\n')
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'NdjsonWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 
 class ChatExporter:
-    """Exporter for WhatsApp chat analysis results."""
-    
+    """Exporter for WhatsApp chat analysis results.
+
+    Files ending in ``.gz`` or ``.zst`` are compressed, unless ``compression``
+    says otherwise.
+    """
+
     @staticmethod
-    def export_to_json(data: Dict, file_path: str):
-        """Export data to JSON file."""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4) 
\ No newline at end of file
+    def export_to_json(data: Dict, file_path: str, compact: bool = False, compression: Optional[str] = 'auto'):
+        """Export data to a JSON file, indented by four spaces unless compact.
+
+        The data is encoded while it is written, and the file is replaced in
+        one step once it is complete, so it never holds partial results.
+        """
+        # The temporary file does not end in the suffix that implies the compression
+        if compression == 'auto':
+            compression = detect_compression(file_path)
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+        try:
+            with open_compressed(tmp_path, 'wb', compression) as f:
+                write_json(data, f, compact)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    @staticmethod
+    def export_to_ndjson(records: Iterable[Any], file_path: str, compression: Optional[str] = 'auto',
+                         append: bool = False) -> int:
+        """Export records to a newline-delimited JSON file and return how many were written."""
+        with NdjsonWriter(file_path, compression, append) as writer:
+            for record in records:
+                writer.write(record)
+        return writer.count
+
+    @staticmethod
+    def read_ndjson(file_path: str, compression: Optional[str] = 'auto') -> Iterator[Any]:
+        """Read the records of a newline-delimited JSON file one at a time."""
+        with open_compressed(file_path, 'rb', compression) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
@@ -1,5 +1,6 @@
 """Models for WhatsApp chat analysis."""
 
 from .message import Message
+from .message_store import MessageStore, MessageView
 
-__all__ = ['Message'] 
\ No newline at end of file
+__all__ = ['Message', 'MessageStore', 'MessageView']
\ No newline at end of file
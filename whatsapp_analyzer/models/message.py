@@ -2,7 +2,12 @@ from dataclasses import dataclass
 
 @dataclass
 class Message:
-    """Represents a WhatsApp message with timestamp, sender, and content."""
+    """Represents a WhatsApp message with timestamp, sender, and content.
+
+    ``epoch`` holds the timestamp decoded once at parse time, in seconds since
+    1970-01-01 in the chat's local time.
+    """
     timestamp: str
     sender: str
-    message: str 
\ No newline at end of file
+    message: str
+    epoch: int
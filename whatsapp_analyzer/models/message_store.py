@@ -0,0 +1,209 @@
+import json
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+from .message import Message
+
+class MessageView:
+    """Read-only view of one message in a MessageStore.
+
+    Exposes the same attributes as ``Message`` plus the interned ``sender_id``.
+    The message text is decoded on first access and cached on the view.
+    """
+
+    __slots__ = ('_store', 'index', 'epoch', 'sender_id', 'sender', '_message')
+
+    def __init__(self, store: 'MessageStore', index: int, epoch: int, sender_id: int):
+        self._store = store
+        self.index = index
+        self.epoch = epoch
+        self.sender_id = sender_id
+        self.sender = store.senders[sender_id]
+        self._message = None
+
+    @property
+    def timestamp(self) -> str:
+        return self._store.timestamp_at(self.index)
+
+    @property
+    def message(self) -> str:
+        if self._message is None:
+            self._message = self._store.text_at(self.index)
+        return self._message
+
+    def __repr__(self) -> str:
+        return (f"MessageView(timestamp={self.timestamp!r}, sender={self.sender!r}, "
+                f"message={self.message!r}, epoch={self.epoch!r})")
+
+
+class MessageStore:
+    """Columnar storage for parsed chat messages.
+
+    Each message takes one slot in a set of typed columns instead of being a
+    Python object:
+
+    - ``epochs``: int64 epoch seconds
+    - ``sender_ids``: int32 indexes into ``senders``, the interned sender names
+    - the raw timestamp and the message text, packed as UTF-8 into one buffer
+      and located through an offsets column
+
+    Indexing and iteration yield ``MessageView`` rows, so analyzers written
+    against ``Message`` keep working, while the columns can be used directly
+    for whole-column computations.
+
+    ``write`` saves the columns in a binary file that ``from_buffer`` reads
+    back without copying, e.g. from a memory-mapped file.
+    """
+
+    MAGIC = b'WAMSGS01'
+    # Magic, then the length of the JSON header that follows
+    _PREFIX = struct.Struct('<8sI')
+
+    def __init__(self):
+        self.epochs = array('q')
+        self.sender_ids = array('i')
+        self.senders: List[str] = []
+        self._sender_index: Dict[str, int] = {}
+        self._buffer = bytearray()
+        self._offsets = array('q', [0])
+        self._timestamp_lengths = array('B')
+
+    @classmethod
+    def from_messages(cls, messages: Iterable[Message]) -> 'MessageStore':
+        """Build a store from Message objects."""
+        store = cls()
+        for msg in messages:
+            store.append(msg.timestamp, msg.sender, msg.message, msg.epoch)
+        return store
+
+    def write(self, file: BinaryIO, metadata: Optional[Dict[str, Any]] = None):
+        """Write the store to a binary file.
+
+        A JSON header with the senders and the column sizes is followed by
+        the columns, each starting at a multiple of 8 bytes, in native byte
+        order. ``metadata`` is stored in the header as is.
+        """
+        header = json.dumps({
+            "count": len(self),
+            "senders": self.senders,
+            "buffer_bytes": len(self._buffer),
+            "byteorder": sys.byteorder,
+            "metadata": metadata or {}
+        }, ensure_ascii=False).encode('utf-8')
+        position = file.write(self._PREFIX.pack(self.MAGIC, len(header)))
+        position += file.write(header)
+        for column in (self.epochs, self._offsets, self.sender_ids, self._timestamp_lengths, self._buffer):
+            position += file.write(b'\0' * (-position % 8))
+            position += file.write(column)
+
+    @classmethod
+    def read_metadata(cls, buffer) -> Dict[str, Any]:
+        """The header of a store written by ``write``; raises ValueError if it is not one."""
+        view = memoryview(buffer)
+        if len(view) < cls._PREFIX.size:
+            raise ValueError("Not a message store file")
+        magic, header_length = cls._PREFIX.unpack(view[:cls._PREFIX.size])
+        if magic != cls.MAGIC:
+            raise ValueError("Not a message store file")
+        header = json.loads(str(view[cls._PREFIX.size:cls._PREFIX.size + header_length], 'utf-8'))
+        header["header_end"] = cls._PREFIX.size + header_length
+        return header
+
+    @classmethod
+    def from_buffer(cls, buffer) -> 'MessageStore':
+        """Open a store written by ``write`` without copying its columns.
+
+        The columns are views of ``buffer``, which must stay unchanged while
+        the store is in use. Such a store is read-only.
+        """
+        header = cls.read_metadata(buffer)
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("The message store was written with a different byte order")
+
+        view = memoryview(buffer)
+        position = header["header_end"]
+        count = header["count"]
+        columns = []
+        for typecode, length in (('q', count), ('q', count + 1), ('i', count), ('B', count),
+                                 ('B', header["buffer_bytes"])):
+            position += -position % 8
+            end = position + length * array(typecode).itemsize
+            if end > len(view):
+                raise ValueError("The message store file is truncated")
+            columns.append(view[position:end].cast(typecode))
+            position = end
+
+        store = cls()
+        store.epochs, store._offsets, store.sender_ids, store._timestamp_lengths, store._buffer = columns
+        store.senders = header["senders"]
+        store._sender_index = {sender: sender_id for sender_id, sender in enumerate(store.senders)}
+        return store
+
+    def sender_id(self, sender: str) -> int:
+        """Return the interned ID of a sender, adding it if it is new."""
+        sender_id = self._sender_index.get(sender)
+        if sender_id is None:
+            sender_id = len(self.senders)
+            self._sender_index[sender] = sender_id
+            self.senders.append(sender)
+        return sender_id
+
+    def append(self, timestamp: str, sender: str, message: str, epoch: int):
+        """Add a message to the end of the store."""
+        self.append_encoded(timestamp.encode('utf-8'), self.sender_id(sender),
+                            message.encode('utf-8'), epoch)
+
+    def append_encoded(self, timestamp: bytes, sender_id: int, message: bytes, epoch: int):
+        """Add a message whose timestamp and text are already UTF-8 encoded."""
+        self.epochs.append(epoch)
+        self.sender_ids.append(sender_id)
+        self._timestamp_lengths.append(len(timestamp))
+        self._buffer += timestamp
+        self._buffer += message
+        self._offsets.append(len(self._buffer))
+
+    def timestamp_at(self, index: int) -> str:
+        """Return the raw timestamp of a message."""
+        start = self._offsets[index]
+        return str(self._buffer[start:start + self._timestamp_lengths[index]], 'utf-8')
+
+    def text_at(self, index: int) -> str:
+        """Return the text of a message."""
+        start = self._offsets[index] + self._timestamp_lengths[index]
+        return str(self._buffer[start:self._offsets[index + 1]], 'utf-8')
+
+    def candidates(self, pattern) -> Iterator[int]:
+        """Indexes of the messages whose raw bytes match a compiled bytes pattern, in order.
+
+        The timestamp and text of all messages are searched in one go, so a
+        match may also start in the timestamp or run on into the next
+        message; check the text of the candidates.
+        """
+        offsets = self._offsets
+        last = -1
+        for match in pattern.finditer(self._buffer):
+            index = bisect_right(offsets, match.start()) - 1
+            if index != last:
+                yield index
+                last = index
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the columns and the text buffer."""
+        columns = (self.epochs, self.sender_ids, self._offsets, self._timestamp_lengths)
+        return len(self._buffer) + sum(col.itemsize * len(col) for col in columns)
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def __getitem__(self, index: int) -> MessageView:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return MessageView(self, index, self.epochs[index], self.sender_ids[index])
+
+    def __iter__(self) -> Iterator[MessageView]:
+        for index, (epoch, sender_id) in enumerate(zip(self.epochs, self.sender_ids)):
+            yield MessageView(self, index, epoch, sender_id)
@@ -2,5 +2,12 @@
 
 from .analysis_service import ChatAnalysisService
 from .parser import ChatParser
+from .mmap_parser import MmapChatParser
+from .incremental_parser import IncrementalChatParser
+from .engine import AnalysisEngine
+from .checkpoint import AnalysisCheckpoint
+from .instrumentation import Instrumentation
+from .parse_cache import ParseCache
+from .message_index import MessageIndex
 
-__all__ = ['ChatAnalysisService', 'ChatParser'] 
+__all__ = ['ChatAnalysisService', 'ChatParser', 'MmapChatParser', 'IncrementalChatParser', 'AnalysisEngine', 'AnalysisCheckpoint', 'Instrumentation', 'ParseCache', 'MessageIndex'] 
@@ -1,38 +1,218 @@
-from typing import Set, Dict, Any
-import json
+from typing import Set, Dict, Any, Iterable, Optional, Sequence
+import hashlib
+import os
+from ..exporters import ChatExporter
+from ..models.message import Message
 from .parser import ChatParser
+from .mmap_parser import MmapChatParser
 from .analyzers import AnalyzerRegistry
+from .engine import AnalysisEngine
+from .parallel import analyze_parallel, merge_ranges, split_ranges
+from .checkpoint import AnalysisCheckpoint
+from .instrumentation import Instrumentation
+from .parse_cache import ParseCache
+from .message_index import Bound, MessageIndex
+from .zip_export import is_zip_export
 
 class ChatAnalysisService:
     """Service to orchestrate WhatsApp chat analysis."""
 
-    def __init__(self, chat_file: str, heart_emojis: Set[str]):
+    def __init__(self, chat_file: str, heart_emojis: Set[str], streaming: bool = False,
+                 use_mmap: bool = False, workers: int = 1, checkpoint_file: Optional[str] = None,
+                 analyzers: Optional[Iterable[str]] = None, instrumentation: Optional[Instrumentation] = None,
+                 parse_cache: Optional[ParseCache] = None):
         self.chat_file = chat_file
         self.heart_emojis = heart_emojis
-        self.parser = ChatParser(chat_file)
+        self.streaming = streaming
+        self.workers = workers
+        self.checkpoint_file = checkpoint_file
+        # Measurements of parsing and each analyzer, returned as "_meta" in the results
+        self.instrumentation = instrumentation
+        # Parsed messages of unchanged exports are loaded from here instead of parsed again.
+        # Parallel and checkpointed analyses parse byte ranges and do not use it.
+        self.parse_cache = parse_cache
         self.registry = AnalyzerRegistry()
+        # Only the selected analyzers run, and the parser skips fields none of them read
+        self.analyzer_names = self.registry.resolve(analyzers)
+        fields = self.registry.required_fields(self.analyzer_names)
+        self.parser = MmapChatParser(chat_file, fields=fields) if use_mmap else ChatParser(chat_file, fields=fields)
         self.messages = None
+        # Built by the first filtered analysis and reused by the following ones
+        self.index: Optional[MessageIndex] = None
         self.results = {}
 
-    def analyze(self) -> Dict[str, Any]:
-        """Perform chat analysis and return results."""
-        self.messages = self.parser.parse()
-        analyzers = self.registry.create_analyzers(self.messages, self.heart_emojis)
-        
-        # Run all analyzers and collect results
-        for analyzer in analyzers:
-            self.results[analyzer.name] = analyzer.analyze()
-        
+    def analyze(self, start: Bound = None, end: Bound = None,
+                senders: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Perform chat analysis and return results.
+
+        ``start``, ``end`` and ``senders`` limit the analysis to the messages
+        sent from ``start`` up to, not including, ``end`` by any of the
+        senders; see ``MessageIndex.select``. Filtered analyses parse the
+        whole chat once and keep it with a ``MessageIndex``, so further ones
+        only go through the selected messages, whatever the streaming,
+        workers and checkpoint settings.
+        """
+        if start is None and end is None and senders is None:
+            return self._measured(self._analyze)
+        return self._measured(self._analyze_filtered, start, end, senders)
+
+    def _analyze(self) -> Dict[str, Any]:
+        if (self.checkpoint_file or self.workers > 1) and is_zip_export(self.chat_file):
+            raise ValueError("Zip exports cannot be split into byte ranges; "
+                             "analyze them without workers or a checkpoint")
+        if self.checkpoint_file:
+            return self._analyze_incremental()
+        if self.workers > 1:
+            self.results = analyze_parallel(self.chat_file, self.heart_emojis, self.registry, self.workers,
+                                            self.analyzer_names, self.instrumentation)
+            return self.results
+        if self.streaming:
+            return self._analyze_streaming()
+
+        if self.instrumentation is None:
+            return self._analyze_messages(self._parse())
+        with self.instrumentation.measure('parse'):
+            messages = self._parse()
+        self.instrumentation.add('parse', 0.0, 0.0, len(messages))
+        return self._analyze_messages(messages)
+
+    def _parse(self) -> Sequence[Message]:
+        if self.parse_cache is None:
+            return self.parser.parse()
+        return self.parse_cache.parse(self.parser)
+
+    def _analyze_filtered(self, start: Bound, end: Bound, senders: Optional[Iterable[str]]) -> Dict[str, Any]:
+        if self.index is None:
+            if self.instrumentation is None:
+                self.index = MessageIndex(self._parse())
+            else:
+                with self.instrumentation.measure('parse'):
+                    messages = self._parse()
+                self.instrumentation.add('parse', 0.0, 0.0, len(messages))
+                with self.instrumentation.measure('index', len(messages)):
+                    self.index = MessageIndex(messages)
+
+        analyzers = self.registry.create_analyzers(None, self.heart_emojis, self.analyzer_names)
+        self.messages = self.index.select(start, end, senders)
+        self.results = self.index.analyze(analyzers, start, end, senders, self.instrumentation, self.messages)
+        return self.results
+
+    def analyze_messages(self, messages: Sequence[Message]) -> Dict[str, Any]:
+        """Analyze messages that were already parsed, e.g. by an IncrementalChatParser."""
+        return self._measured(self._analyze_messages, messages)
+
+    def _analyze_messages(self, messages: Sequence[Message]) -> Dict[str, Any]:
+        self.messages = messages
+        analyzers = self.registry.create_analyzers(self.messages, self.heart_emojis, self.analyzer_names)
+
+        # Feed all analyzers from a single pass over the messages
+        engine = AnalysisEngine(analyzers, self.instrumentation)
+        self.results = engine.run(self.messages)
+
+        return self.results
+
+    def _measured(self, analyze, *args) -> Dict[str, Any]:
+        """Run an analysis, adding the instrumentation report as "_meta" if there is one."""
+        if self.instrumentation is None:
+            return analyze(*args)
+
+        self.instrumentation.start()
+        try:
+            analyze(*args)
+        finally:
+            self.instrumentation.stop()
+        self.results["_meta"] = self.instrumentation.report()
         return self.results
+
+    def _analyze_streaming(self) -> Dict[str, Any]:
+        """Analyze the chat while parsing it, without keeping the messages in memory."""
+        analyzers = self.registry.create_analyzers(None, self.heart_emojis, self.analyzer_names)
+        engine = AnalysisEngine(analyzers, self.instrumentation)
+        if unsupported := engine.unsupported_for_streaming():
+            raise ValueError(f"Analyzers {unsupported} need the full message list and cannot run in streaming mode")
+
+        # A cached parse is read instead, but a miss is not cached, as that would keep the messages
+        messages = self.parse_cache.load(self.parser) if self.parse_cache is not None else None
+        if messages is None:
+            messages = self.parser.iter_messages()
+        if self.instrumentation is not None:
+            messages = self.instrumentation.timed('parse', messages)
+        self.results = engine.run(messages)
+        return self.results
+
+    def _analyze_incremental(self) -> Dict[str, Any]:
+        """Analyze only what was appended to the chat since the last checkpoint.
+
+        The checkpoint is reused when it was made with the same analyzers and
+        the file still starts with the bytes it was made from; otherwise the
+        whole chat is analyzed. A new checkpoint is saved at the end of the
+        last complete line, so a trailing line without a newline is analyzed
+        again next time.
+        """
+        analyzers = self.registry.create_analyzers(None, self.heart_emojis, self.analyzer_names)
+        engine = AnalysisEngine(analyzers, self.instrumentation)
+        if unsupported := engine.unsupported_for_streaming():
+            raise ValueError(f"Analyzers {unsupported} need the full message list and cannot be checkpointed")
+        names = [analyzer.name for analyzer in analyzers]
+
+        checkpoint = AnalysisCheckpoint.load(self.checkpoint_file)
+        with open(self.chat_file, 'rb') as file:
+            size = file.seek(0, os.SEEK_END)
+            complete_end = self._complete_lines_end(file, size)
+
+            start = None
+            hasher = hashlib.sha256()
+            if (checkpoint is not None and checkpoint.is_compatible(names, self.heart_emojis)
+                    and 0 < checkpoint.offset <= complete_end):
+                AnalysisCheckpoint.hash_prefix(file, checkpoint.offset, hasher)
+                if hasher.hexdigest() == checkpoint.prefix_hash:
+                    engine = AnalysisEngine(checkpoint.analyzers, self.instrumentation)
+                    start = checkpoint.offset
+
+            if start is None:
+                engine.start()
+                hasher = AnalysisCheckpoint.hash_prefix(file, complete_end)
+            else:
+                AnalysisCheckpoint.hash_prefix(file, complete_end, hasher, start)
+
+        ranges = split_ranges(self.chat_file, self.workers, start, complete_end)
+        merge_ranges(engine, self.chat_file, ranges, self.registry, self.heart_emojis, self.workers,
+                     self.analyzer_names)
+        AnalysisCheckpoint(complete_end, hasher.hexdigest(), names, self.heart_emojis,
+                           engine.analyzers).save(self.checkpoint_file)
+
+        if 0 < complete_end < size:
+            merge_ranges(engine, self.chat_file, [(complete_end, size)], self.registry, self.heart_emojis,
+                         names=self.analyzer_names)
+
+        self.results = engine.finish()
+        return self.results
+
+    @staticmethod
+    def _complete_lines_end(file, size: int, block_size: int = 1 << 16) -> int:
+        """Offset just past the last newline in an open binary file, or 0 if there is none."""
+        end = size
+        while end > 0:
+            start = max(0, end - block_size)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            end = start
+        return 0
     
     def get_results(self):
         """Get analysis results."""
         return self.results
 
-    def export_results(self):
-        """Export analysis results to JSON file."""
-        with open('data/chat_analysis_results.json', 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, ensure_ascii=False, indent=4)
+    def export_results(self, path: str = 'data/chat_analysis_results.json', compact: bool = False,
+                       compression: Optional[str] = 'auto'):
+        """Export analysis results to a JSON file.
+
+        See ``ChatExporter.export_to_json``; a path ending in ``.gz`` or
+        ``.zst`` is compressed.
+        """
+        ChatExporter.export_to_json(self.results, path, compact, compression)
 
     def print_results(self):
         """Print analysis results."""
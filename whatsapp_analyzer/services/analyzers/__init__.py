@@ -1,6 +1,10 @@
 """Analyzers for WhatsApp chat analysis."""
 
-from .base_analyzer import BaseAnalyzer
+from .base_analyzer import BaseAnalyzer, SinglePassAnalyzer
+from .features import MessageFeatures
+from .lexicon import LexiconMatcher
+from .quantile_sketch import QuantileSketch
+from .top_k_sketch import TopKSketch
 from .word_analyzer import WordAnalyzer
 from .emoji_analyzer import EmojiAnalyzer
 from .time_analyzer import TimeAnalyzer
@@ -13,6 +17,11 @@ from .sentiment_correlation_analyzer import SentimentCorrelationAnalyzer
 
 __all__ = [
     'BaseAnalyzer',
+    'SinglePassAnalyzer',
+    'MessageFeatures',
+    'LexiconMatcher',
+    'QuantileSketch',
+    'TopKSketch',
     'WordAnalyzer',
     'EmojiAnalyzer',
     'TimeAnalyzer',
@@ -1,4 +1,4 @@
-from typing import Dict, List, Type, Set
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Type, Set
 from ...models.message import Message
 from .base_analyzer import BaseAnalyzer
 from .word_analyzer import WordAnalyzer
@@ -32,16 +32,48 @@ class AnalyzerRegistry:
         """Register a new analyzer."""
         self._analyzers[name] = analyzer_class
 
-    def create_analyzers(self, messages: List[Message], heart_emojis: Set[str] = None) -> List[BaseAnalyzer]:
-        """Create instances of all registered analyzers."""
+    def create_analyzers(self, messages: Sequence[Message], heart_emojis: Set[str] = None,
+                         names: Optional[Iterable[str]] = None) -> List[BaseAnalyzer]:
+        """Create instances of the selected analyzers, or of all registered ones."""
         instances = []
-        for name, analyzer_class in self._analyzers.items():
+        for name in self.resolve(names):
+            analyzer_class = self._analyzers[name]
             if name == "emoji" and heart_emojis is not None:
                 instances.append(analyzer_class(messages, heart_emojis))
             else:
                 instances.append(analyzer_class(messages))
         return instances
 
+    def resolve(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """Turn a selection of analyzers into registered names in registration order.
+
+        Analyzers can be selected by their registered name (``"emoji"``) or by
+        the name of their results (``"emoji_analysis"``). ``None`` selects all.
+        """
+        if names is None:
+            return list(self._analyzers)
+
+        selected = set()
+        result_names = None
+        for name in names:
+            if name not in self._analyzers:
+                if result_names is None:
+                    result_names = {
+                        analyzer_class(None).name: key for key, analyzer_class in self._analyzers.items()
+                    }
+                if name not in result_names:
+                    raise ValueError(f"Unknown analyzer '{name}', available: {', '.join(self._analyzers)}")
+                name = result_names[name]
+            selected.add(name)
+        return [name for name in self._analyzers if name in selected]
+
+    def required_fields(self, names: Optional[Iterable[str]] = None) -> FrozenSet[str]:
+        """Message fields needed by the selected analyzers."""
+        fields = set()
+        for name in self.resolve(names):
+            fields |= self._analyzers[name].required_fields
+        return frozenset(fields)
+
     def get_available_analyzers(self) -> List[str]:
         """Get list of registered analyzer names."""
         return list(self._analyzers.keys()) 
\ No newline at end of file
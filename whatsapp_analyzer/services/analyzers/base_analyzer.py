@@ -1,20 +1,94 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Dict, FrozenSet, List, Sequence
 from ...models.message import Message
+from ...models.message_store import MessageStore
+from .features import MessageFeatures, build_matcher
+from .lexicon import Term
 
 class BaseAnalyzer(ABC):
     """Base interface for all chat analyzers."""
-    
-    def __init__(self, messages: List[Message]):
+
+    # Message fields the analyzer reads besides the epoch. When only some
+    # analyzers run, the parser leaves fields that none of them need empty.
+    required_fields: FrozenSet[str] = frozenset({'timestamp', 'sender', 'message'})
+
+    # Derived values the analyzer reads from ``MessageFeatures``, e.g. ``words``.
+    # If any analyzer in a run needs one, all analyzers are passed
+    # MessageFeatures wrappers instead of the plain messages.
+    required_features: FrozenSet[str] = frozenset()
+
+    # Lexicons the analyzer reads through the ``hits`` feature, by category.
+    # The lexicons of all analyzers in a run are matched together in one scan.
+    lexicons: Dict[str, List[Term]] = {}
+
+    def __init__(self, messages: Sequence[Message]):
         self.messages = messages
-        
+
     @abstractmethod
     def analyze(self) -> Dict[str, Any]:
         """Perform analysis and return results."""
         pass
-    
+
     @property
     @abstractmethod
     def name(self) -> str:
         """Return the name of the analyzer."""
-        pass 
\ No newline at end of file
+        pass
+
+
+class SinglePassAnalyzer(BaseAnalyzer):
+    """Analyzer that consumes messages one at a time.
+
+    Subclasses keep their running state between ``reset`` and ``finalize``,
+    which lets the analysis engine feed every analyzer from a single pass over
+    the messages. ``analyze`` still works on its own for standalone use.
+    """
+
+    def __init__(self, messages: Sequence[Message] = None):
+        super().__init__(messages)
+        self.reset()
+
+    @abstractmethod
+    def reset(self):
+        """Clear any state collected by a previous run."""
+        pass
+
+    @abstractmethod
+    def process_message(self, msg: Message):
+        """Update the running state with a single message."""
+        pass
+
+    @abstractmethod
+    def finalize(self) -> Dict[str, Any]:
+        """Build the results from the collected state."""
+        pass
+
+    def process_store(self, store: MessageStore) -> bool:
+        """Update the running state with all messages of a MessageStore at once.
+
+        Analyzers that can work on the store's columns directly override this
+        and return True; the default returns False and the messages are then
+        passed to ``process_message`` one by one.
+        """
+        return False
+
+    def merge(self, other: 'SinglePassAnalyzer'):
+        """Fold in the state of an analyzer of the same type that was fed the
+        messages directly following the ones fed to this analyzer.
+
+        After merging, ``finalize`` gives the same results as a single analyzer
+        fed all the messages in order. This is what allows a chat to be
+        analyzed in chunks, e.g. in parallel or incrementally.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support merging")
+
+    def analyze(self) -> Dict[str, Any]:
+        self.reset()
+        if self.required_features:
+            matcher = build_matcher([self])
+            for msg in self.messages:
+                self.process_message(MessageFeatures(msg, matcher))
+        else:
+            for msg in self.messages:
+                self.process_message(msg)
+        return self.finalize()
@@ -1,40 +1,64 @@
-from datetime import datetime
 from typing import Dict, Any
 from collections import defaultdict
-from .base_analyzer import BaseAnalyzer
+from .base_analyzer import SinglePassAnalyzer
 
-class ConversationStarterAnalyzer(BaseAnalyzer):
+class ConversationStarterAnalyzer(SinglePassAnalyzer):
     """Analyzes which users tend to start new conversations."""
 
     CONVERSATION_GAP_MINUTES = 360  # 6 hours gap defines a new conversation
 
+    required_fields = frozenset({'sender'})
+
     @property
     def name(self) -> str:
         return "conversation_starter_analysis"
 
-    def _parse_timestamp(self, timestamp: str) -> datetime:
-        """Parse WhatsApp timestamp format."""
-        try:
-            # Try the format with AM/PM
-            return datetime.strptime(timestamp.replace('\u202f', ' '), "%d/%m/%Y, %I:%M:%S %p")
-        except ValueError:
-            # Try 24-hour format if AM/PM format fails
-            return datetime.strptime(timestamp.replace('\u202f', ' '), "%d/%m/%Y, %H:%M:%S")
-
-    def analyze(self) -> Dict[str, Any]:
-        conversation_starters = defaultdict(int)
-        last_message_time = None
-        
-        for msg in self.messages:
-            current_time = self._parse_timestamp(msg.timestamp)
-            
-            # If there's no last message or the gap is large enough, this is a new conversation
-            if (last_message_time is None or 
-                (current_time - last_message_time).total_seconds() / 60 > self.CONVERSATION_GAP_MINUTES):
-                conversation_starters[msg.sender] += 1
-            
-            last_message_time = current_time
-        
+    def reset(self):
+        # The first message always starts a conversation. Its sender is kept
+        # apart so a merge can tell whether it continues an earlier chunk.
+        self._first_sender = None
+        self._first_message_time = None
+        self._conversation_starters = defaultdict(int)
+        self._last_message_time = None
+
+    def process_message(self, msg):
+        current_time = msg.epoch
+
+        # If there's no last message or the gap is large enough, this is a new conversation
+        if self._last_message_time is None:
+            self._first_sender = msg.sender
+            self._first_message_time = current_time
+        elif (current_time - self._last_message_time) / 60 > self.CONVERSATION_GAP_MINUTES:
+            self._conversation_starters[msg.sender] += 1
+
+        self._last_message_time = current_time
+
+    def merge(self, other: 'ConversationStarterAnalyzer'):
+        if other._last_message_time is None:
+            return
+        if self._last_message_time is None:
+            self.__dict__.update(other.__dict__)
+            return
+
+        # The other chunk's first message only starts a conversation after a long enough gap
+        if (other._first_message_time - self._last_message_time) / 60 > self.CONVERSATION_GAP_MINUTES:
+            self._conversation_starters[other._first_sender] += 1
+        for user, count in other._conversation_starters.items():
+            self._conversation_starters[user] += count
+        self._last_message_time = other._last_message_time
+
+    def _get_conversation_starters(self) -> Dict[str, int]:
+        """Count conversations started by each user, in order of their first start."""
+        if self._first_sender is None:
+            return {}
+        conversation_starters = {self._first_sender: 1}
+        for user, count in self._conversation_starters.items():
+            conversation_starters[user] = conversation_starters.get(user, 0) + count
+        return conversation_starters
+
+    def finalize(self) -> Dict[str, Any]:
+        conversation_starters = self._get_conversation_starters()
+
         # Calculate percentages
         total_conversations = sum(conversation_starters.values())
         starter_percentages = {
@@ -43,7 +67,7 @@ class ConversationStarterAnalyzer(BaseAnalyzer):
         }
         
         return {
-            "conversation_starters_count": dict(conversation_starters),
+            "conversation_starters_count": conversation_starters,
             "starter_percentages": starter_percentages,
             "top_starter": max(conversation_starters.items(), key=lambda x: x[1]) if conversation_starters else None
-        } 
\ No newline at end of file
+        }
\ No newline at end of file
@@ -1,82 +1,84 @@
-import re
 from collections import Counter
-from typing import Dict, Any, Set
-from .base_analyzer import BaseAnalyzer
+from typing import Dict, Any, Optional, Set
+from .base_analyzer import SinglePassAnalyzer
+from .emoji_sequences import canonical_emoji
+from .top_k_sketch import TopKSketch
 
-class EmojiAnalyzer(BaseAnalyzer):
-    """Analyzer for emoji usage patterns."""
+class EmojiAnalyzer(SinglePassAnalyzer):
+    """Analyzer for emoji usage patterns.
 
-    def __init__(self, messages, heart_emojis: Set[str]):
+    Emojis are counted exactly by default. With ``top_k_capacity``, they are
+    counted in a ``TopKSketch`` of that many emojis instead; a top emoji's
+    count may then be too high by up to the number of emojis divided by
+    ``top_k_capacity``.
+    """
+
+    LOVE_TERMS = ['iloveyou', 'love you', 'love']
+    # Emojis counted in approximate mode; None counts all emojis exactly
+    TOP_K_CAPACITY = None
+
+    required_fields = frozenset({'message'})
+    required_features = frozenset({'emojis', 'hits'})
+
+    def __init__(self, messages, heart_emojis: Set[str] = None, top_k_capacity: Optional[int] = None):
+        self.heart_emojis = heart_emojis or set()
+        self.top_k_capacity = top_k_capacity or self.TOP_K_CAPACITY
+        # Hearts are counted as one emoji, however they are written
+        self._hearts = {canonical_emoji(emoji) for emoji in self.heart_emojis}
+        self.lexicons = {'love': self.LOVE_TERMS, 'hearts': sorted(self.heart_emojis)}
         super().__init__(messages)
-        self.heart_emojis = heart_emojis
-        self._emoji_pattern = re.compile(
-            u'[\U0001F600-\U0001F64F'
-            u'\U0001F300-\U0001F5FF'
-            u'\U0001F680-\U0001F6FF'
-            u'\U0001F700-\U0001F77F'
-            u'\U0001F780-\U0001F7FF'
-            u'\U0001F800-\U0001F8FF'
-            u'\U0001F900-\U0001F9FF'
-            u'\U0001FA00-\U0001FA6F'
-            u'\U0001FA70-\U0001FAFF'
-            u'\U00002702-\U000027B0'
-            u'\U000024C2-\U0001F251'
-            u'\u2600-\u27BF'
-            u'\u2300-\u23FF'
-            u'\u2B50'
-            u'\u2934-\u2935'
-            u'\u2B06'
-            u'\u2194-\u21AA'
-            u'\u2934-\u2935'
-            ']+', flags=re.UNICODE
-        )
 
     @property
     def name(self) -> str:
         return "emoji_analysis"
 
-    def analyze(self) -> Dict[str, Any]:
+    def reset(self):
+        self._emoji_counter = TopKSketch(self.top_k_capacity) if self.top_k_capacity else Counter()
+        self._love_count = 0
+
+    def process_message(self, msg):
+        emojis = msg.emojis
+        if emojis:
+            if self.top_k_capacity:
+                # Variants share one counter, so none is dropped from the sketch on its own
+                self._emoji_counter.update(map(self._combined_emoji, emojis))
+            else:
+                self._emoji_counter.update(emojis)
+        hits = msg.hits
+        if 'love' in hits:
+            self._love_count += 1
+        if 'hearts' in hits:
+            self._love_count += 1
+
+    def merge(self, other: 'EmojiAnalyzer'):
+        if self.top_k_capacity:
+            self._emoji_counter.merge(other._emoji_counter)
+        else:
+            self._emoji_counter.update(other._emoji_counter)
+        self._love_count += other._love_count
+
+    def finalize(self) -> Dict[str, Any]:
         return {
             "top_emojis": self._get_top_emojis(),
-            "love_count": self._count_love()
+            "love_count": self._love_count
         }
 
-    def _extract_emojis(self, message: str):
-        """Extract emojis from a message."""
-        return self._emoji_pattern.findall(message)
-
     def _get_top_emojis(self, limit: int = 8):
         """Find most used emojis."""
-        emoji_counter = Counter()
-        
-        for msg in self.messages:
-            emojis = self._extract_emojis(msg.message)
-            for emoji in emojis:
-                for single_emoji in emoji:
-                    if single_emoji in self.heart_emojis:
-                        emoji_counter['❤️'] += 1
-                    else:
-                        emoji_counter[single_emoji] += 1
-        
+        if self.top_k_capacity:
+            emoji_counts = self._emoji_counter
+        else:
+            # Emojis are counted as written; variants of the same emoji and all
+            # hearts are combined once here instead of for every occurrence
+            emoji_counts = Counter()
+            for emoji, count in self._emoji_counter.items():
+                emoji_counts[self._combined_emoji(emoji)] += count
         return [
             {"emoji": emoji, "count": count}
-            for emoji, count in emoji_counter.most_common(limit)
+            for emoji, count in emoji_counts.most_common(limit)
         ]
 
-    def _count_love(self):
-        """Count love expressions."""
-        love_patterns = [
-            r'\biloveyou\b',
-            r'\blove\s+you\b',
-            r'\blove\b'
-        ]
-        emoji_pattern = re.compile('|'.join(re.escape(emoji) for emoji in self.heart_emojis), re.UNICODE)
-        count = 0
-        
-        for msg in self.messages:
-            if any(re.search(pattern, msg.message, re.IGNORECASE) for pattern in love_patterns):
-                count += 1
-            if emoji_pattern.search(msg.message):
-                count += 1
-        
-        return count 
\ No newline at end of file
+    def _combined_emoji(self, emoji: str) -> str:
+        """The emoji its variants are counted as, with all hearts counted as one."""
+        emoji = canonical_emoji(emoji)
+        return '❤️' if emoji in self._hearts else emoji
@@ -0,0 +1,161 @@
+"""Finding whole emoji in text.
+
+An emoji can consist of several codepoints: a base with a variation selector
+or skin tone modifier, a flag made of two regional indicators, a keycap, or
+several emoji joined with zero width joiners, e.g. a family. Every codepoint
+up to U+1FFFF is classified once in a table, and the pattern that matches
+whole emoji sequences is generated from that table, so a message is split
+into emoji in a single scan.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+# Codepoint classes
+OTHER = 0
+EMOJI = 1     # Shown as emoji by default
+SYMBOL = 2    # Shown as text by default, but mostly meant as emoji
+TEXT = 3      # Only an emoji when followed by VS16, e.g. the copyright sign
+MODIFIER = 4  # Skin tones
+REGIONAL = 5  # Regional indicators, in pairs forming flags
+
+ZWJ = 0x200D
+VS15 = 0xFE0E
+VS16 = 0xFE0F
+KEYCAP = 0x20E3
+TAG_RANGE = (0xE0020, 0xE007E)
+CANCEL_TAG = 0xE007F
+KEYCAP_BASES = '0123456789#*'
+
+# (first, last, class) in order; later ranges override earlier ones
+_CLASS_RANGES: List[Tuple[int, int, int]] = [
+    # Miscellaneous symbols and dingbats
+    (0x2600, 0x27BF, SYMBOL),
+    (0x2194, 0x2199, SYMBOL), (0x21A9, 0x21AA, SYMBOL), (0x231A, 0x231B, SYMBOL),
+    (0x2328, 0x2328, SYMBOL), (0x23CF, 0x23CF, SYMBOL), (0x23E9, 0x23F3, SYMBOL),
+    (0x23F8, 0x23FA, SYMBOL), (0x25AA, 0x25AB, SYMBOL), (0x25B6, 0x25B6, SYMBOL),
+    (0x25C0, 0x25C0, SYMBOL), (0x25FB, 0x25FE, SYMBOL), (0x2934, 0x2935, SYMBOL),
+    (0x2B05, 0x2B07, SYMBOL), (0x2B1B, 0x2B1C, SYMBOL), (0x2B50, 0x2B50, SYMBOL),
+    (0x2B55, 0x2B55, SYMBOL),
+    (0x00A9, 0x00A9, TEXT), (0x00AE, 0x00AE, TEXT), (0x203C, 0x203C, TEXT),
+    (0x2049, 0x2049, TEXT), (0x2122, 0x2122, TEXT), (0x2139, 0x2139, TEXT),
+    (0x24C2, 0x24C2, TEXT), (0x3030, 0x3030, TEXT), (0x303D, 0x303D, TEXT),
+    (0x3297, 0x3297, TEXT), (0x3299, 0x3299, TEXT),
+    # Symbols in the basic plane that are shown as emoji by default
+    (0x231A, 0x231B, EMOJI), (0x23E9, 0x23EC, EMOJI), (0x23F0, 0x23F0, EMOJI),
+    (0x23F3, 0x23F3, EMOJI), (0x25FD, 0x25FE, EMOJI), (0x2614, 0x2615, EMOJI),
+    (0x2648, 0x2653, EMOJI), (0x267F, 0x267F, EMOJI), (0x2693, 0x2693, EMOJI),
+    (0x26A1, 0x26A1, EMOJI), (0x26AA, 0x26AB, EMOJI), (0x26BD, 0x26BE, EMOJI),
+    (0x26C4, 0x26C5, EMOJI), (0x26CE, 0x26CE, EMOJI), (0x26D4, 0x26D4, EMOJI),
+    (0x26EA, 0x26EA, EMOJI), (0x26F2, 0x26F3, EMOJI), (0x26F5, 0x26F5, EMOJI),
+    (0x26FA, 0x26FA, EMOJI), (0x26FD, 0x26FD, EMOJI), (0x2705, 0x2705, EMOJI),
+    (0x270A, 0x270B, EMOJI), (0x2728, 0x2728, EMOJI), (0x274C, 0x274C, EMOJI),
+    (0x274E, 0x274E, EMOJI), (0x2753, 0x2755, EMOJI), (0x2757, 0x2757, EMOJI),
+    (0x2795, 0x2797, EMOJI), (0x27B0, 0x27B0, EMOJI), (0x27BF, 0x27BF, EMOJI),
+    (0x2B1B, 0x2B1C, EMOJI), (0x2B50, 0x2B50, EMOJI), (0x2B55, 0x2B55, EMOJI),
+    # Emoji blocks of the supplementary plane
+    (0x1F004, 0x1F004, EMOJI), (0x1F0CF, 0x1F0CF, EMOJI), (0x1F170, 0x1F171, SYMBOL),
+    (0x1F17E, 0x1F17F, SYMBOL), (0x1F18E, 0x1F18E, EMOJI), (0x1F191, 0x1F19A, EMOJI),
+    (0x1F201, 0x1F202, EMOJI), (0x1F21A, 0x1F21A, EMOJI), (0x1F22F, 0x1F22F, EMOJI),
+    (0x1F232, 0x1F23A, EMOJI), (0x1F250, 0x1F251, EMOJI), (0x1F300, 0x1F64F, EMOJI),
+    (0x1F680, 0x1F6FF, EMOJI), (0x1F7E0, 0x1F7EB, EMOJI), (0x1F7F0, 0x1F7F0, EMOJI),
+    (0x1F90C, 0x1F9FF, EMOJI), (0x1FA70, 0x1FAFF, EMOJI),
+    # Pictographs there that are shown as text by default
+    (0x1F202, 0x1F202, SYMBOL), (0x1F237, 0x1F237, SYMBOL), (0x1F321, 0x1F321, SYMBOL),
+    (0x1F324, 0x1F32C, SYMBOL), (0x1F336, 0x1F336, SYMBOL), (0x1F37D, 0x1F37D, SYMBOL),
+    (0x1F396, 0x1F397, SYMBOL), (0x1F399, 0x1F39B, SYMBOL), (0x1F39E, 0x1F39F, SYMBOL),
+    (0x1F3CB, 0x1F3CE, SYMBOL), (0x1F3D4, 0x1F3DF, SYMBOL), (0x1F3F3, 0x1F3F3, SYMBOL),
+    (0x1F3F5, 0x1F3F5, SYMBOL), (0x1F3F7, 0x1F3F7, SYMBOL), (0x1F43F, 0x1F43F, SYMBOL),
+    (0x1F441, 0x1F441, SYMBOL), (0x1F4FD, 0x1F4FD, SYMBOL), (0x1F549, 0x1F54A, SYMBOL),
+    (0x1F56F, 0x1F570, SYMBOL), (0x1F573, 0x1F579, SYMBOL), (0x1F587, 0x1F587, SYMBOL),
+    (0x1F58A, 0x1F58D, SYMBOL), (0x1F590, 0x1F590, SYMBOL), (0x1F5A5, 0x1F5A5, SYMBOL),
+    (0x1F5A8, 0x1F5A8, SYMBOL), (0x1F5B1, 0x1F5B2, SYMBOL), (0x1F5BC, 0x1F5BC, SYMBOL),
+    (0x1F5C2, 0x1F5C4, SYMBOL), (0x1F5D1, 0x1F5D3, SYMBOL), (0x1F5DC, 0x1F5DE, SYMBOL),
+    (0x1F5E1, 0x1F5E1, SYMBOL), (0x1F5E3, 0x1F5E3, SYMBOL), (0x1F5E8, 0x1F5E8, SYMBOL),
+    (0x1F5EF, 0x1F5EF, SYMBOL), (0x1F5F3, 0x1F5F3, SYMBOL), (0x1F5FA, 0x1F5FA, SYMBOL),
+    (0x1F6CB, 0x1F6CB, SYMBOL), (0x1F6CD, 0x1F6CF, SYMBOL), (0x1F6E0, 0x1F6E5, SYMBOL),
+    (0x1F6E9, 0x1F6E9, SYMBOL), (0x1F6F0, 0x1F6F0, SYMBOL), (0x1F6F3, 0x1F6F3, SYMBOL),
+    (0x1F3FB, 0x1F3FF, MODIFIER),
+    (0x1F1E6, 0x1F1FF, REGIONAL),
+]
+
+
+def _build_table() -> bytearray:
+    table = bytearray(0x20000)
+    for first, last, codepoint_class in _CLASS_RANGES:
+        table[first:last + 1] = bytes([codepoint_class]) * (last - first + 1)
+    return table
+
+
+# Class of every codepoint up to U+1FFFF
+CODEPOINT_CLASSES = _build_table()
+
+
+def codepoint_class(char: str) -> int:
+    codepoint = ord(char)
+    return CODEPOINT_CLASSES[codepoint] if codepoint < len(CODEPOINT_CLASSES) else OTHER
+
+
+def _char(codepoint: int) -> str:
+    return '\\U%08x' % codepoint
+
+
+def _char_class(*classes: int) -> str:
+    """A regex character class of all codepoints in the given classes."""
+    runs = re.finditer(b'[' + re.escape(bytes(classes)) + b']+', CODEPOINT_CLASSES)
+    ranges = [
+        _char(run.start()) if run.end() - run.start() == 1 else f'{_char(run.start())}-{_char(run.end() - 1)}'
+        for run in runs
+    ]
+    return '[' + ''.join(ranges) + ']'
+
+
+def _build_pattern():
+    start = _char_class(EMOJI, SYMBOL, TEXT, MODIFIER, REGIONAL)
+    base = _char_class(EMOJI, SYMBOL)
+    text = _char_class(TEXT)
+    modifier = _char_class(MODIFIER)
+    regional = _char_class(REGIONAL)
+    tags = f'(?:[{_char(TAG_RANGE[0])}-{_char(TAG_RANGE[1])}]+{_char(CANCEL_TAG)})'
+    keycap = f'[{re.escape(KEYCAP_BASES)}]{_char(VS16)}?{_char(KEYCAP)}'
+    element = (
+        # A base followed by VS15 is meant as text
+        f'(?:(?:{base}(?!{_char(VS15)}){_char(VS16)}?|{text}{_char(VS16)}){modifier}?{tags}?'
+        f'|{regional}{regional}|{keycap}|{modifier}|{regional})'
+    )
+    # Checking the first character against a single class first lets the
+    # scan skip over text quickly
+    return re.compile(f'(?={start}|{keycap}){element}(?:{_char(ZWJ)}{element})*')
+
+
+# Whole emoji, including sequences of several codepoints
+EMOJI_SEQUENCE_PATTERN = _build_pattern()
+
+
+def extract_emojis(text: str) -> List[str]:
+    """All emoji in a text, each as written."""
+    # Emoji are never plain ASCII, which rules out most messages at once
+    if text.isascii():
+        return []
+    return EMOJI_SEQUENCE_PATTERN.findall(text)
+
+
+@lru_cache(maxsize=4096)
+def canonical_emoji(emoji: str) -> str:
+    """The usual way to write an emoji, so variants with and without
+    variation selectors are counted together, e.g. a plain heart symbol and
+    the heart emoji.
+    """
+    chars = [char for char in emoji if ord(char) not in (VS15, VS16)]
+    if chars and ord(chars[-1]) == KEYCAP:
+        return chars[0] + chr(VS16) + chr(KEYCAP)
+
+    result = []
+    for i, char in enumerate(chars):
+        result.append(char)
+        following = chars[i + 1] if i + 1 < len(chars) else None
+        if (codepoint_class(char) in (SYMBOL, TEXT) and
+                (following is None or codepoint_class(following) != MODIFIER)):
+            result.append(chr(VS16))
+    return ''.join(result)
@@ -0,0 +1,157 @@
+import re
+from typing import Dict, List, Optional
+from ...models.message import Message
+from .emoji_sequences import extract_emojis
+from .lexicon import LexiconMatcher, merge_lexicons
+
+# Runs of consecutive emoji characters
+EMOJI_PATTERN = re.compile(
+    u'[\U0001F600-\U0001F64F'
+    u'\U0001F300-\U0001F5FF'
+    u'\U0001F680-\U0001F6FF'
+    u'\U0001F700-\U0001F77F'
+    u'\U0001F780-\U0001F7FF'
+    u'\U0001F800-\U0001F8FF'
+    u'\U0001F900-\U0001F9FF'
+    u'\U0001FA00-\U0001FA6F'
+    u'\U0001FA70-\U0001FAFF'
+    u'\U00002702-\U000027B0'
+    u'\U000024C2-\U0001F251'
+    u'\u2600-\u27BF'
+    u'\u2300-\u23FF'
+    u'\u2B50'
+    u'\u2934-\u2935'
+    u'\u2B06'
+    u'\u2194-\u21AA'
+    u'\u2934-\u2935'
+    ']+', flags=re.UNICODE
+)
+
+# Simple sentiment indicators (can be expanded)
+SENTIMENT_LEXICONS = {
+    'positive': [
+        '😊', '😄', '😃', '❤️', '💕', '👍', '♥️', '😍', '🥰',  # positive emojis
+        'haha', 'lol', 'lmao', 'xd', 'love', 'thanks', 'great', 'awesome', 'nice',  # positive words
+    ],
+    'negative': [
+        '😢', '😭', '😠', '😡', '👎', '😕', '😞', '😔',  # negative emojis
+        'sad', 'angry', 'upset', 'sorry', 'bad', 'hate', 'terrible', 'awful',  # negative words
+    ],
+}
+
+_word_pattern = re.compile(r'\b\w+\b', re.UNICODE)
+
+
+def sentiment_from_hits(hits: Dict[str, int]) -> float:
+    """Sentiment between -1 and 1 from positive and negative lexicon hits, 0 without any."""
+    positive_count = hits.get('positive', 0)
+    negative_count = hits.get('negative', 0)
+
+    if positive_count == 0 and negative_count == 0:
+        return 0
+    return (positive_count - negative_count) / (positive_count + negative_count)
+
+
+def build_matcher(analyzers) -> Optional[LexiconMatcher]:
+    """One matcher for the lexicons of all analyzers, or None if there are none.
+
+    The sentiment lexicons are added when an analyzer needs the sentiment
+    feature and does not define its own.
+    """
+    lexicons = merge_lexicons(*(analyzer.lexicons for analyzer in analyzers))
+    if any('sentiment' in analyzer.required_features for analyzer in analyzers):
+        for category, terms in SENTIMENT_LEXICONS.items():
+            lexicons.setdefault(category, terms)
+    return LexiconMatcher(lexicons) if lexicons else None
+
+
+class MessageFeatures:
+    """A message together with values derived from its text.
+
+    Each derived value is computed the first time an analyzer reads it and is
+    then shared by all analyzers in the run. The message fields themselves are
+    available under the usual names, so analyzers can use the wrapper in place
+    of the message.
+    """
+
+    FEATURES = frozenset({'lowered', 'words', 'lowered_words', 'emoji_runs', 'emojis', 'hits',
+                          'sentiment'})
+
+    __slots__ = ('source', 'sender', 'epoch', 'matcher', '_message', '_lowered', '_words',
+                 '_lowered_words', '_emoji_runs', '_emojis', '_hits', '_sentiment')
+
+    def __init__(self, msg: Message, matcher: Optional[LexiconMatcher] = None):
+        self.source = msg
+        self.matcher = matcher
+        self.sender = msg.sender
+        self.epoch = msg.epoch
+        self._message = None
+        self._lowered = None
+        self._words = None
+        self._lowered_words = None
+        self._emoji_runs = None
+        self._emojis = None
+        self._hits = None
+        self._sentiment = None
+
+    @property
+    def timestamp(self) -> str:
+        return self.source.timestamp
+
+    @property
+    def message(self) -> str:
+        if self._message is None:
+            self._message = self.source.message
+        return self._message
+
+    @property
+    def lowered(self) -> str:
+        """The message text in lower case."""
+        if self._lowered is None:
+            self._lowered = self.message.lower()
+        return self._lowered
+
+    @property
+    def words(self) -> List[str]:
+        """Words of the message as written."""
+        if self._words is None:
+            self._words = _word_pattern.findall(self.message)
+        return self._words
+
+    @property
+    def lowered_words(self) -> List[str]:
+        """Words of the message in lower case."""
+        if self._lowered_words is None:
+            self._lowered_words = [word.lower() for word in self.words]
+        return self._lowered_words
+
+    @property
+    def emoji_runs(self) -> List[str]:
+        """Runs of consecutive emoji characters in the message."""
+        if self._emoji_runs is None:
+            self._emoji_runs = EMOJI_PATTERN.findall(self.message)
+        return self._emoji_runs
+
+    @property
+    def emojis(self) -> List[str]:
+        """Whole emoji in the message, including ones made of several codepoints."""
+        if self._emojis is None:
+            self._emojis = extract_emojis(self.message)
+        return self._emojis
+
+    @property
+    def hits(self) -> Dict[str, int]:
+        """Hits per lexicon category of the run's ``LexiconMatcher``."""
+        if self._hits is None:
+            self._hits = self.matcher.count(self.message, self.lowered_words) if self.matcher else {}
+        return self._hits
+
+    @property
+    def sentiment(self) -> float:
+        """Sentiment score of the message from its positive and negative lexicon hits."""
+        if self._sentiment is None:
+            self._sentiment = sentiment_from_hits(self.hits)
+        return self._sentiment
+
+    def __repr__(self) -> str:
+        return f"MessageFeatures({self.source!r})"
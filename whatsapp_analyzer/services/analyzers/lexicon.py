@@ -0,0 +1,141 @@
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Sequence, Tuple, Union
+
+Term = Union[str, Pattern]
+
+_word_pattern = re.compile(r'\b\w+\b', re.UNICODE)
+_single_word = re.compile(r'\w+', re.UNICODE)
+
+class LexiconMatcher:
+    """Counts the hits of several lexicons in a message in one go.
+
+    A lexicon maps a category name to its terms. Each term is one of:
+
+    - a word such as ``"love"``, which matches whole words, ignoring case,
+    - a phrase such as ``"love you"``, which matches consecutive words,
+    - a compiled pattern, which must match a whole lowercased word, e.g.
+      ``re.compile(r'(h+a+)+')`` for laughter,
+    - anything else, e.g. an emoji, which matches wherever it occurs.
+
+    Words are looked up per distinct word and the result is cached, and all
+    symbols are found with a single scan of the text, so the cost per message
+    hardly depends on the size of the lexicons.
+    """
+
+    MAX_CACHED_WORDS = 1 << 16
+
+    def __init__(self, lexicons: Dict[str, Iterable[Term]]):
+        self.lexicons = {category: list(terms) for category, terms in lexicons.items()}
+        self._words: Dict[str, List[str]] = {}
+        self._word_patterns: List[Tuple[Pattern, str]] = []
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+        symbols: Dict[str, List[str]] = {}
+
+        for category, terms in self.lexicons.items():
+            for term in terms:
+                if isinstance(term, re.Pattern):
+                    self._word_patterns.append((term, category))
+                elif _single_word.fullmatch(term):
+                    categories = self._words.setdefault(term.lower(), [])
+                    if category not in categories:
+                        categories.append(category)
+                elif all(_single_word.fullmatch(part) for part in term.split()):
+                    first, *rest = term.lower().split()
+                    self._phrases.setdefault(first, []).append((tuple(rest), category))
+                elif term:
+                    symbols.setdefault(category, []).append(term)
+
+        self._word_cache: Dict[str, Tuple[str, ...]] = {}
+        self._build_symbol_table(symbols)
+
+    def _build_symbol_table(self, symbols: Dict[str, List[str]]):
+        """Index the symbols of all categories by their first character.
+
+        When one symbol contains symbols of other categories, e.g. a heart
+        with a flame containing the plain heart, a match of the longer one
+        also counts the contained hits, as separate scans per category would.
+        """
+        category_patterns = {
+            category: re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)))
+            for category, terms in symbols.items()
+        }
+        self._symbols: Dict[str, List[Tuple[str, Tuple[Tuple[str, int], ...]]]] = {}
+        for term in sorted({term for terms in symbols.values() for term in terms}, key=len, reverse=True):
+            hits = []
+            for category, pattern in category_patterns.items():
+                count = len(pattern.findall(term))
+                if count:
+                    hits.append((category, count))
+            self._symbols.setdefault(term[0], []).append((term, tuple(hits)))
+
+        self._symbol_start = re.compile(
+            '[' + ''.join(re.escape(char) for char in self._symbols) + ']'
+        ) if self._symbols else None
+
+    def count(self, text: str, words: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """Count hits per category in a message; categories without hits are left out.
+
+        ``words`` are the lowercased words of the text, if already known.
+        """
+        counts: Dict[str, int] = {}
+        if words is None:
+            words = [word.lower() for word in _word_pattern.findall(text)]
+
+        if self._words or self._word_patterns:
+            cache = self._word_cache
+            for word in words:
+                categories = cache.get(word)
+                if categories is None:
+                    categories = self._classify(word)
+                for category in categories:
+                    counts[category] = counts.get(category, 0) + 1
+
+        if self._phrases:
+            phrases = self._phrases
+            for i, word in enumerate(words):
+                for rest, category in phrases.get(word, ()):
+                    if tuple(words[i + 1:i + 1 + len(rest)]) == rest:
+                        counts[category] = counts.get(category, 0) + 1
+
+        if self._symbol_start is not None:
+            search = self._symbol_start.search
+            symbols = self._symbols
+            pos = 0
+            while match := search(text, pos):
+                start = match.start()
+                pos = start + 1
+                for term, hits in symbols[text[start]]:
+                    if text.startswith(term, start):
+                        for category, hit_count in hits:
+                            counts[category] = counts.get(category, 0) + hit_count
+                        pos = start + len(term)
+                        break
+
+        return counts
+
+    def _classify(self, word: str) -> Tuple[str, ...]:
+        """Find the categories a word belongs to and cache them."""
+        categories = list(self._words.get(word, ()))
+        for pattern, category in self._word_patterns:
+            if category not in categories and pattern.fullmatch(word):
+                categories.append(category)
+
+        if len(self._word_cache) >= self.MAX_CACHED_WORDS:
+            self._word_cache.clear()
+        result = self._word_cache[word] = tuple(categories)
+        return result
+
+
+def merge_lexicons(*lexicons: Dict[str, Iterable[Term]]) -> Dict[str, List[Term]]:
+    """Combine lexicons, e.g. of all analyzers in a run, into one.
+
+    Categories of the same name must have the same terms.
+    """
+    merged: Dict[str, List[Term]] = {}
+    for lexicon in lexicons:
+        for category, terms in lexicon.items():
+            terms = list(terms)
+            if category in merged and merged[category] != terms:
+                raise ValueError(f"Lexicon category '{category}' is defined with different terms")
+            merged[category] = terms
+    return merged
@@ -0,0 +1,83 @@
+import math
+from typing import Dict, Optional
+
+# Bucket of each value seen so far, per accuracy. Response times and the like
+# repeat a lot, so this saves computing logarithms.
+_BUCKET_CACHE_SIZE = 1 << 16
+_bucket_keys: Dict[float, Dict[float, int]] = {}
+
+class QuantileSketch:
+    """Streaming quantile estimates with a bounded relative error.
+
+    Values are counted in logarithmically sized buckets, so every estimate is
+    within ``relative_accuracy`` of a value that was added, and the memory
+    depends on the range of the values rather than on how many were added.
+    Sketches with the same accuracy merge exactly by adding their counts,
+    which keeps results the same however a chat is split into chunks.
+    """
+
+    __slots__ = ('relative_accuracy', 'count', '_log_gamma', '_positive', '_negative', '_zero_count')
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+        self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zero_count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value > 0:
+            keys = _bucket_keys.get(self.relative_accuracy)
+            if keys is None or len(keys) >= _BUCKET_CACHE_SIZE:
+                keys = _bucket_keys[self.relative_accuracy] = {}
+            key = keys.get(value)
+            if key is None:
+                key = keys[value] = math.ceil(math.log(value) / self._log_gamma)
+            self._positive[key] = self._positive.get(key, 0) + 1
+        elif value < 0:
+            key = math.ceil(math.log(-value) / self._log_gamma)
+            self._negative[key] = self._negative.get(key, 0) + 1
+        else:
+            self._zero_count += 1
+
+    def merge(self, other: 'QuantileSketch'):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracies")
+        self.count += other.count
+        self._zero_count += other._zero_count
+        for key, count in other._positive.items():
+            self._positive[key] = self._positive.get(key, 0) + count
+        for key, count in other._negative.items():
+            self._negative[key] = self._negative.get(key, 0) + count
+
+    def copy(self) -> 'QuantileSketch':
+        sketch = QuantileSketch(self.relative_accuracy)
+        sketch.merge(self)
+        return sketch
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the value below which a fraction q of the values lie."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self._zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._positive):
+            seen += self._positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+
+    def _bucket_value(self, key: int) -> float:
+        """The value in the middle of a bucket, in terms of relative error."""
+        gamma = math.exp(self._log_gamma)
+        return 2 * gamma ** key / (gamma + 1)
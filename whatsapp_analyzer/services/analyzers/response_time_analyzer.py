@@ -1,50 +1,260 @@
-from datetime import datetime
-from typing import Dict, Any
-from collections import defaultdict
-from .base_analyzer import BaseAnalyzer
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Any, List, Optional
+from .base_analyzer import SinglePassAnalyzer
+from .quantile_sketch import QuantileSketch
 
-class ResponseTimeAnalyzer(BaseAnalyzer):
-    """Analyzes response times between users in the chat."""
+class ResponseTimeAnalyzer(SinglePassAnalyzer):
+    """Analyzes response times between users in the chat.
+
+    By default a message responds to the latest message of every other user
+    from the last 12 hours. In ``"reply"`` mode it only responds to the
+    message right before it, if another user wrote that, which costs the same
+    per message however many users the chat has.
+
+    Per pair of users only fixed-size statistics and a quantile sketch are
+    kept, so memory does not grow with the number of messages.
+    """
+
+    RESPONSE_WINDOW_MINUTES = 720  # Only count responses within 12 hours
+    RESPONSE_MODES = ('all', 'reply')
+    RESPONSE_MODE = 'all'
+    PERCENTILES = (50, 90, 99)
+    SKETCH_ACCURACY = 0.01
+
+    required_fields = frozenset({'sender'})
+
+    def __init__(self, messages=None, response_mode: str = None):
+        self.response_mode = response_mode or self.RESPONSE_MODE
+        if self.response_mode not in self.RESPONSE_MODES:
+            raise ValueError(f"Unknown response mode '{self.response_mode}', expected one of: "
+                             f"{', '.join(self.RESPONSE_MODES)}")
+        super().__init__(messages)
 
     @property
     def name(self) -> str:
         return "response_time_analysis"
 
-    def _parse_timestamp(self, timestamp: str) -> datetime:
-        """Parse WhatsApp timestamp format."""
-        try:
-            # Try the format with AM/PM
-            return datetime.strptime(timestamp.replace('\u202f', ' '), "%d/%m/%Y, %I:%M:%S %p")
-        except ValueError:
-            # Try 24-hour format if AM/PM format fails
-            return datetime.strptime(timestamp.replace('\u202f', ' '), "%d/%m/%Y, %H:%M:%S")
-
-    def analyze(self) -> Dict[str, Any]:
-        response_times = defaultdict(list)
-        user_last_message = {}
-        
-        for msg in self.messages:
-            current_time = self._parse_timestamp(msg.timestamp)
-            current_sender = msg.sender
-            
-            # Check for responses to other users
-            for other_user, last_msg_time in user_last_message.items():
-                if other_user != current_sender:
-                    time_diff = (current_time - last_msg_time).total_seconds() / 60  # in minutes
-                    # Only count responses within 12 hours to avoid counting new conversation starts
-                    if time_diff <= 720:  # 12 hours in minutes
-                        response_times[f"{other_user}->{current_sender}"].append(time_diff)
-            
-            user_last_message[current_sender] = current_time
-        
-        # Calculate average response times
+    def reset(self):
+        # Senders by ID, in the order they first wrote
+        self._senders: List[str] = []
+        self._sender_ids: Dict[str, int] = {}
+        # Time of each sender's latest message, by ID
+        self._last_times: List[Optional[int]] = []
+        # Senders who wrote in the last 12 hours, by ID, least recent first
+        self._recent = OrderedDict()
+        self._latest_time = None
+        self._last_sender = None
+        self._last_time = None
+        # Per (responded-to user, responder) ID: [number of responses, total
+        # response time, shortest, longest, index of the message with the
+        # first response, sketch of the response times], all in seconds
+        self._response_stats = {}
+        self._message_count = 0
+        # Messages from the first 12 hours, which may also respond to users
+        # from a previous chunk when merging
+        self._first_time = None
+        self._head_messages = []
+
+    def _sender_id(self, sender: str) -> int:
+        sender_id = self._sender_ids.get(sender)
+        if sender_id is None:
+            sender_id = self._sender_ids[sender] = len(self._senders)
+            self._senders.append(sender)
+            self._last_times.append(None)
+        return sender_id
+
+    def process_message(self, msg):
+        current_time = msg.epoch
+        sender_id = self._sender_id(msg.sender)
+        index = self._message_count
+
+        if self._first_time is None:
+            self._first_time = current_time
+        if (current_time - self._first_time) / 60 <= self.RESPONSE_WINDOW_MINUTES:
+            self._head_messages.append((sender_id, current_time))
+
+        if self.response_mode == 'reply':
+            if self._last_sender is not None and self._last_sender != sender_id:
+                self._add_response(self._last_sender, sender_id, current_time - self._last_time, index)
+        else:
+            self._respond_to_all(sender_id, current_time, index)
+
+        self._last_times[sender_id] = current_time
+        self._recent[sender_id] = current_time
+        self._recent.move_to_end(sender_id)
+        self._last_sender = sender_id
+        self._last_time = current_time
+        self._message_count += 1
+
+    def _respond_to_all(self, sender_id: int, current_time: int, index: int):
+        """Record responses to the latest message of every other user."""
+        window = self.RESPONSE_WINDOW_MINUTES * 60
+        pair_count = len(self._response_stats)
+
+        if self._latest_time is None or current_time >= self._latest_time:
+            self._latest_time = current_time
+            # Users who have not written for 12 hours cannot get responses
+            # until they write again, as long as time does not go backwards
+            recent = self._recent
+            while recent:
+                user_id, last_time = next(iter(recent.items()))
+                if current_time - last_time <= window:
+                    break
+                recent.popitem(last=False)
+            users = recent.items()
+        else:
+            users = ((user_id, last_time) for user_id, last_time in enumerate(self._last_times)
+                     if last_time is not None)
+
+        response_stats = self._response_stats
+        for user_id, last_time in users:
+            if user_id != sender_id:
+                time_diff = current_time - last_time
+                stats = response_stats.get((user_id, sender_id))
+                if stats is None or time_diff > window:
+                    self._add_response(user_id, sender_id, time_diff, index)
+                    continue
+                # Same as _add_response, inlined as this runs for most pairs of messages
+                stats[0] += 1
+                stats[1] += time_diff
+                if time_diff < stats[2]:
+                    stats[2] = time_diff
+                elif time_diff > stats[3]:
+                    stats[3] = time_diff
+                stats[5].add(time_diff)
+
+        # Pairs that start with the same message are ordered by when users first wrote
+        new_pairs = len(self._response_stats) - pair_count
+        if new_pairs > 1:
+            stats = self._response_stats
+            for pair in sorted(list(islice(reversed(stats), new_pairs))):
+                stats[pair] = stats.pop(pair)
+
+    def _add_response(self, user_id: int, responder_id: int, time_diff: int, index: int):
+        """Record a response if it came within the response window."""
+        # Only count responses within 12 hours to avoid counting new conversation starts
+        if time_diff / 60 <= self.RESPONSE_WINDOW_MINUTES:
+            stats = self._response_stats.get((user_id, responder_id))
+            if stats is None:
+                sketch = QuantileSketch(self.SKETCH_ACCURACY)
+                sketch.add(time_diff)
+                self._response_stats[(user_id, responder_id)] = [1, time_diff, time_diff, time_diff, index, sketch]
+            else:
+                stats[0] += 1
+                stats[1] += time_diff
+                if time_diff < stats[2]:
+                    stats[2] = time_diff
+                elif time_diff > stats[3]:
+                    stats[3] = time_diff
+                stats[5].add(time_diff)
+
+    def merge(self, other: 'ResponseTimeAnalyzer'):
+        if other._message_count == 0:
+            return
+        if self._message_count == 0:
+            self.__dict__.update(other.__dict__)
+            return
+
+        known_pairs = set(self._response_stats)
+        offset = self._message_count
+        # The other chunk numbers its users on its own
+        ids = [self._sender_id(sender) for sender in other._senders]
+        head_messages = [(ids[sender_id], current_time) for sender_id, current_time in other._head_messages]
+
+        if self.response_mode == 'reply':
+            # Only the first message of the other chunk responds to our last one
+            sender_id, current_time = head_messages[0]
+            if sender_id != self._last_sender:
+                self._add_response(self._last_sender, sender_id, current_time - self._last_time, offset)
+        else:
+            # Early messages of the other chunk also respond to our users who
+            # have not written again in the other chunk yet
+            seen = set()
+            for index, (sender_id, current_time) in enumerate(head_messages):
+                for user_id, last_time in enumerate(self._last_times):
+                    if last_time is not None and user_id != sender_id and user_id not in seen:
+                        self._add_response(user_id, sender_id, current_time - last_time, offset + index)
+                seen.add(sender_id)
+
+        for (user_id, responder_id), (count, total, shortest, longest, index, sketch) in other._response_stats.items():
+            pair = (ids[user_id], ids[responder_id])
+            stats = self._response_stats.get(pair)
+            if stats is None:
+                self._response_stats[pair] = [count, total, shortest, longest, offset + index, sketch.copy()]
+            else:
+                stats[0] += count
+                stats[1] += total
+                stats[2] = min(stats[2], shortest)
+                stats[3] = max(stats[3], longest)
+                stats[4] = min(stats[4], offset + index)
+                stats[5].merge(sketch)
+
+        # Users who wrote in the other chunk are recent as of their latest message there
+        written = set()
+        for sender_id, last_time in enumerate(other._last_times):
+            if last_time is not None:
+                self._last_times[ids[sender_id]] = last_time
+                written.add(ids[sender_id])
+        recent = OrderedDict((user_id, last_time) for user_id, last_time in self._recent.items()
+                             if user_id not in written)
+        recent.update((ids[user_id], last_time) for user_id, last_time in other._recent.items())
+        self._recent = recent
+        if other._latest_time is not None:
+            self._latest_time = max(self._latest_time, other._latest_time)
+        self._last_sender = ids[other._last_sender]
+        self._last_time = other._last_time
+        self._message_count += other._message_count
+        self._head_messages.extend(
+            message for message in head_messages
+            if (message[1] - self._first_time) / 60 <= self.RESPONSE_WINDOW_MINUTES
+        )
+
+        # Order new pairs as a single pass would have created them: by the message
+        # of their first response, then by the order users first wrote in
+        new_pairs = sorted(
+            (pair for pair in self._response_stats if pair not in known_pairs),
+            key=lambda pair: (self._response_stats[pair][4], pair[0])
+        )
+        for pair in new_pairs:
+            self._response_stats[pair] = self._response_stats.pop(pair)
+
+    def finalize(self) -> Dict[str, Any]:
+        senders = self._senders
+
+        # Calculate average response times in minutes
         avg_response_times = {}
-        for user_pair, times in response_times.items():
-            if times:
-                avg_response_times[user_pair] = sum(times) / len(times)
-        
+        percentiles = {}
+        for (user_id, responder_id), (count, total, shortest, longest, _, sketch) in self._response_stats.items():
+            pair = f"{senders[user_id]}->{senders[responder_id]}"
+            avg_response_times[pair] = total / 60 / count
+            # Estimates are kept within the exact range
+            percentiles[pair] = {
+                "min": shortest / 60,
+                **{f"p{p}": min(max(sketch.quantile(p / 100), shortest), longest) / 60 for p in self.PERCENTILES},
+                "max": longest / 60
+            }
+
         return {
             "average_response_times": avg_response_times,
             "fastest_responder": min(avg_response_times.items(), key=lambda x: x[1]) if avg_response_times else None,
-            "slowest_responder": max(avg_response_times.items(), key=lambda x: x[1]) if avg_response_times else None
-        } 
\ No newline at end of file
+            "slowest_responder": max(avg_response_times.items(), key=lambda x: x[1]) if avg_response_times else None,
+            "response_time_percentiles": percentiles,
+            "response_time_matrix": self._get_matrix()
+        }
+
+    def _get_matrix(self) -> Dict[str, Any]:
+        """Average response times in minutes and response counts for every
+        pair of users; rows are the users responded to, columns the responders."""
+        size = len(self._senders)
+        averages = [[None] * size for _ in range(size)]
+        counts = [[0] * size for _ in range(size)]
+        for (user_id, responder_id), (count, total, *_) in self._response_stats.items():
+            averages[user_id][responder_id] = total / 60 / count
+            counts[user_id][responder_id] = count
+
+        return {
+            "senders": list(self._senders),
+            "average_minutes": averages,
+            "responses": counts
+        }
@@ -1,34 +1,45 @@
 import re
 from typing import Dict, Any
-from .base_analyzer import BaseAnalyzer
+from .base_analyzer import SinglePassAnalyzer
 
-class SentimentAnalyzer(BaseAnalyzer):
+class SentimentAnalyzer(SinglePassAnalyzer):
     """Analyzer for sentiment and emotional expressions."""
 
+    # Laughter words, each pattern must match a whole word
+    LAUGHTER_PATTERNS = [
+        r'(h+a+)+',
+        r'(l+o+)+l+',
+        r'(l+m+a+o+)+',
+        r'(l+m+f+a+o+)+'
+    ]
+    LAUGHTER_EMOJIS = ['😂', '🤣']
+
+    lexicons = {
+        'laughter': [re.compile(pattern, re.IGNORECASE) for pattern in LAUGHTER_PATTERNS],
+        'laughter_emoji': LAUGHTER_EMOJIS
+    }
+
+    required_fields = frozenset({'message'})
+    required_features = frozenset({'hits'})
+
     @property
     def name(self) -> str:
         return "sentiment_analysis"
 
-    def analyze(self) -> Dict[str, Any]:
+    def reset(self):
+        self._laughter_count = 0
+
+    def process_message(self, msg):
+        hits = msg.hits
+        if 'laughter' in hits:
+            self._laughter_count += 1
+        if 'laughter_emoji' in hits:
+            self._laughter_count += 1
+
+    def merge(self, other: 'SentimentAnalyzer'):
+        self._laughter_count += other._laughter_count
+
+    def finalize(self) -> Dict[str, Any]:
         return {
-            "laughter_count": self._count_laughter()
+            "laughter_count": self._laughter_count
         }
-
-    def _count_laughter(self):
-        """Count laughter occurrences."""
-        laughter_patterns = [
-            r'\b(h+a+)+\b',
-            r'\b(l+o+)+l+\b',
-            r'\b(l+m+a+o+)+\b',
-            r'\b(l+m+f+a+o+)+\b'
-        ]
-        emoji_pattern = re.compile(r'😂|🤣', re.UNICODE)
-        count = 0
-        
-        for msg in self.messages:
-            if any(re.search(pattern, msg.message, re.IGNORECASE) for pattern in laughter_patterns):
-                count += 1
-            if emoji_pattern.search(msg.message):
-                count += 1
-        
-        return count 
\ No newline at end of file
@@ -1,104 +1,305 @@
-from datetime import datetime
-from typing import Dict, Any, List
-from collections import defaultdict
-import re
-from .base_analyzer import BaseAnalyzer
+from typing import Dict, Any, Optional
+from collections import defaultdict, deque
+from . import features
+from .base_analyzer import SinglePassAnalyzer
 
-class SentimentCorrelationAnalyzer(BaseAnalyzer):
-    """Analyzes how users' sentiments correlate during interactions."""
+class SentimentCorrelationAnalyzer(SinglePassAnalyzer):
+    """Analyzes how users' sentiments correlate during interactions.
+
+    Messages from different users interact when they fall in the same window:
+
+    - ``"tumbling"`` (default): consecutive messages at most 10 minutes apart
+      form a window, and every message interacts with the later messages of
+      its window.
+    - ``"sliding"``: every message interacts with the earlier messages of the
+      last 10 minutes.
+
+    ``max_window_size`` optionally limits a window to its most recent messages,
+    which bounds the memory and time spent on very busy conversations.
+    """
 
     INTERACTION_WINDOW_MINUTES = 10  # Consider messages within 10 minutes as related
-    
+    WINDOW_MODES = ('tumbling', 'sliding')
+    WINDOW_MODE = 'tumbling'
+    MAX_WINDOW_SIZE: Optional[int] = None
+
     # Simple sentiment indicators (can be expanded)
-    POSITIVE_PATTERNS = [
-        r'😊|😄|😃|❤️|💕|👍|♥️|😍|🥰',  # positive emojis
-        r'\b(?:haha|lol|lmao|xd|love|thanks|great|awesome|nice)\b',  # positive words
-    ]
-    
-    NEGATIVE_PATTERNS = [
-        r'😢|😭|😠|😡|👎|😕|😞|😔',  # negative emojis
-        r'\b(?:sad|angry|upset|sorry|bad|hate|terrible|awful)\b',  # negative words
-    ]
+    lexicons = features.SENTIMENT_LEXICONS
+
+    required_fields = frozenset({'sender', 'message'})
+    required_features = frozenset({'sentiment'})
+
+    def __init__(self, messages=None, window_mode: str = None, max_window_size: Optional[int] = None):
+        self.window_mode = window_mode or self.WINDOW_MODE
+        if self.window_mode not in self.WINDOW_MODES:
+            raise ValueError(f"Unknown window mode '{self.window_mode}', expected one of: "
+                             f"{', '.join(self.WINDOW_MODES)}")
+        self.max_window_size = max_window_size if max_window_size is not None else self.MAX_WINDOW_SIZE
+        if self.max_window_size is not None and self.max_window_size < 1:
+            raise ValueError("max_window_size must be at least 1")
+        super().__init__(messages)
 
     @property
     def name(self) -> str:
         return "sentiment_correlation_analysis"
 
-    def _parse_timestamp(self, timestamp: str) -> datetime:
-        """Parse WhatsApp timestamp format."""
-        try:
-            # Try the format with AM/PM
-            return datetime.strptime(timestamp.replace('\u202f', ' '), "%d/%m/%Y, %I:%M:%S %p")
-        except ValueError:
-            # Try 24-hour format if AM/PM format fails
-            return datetime.strptime(timestamp.replace('\u202f', ' '), "%d/%m/%Y, %H:%M:%S")
-
-    def _get_message_sentiment(self, message: str) -> float:
-        """Calculate a simple sentiment score for a message."""
-        message = message.lower()
-        
-        positive_count = sum(len(re.findall(pattern, message)) 
-                           for pattern in self.POSITIVE_PATTERNS)
-        negative_count = sum(len(re.findall(pattern, message)) 
-                           for pattern in self.NEGATIVE_PATTERNS)
-        
-        if positive_count == 0 and negative_count == 0:
-            return 0
-        return (positive_count - negative_count) / (positive_count + negative_count)
-
-    def analyze(self) -> Dict[str, Any]:
-        user_interactions = defaultdict(list)
-        sentiment_correlations = defaultdict(list)
-        
+    @staticmethod
+    def _get_sentiment_sign(sentiment: float) -> int:
+        """Return 1, -1 or 0 for a positive, negative or neutral sentiment score."""
+        return (sentiment > 0) - (sentiment < 0)
+
+    def reset(self):
+        # Per sender pair: [interactions, matching sentiments, influences,
+        # later sentiment of the first interaction, earlier sentiment of the last one].
+        self._pair_stats = {}
+        self._first_time = None
+        self._last_time = None
+
+        # Tumbling windows of (sender, sentiment). The first window is kept
+        # aside so a merge can join it with the previous chunk's open window.
+        self._first_window = None
+        self._current_window = self._new_window()
+
+        # Sliding window of (epoch, sender, sentiment), with per sender:
+        # [negative, neutral, positive, total messages, latest sentiment].
+        self._window = deque()
+        self._senders = {}
+        # Messages whose window may reach into a previous chunk, and the
+        # interactions they started, which a merge replays
+        self._message_count = 0
+        self._head = []
+        self._head_complete = False
+        self._head_stats = {}
+
+    def _new_window(self, messages=()):
+        return deque(messages, maxlen=self.max_window_size)
+
+    def process_message(self, msg):
+        current_time = msg.epoch
+        sentiment = self._get_sentiment_sign(msg.sentiment)
+
+        if self.window_mode == 'sliding':
+            self._slide(current_time, msg.sender, sentiment)
+            return
+
         # Group messages by time windows and calculate sentiments
-        current_window = []
-        last_time = None
-        
-        for msg in self.messages:
-            current_time = self._parse_timestamp(msg.timestamp)
-            
-            if (last_time is None or 
-                (current_time - last_time).total_seconds() / 60 <= self.INTERACTION_WINDOW_MINUTES):
-                current_window.append((msg, self._get_message_sentiment(msg.message)))
+        if (self._last_time is None or
+            (current_time - self._last_time) / 60 <= self.INTERACTION_WINDOW_MINUTES):
+            if self._last_time is None:
+                self._first_time = current_time
+            self._current_window.append((msg.sender, sentiment))
+        else:
+            self._close_window(self._current_window)
+            self._current_window = self._new_window([(msg.sender, sentiment)])
+
+        self._last_time = current_time
+
+    def merge(self, other: 'SentimentCorrelationAnalyzer'):
+        if other._last_time is None:
+            return
+        if self._last_time is None:
+            self.__dict__.update(other.__dict__)
+            return
+        if self.window_mode == 'sliding':
+            self._merge_sliding(other)
+            return
+
+        # The other chunk's first window continues our open window unless there is a gap
+        other_first = other._first_window if other._first_window is not None else other._current_window
+        if (other._first_time - self._last_time) / 60 <= self.INTERACTION_WINDOW_MINUTES:
+            leading = self._new_window(self._current_window)
+            leading.extend(other_first)
+        else:
+            self._close_window(self._current_window)
+            leading = other_first
+
+        if other._first_window is not None:
+            self._close_window(leading)
+            self._merge_pair_stats(self._pair_stats, other._pair_stats)
+            self._current_window = other._current_window
+        else:
+            self._current_window = leading
+        self._last_time = other._last_time
+
+    def _close_window(self, window):
+        """Keep the first window aside and analyze later ones."""
+        if self._first_window is None:
+            self._first_window = window
+        else:
+            self._merge_pair_stats(self._pair_stats, self._window_stats(window))
+
+    def _window_stats(self, window) -> Dict[Any, list]:
+        """Pair statistics of a tumbling window.
+
+        Every pair of messages from different senders in the window is one
+        interaction, ordered by the earlier message, then the later one. Per
+        pair of senders the statistics are as in ``_pair_stats``: the number of
+        interactions, how many had the same sentiment on both sides, how many
+        times the later sentiment repeated the non-neutral earlier sentiment
+        of the pair's previous interaction, the later sentiment of the first
+        interaction and the earlier sentiment of the last one.
+
+        The window is walked backwards once with per-sender sentiment counts
+        of the later messages, so the time grows with messages times senders
+        instead of with the square of the messages.
+        """
+        window = list(window)
+        pair_stats = {}
+        # Per sender: [negative, neutral, positive, total] messages after the current one
+        later_counts = {}
+        # Per sender: (index, sentiment) of their next message
+        next_messages = {}
+
+        for i in range(len(window) - 1, -1, -1):
+            sender1, sent1 = window[i]
+            for sender2, counts in later_counts.items():
+                if sender2 == sender1:
+                    continue
+                pair_key = (sender1, sender2) if sender1 < sender2 else (sender2, sender1)
+                next_index, first_sent2 = next_messages[sender2]
+                matching = counts[sent1 + 1]
+                # Each interaction of this message but the first follows sent1
+                influences = matching - (first_sent2 == sent1) if sent1 else 0
+
+                stats = pair_stats.get(pair_key)
+                if stats is None:
+                    pair_stats[pair_key] = [counts[3], matching, influences, first_sent2, sent1, i, next_index]
+                    continue
+                stats[0] += counts[3]
+                stats[1] += matching
+                # The interactions of the next message of the pair follow sent1 too
+                if sent1 != 0 and sent1 == stats[3]:
+                    influences += 1
+                stats[2] += influences
+                stats[3] = first_sent2
+                stats[5] = i
+                stats[6] = next_index
+
+            counts = later_counts.get(sender1)
+            if counts is None:
+                counts = later_counts[sender1] = [0, 0, 0, 0]
+            counts[sent1 + 1] += 1
+            counts[3] += 1
+            next_messages[sender1] = (i, sent1)
+
+        # Order pairs by their first interaction, as a pass in order would
+        ordered = sorted(pair_stats.items(), key=lambda item: (item[1][5], item[1][6]))
+        return {pair_key: stats[:5] for pair_key, stats in ordered}
+
+    def _slide(self, current_time: int, sender: str, sentiment: int):
+        """Add a message to the sliding window and record its interactions."""
+        if self._first_time is None:
+            self._first_time = current_time
+        max_size = self.max_window_size
+
+        pair_stats = self._pair_stats
+        if not self._head_complete:
+            if ((current_time - self._first_time) / 60 <= self.INTERACTION_WINDOW_MINUTES and
+                    (max_size is None or self._message_count < max_size - 1)):
+                self._head.append((current_time, sender, sentiment))
+                pair_stats = self._head_stats
             else:
-                # Analyze sentiment correlations in the current window
-                if len(current_window) > 1:
-                    for i, (msg1, sent1) in enumerate(current_window[:-1]):
-                        for msg2, sent2 in current_window[i+1:]:
-                            if msg1.sender != msg2.sender:
-                                pair_key = tuple(sorted([msg1.sender, msg2.sender]))
-                                sentiment_correlations[pair_key].append((sent1, sent2))
-                
-                current_window = [(msg, self._get_message_sentiment(msg.message))]
-            
-            last_time = current_time
-        
-        # Calculate final correlations
+                self._head_complete = True
+
+        # Drop messages that are too old, or too many to fit with this one
+        window, senders = self._window, self._senders
+        while window and ((current_time - window[0][0]) / 60 > self.INTERACTION_WINDOW_MINUTES or
+                          (max_size is not None and len(window) >= max_size)):
+            _, old_sender, old_sentiment = window.popleft()
+            counts = senders[old_sender]
+            counts[old_sentiment + 1] -= 1
+            counts[3] -= 1
+            if counts[3] == 0:
+                del senders[old_sender]
+
+        # Interactions with each earlier message of another sender, in order
+        new_pairs = []
+        for other, counts in senders.items():
+            if other == sender:
+                continue
+            pair_key = (sender, other) if sender < other else (other, sender)
+            matching = counts[sentiment + 1]
+            # Each of the other sender's messages but the latest is followed
+            # by another interaction with this sentiment
+            influences = matching - (counts[4] == sentiment) if sentiment else 0
+
+            stats = pair_stats.get(pair_key)
+            if stats is None:
+                new_pairs.append((pair_key, [counts[3], matching, influences, sentiment, counts[4]]))
+                continue
+            stats[0] += counts[3]
+            stats[1] += matching
+            if stats[4] != 0 and stats[4] == sentiment:
+                influences += 1
+            stats[2] += influences
+            stats[4] = counts[4]
+        # Pairs that start together are added by name, which does not depend
+        # on how the chat was split into chunks
+        for pair_key, stats in sorted(new_pairs):
+            pair_stats[pair_key] = stats
+
+        counts = senders.get(sender)
+        if counts is None:
+            counts = senders[sender] = [0, 0, 0, 0, sentiment]
+        counts[sentiment + 1] += 1
+        counts[3] += 1
+        counts[4] = sentiment
+        window.append((current_time, sender, sentiment))
+        self._message_count += 1
+        self._last_time = current_time
+
+    def _merge_sliding(self, other: 'SentimentCorrelationAnalyzer'):
+        # The other chunk's first messages may interact with our window, so
+        # they are replayed; later ones only interact within the other chunk
+        for current_time, sender, sentiment in other._head:
+            self._slide(current_time, sender, sentiment)
+        if other._head_complete:
+            self._message_count += other._message_count - len(other._head)
+            self._head_complete = True
+            self._merge_pair_stats(self._pair_stats, other._pair_stats)
+            self._window = other._window
+            self._senders = other._senders
+            self._last_time = other._last_time
+
+    @staticmethod
+    def _merge_pair_stats(pair_stats, later_stats):
+        """Append the statistics of later interactions to pair_stats."""
+        for pair_key, later in later_stats.items():
+            stats = pair_stats.get(pair_key)
+            if stats is None:
+                pair_stats[pair_key] = list(later)
+                continue
+
+            stats[0] += later[0]
+            stats[1] += later[1]
+            stats[2] += later[2]
+            if stats[4] != 0 and stats[4] == later[3]:
+                stats[2] += 1
+            stats[4] = later[4]
+
+    def finalize(self) -> Dict[str, Any]:
+        pair_stats = {}
+        if self.window_mode == 'sliding':
+            self._merge_pair_stats(pair_stats, self._head_stats)
+            self._merge_pair_stats(pair_stats, self._pair_stats)
+        else:
+            if self._first_window is not None:
+                self._merge_pair_stats(pair_stats, self._window_stats(self._first_window))
+            self._merge_pair_stats(pair_stats, self._pair_stats)
+            # The last window is still open, but its interactions count too
+            self._merge_pair_stats(pair_stats, self._window_stats(self._current_window))
+
         correlations = {}
-        for pair, sentiments in sentiment_correlations.items():
-            if len(sentiments) > 1:  # Need at least 2 interactions
-                # Calculate how often sentiments match (both positive, both negative, or both neutral)
-                matching_sentiments = sum(1 for s1, s2 in sentiments 
-                                       if (s1 > 0 and s2 > 0) or 
-                                          (s1 < 0 and s2 < 0) or 
-                                          (s1 == 0 and s2 == 0))
-                correlation = matching_sentiments / len(sentiments)
-                correlations[f"{pair[0]}<->{pair[1]}"] = correlation
-        
-        # Find users who influence others' sentiments
         sentiment_influencers = defaultdict(float)
-        for pair, sentiments in sentiment_correlations.items():
-            if len(sentiments) > 1:
-                # Check how often the second user's sentiment matches the first user's previous sentiment
-                for i in range(len(sentiments)-1):
-                    if sentiments[i][0] != 0 and sentiments[i+1][1] != 0:
-                        if (sentiments[i][0] > 0 and sentiments[i+1][1] > 0) or \
-                           (sentiments[i][0] < 0 and sentiments[i+1][1] < 0):
-                            sentiment_influencers[pair[0]] += 1
-        
+        for pair, (interactions, matching, influences, _, _) in pair_stats.items():
+            if interactions > 1:  # Need at least 2 interactions
+                correlations[f"{pair[0]}<->{pair[1]}"] = matching / interactions
+                if influences:
+                    sentiment_influencers[pair[0]] += influences
+
         return {
             "sentiment_correlations": correlations,
             "top_correlated_pairs": sorted(correlations.items(), key=lambda x: x[1], reverse=True)[:3],
             "sentiment_influencers": dict(sentiment_influencers),
-            "total_analyzed_interactions": sum(len(sents) for sents in sentiment_correlations.values())
-        } 
\ No newline at end of file
+            "total_analyzed_interactions": sum(stats[0] for stats in pair_stats.values())
+        }
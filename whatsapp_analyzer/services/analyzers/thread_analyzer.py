@@ -1,61 +1,125 @@
-from datetime import datetime
-from typing import Dict, Any, List
-from collections import defaultdict
-from .base_analyzer import BaseAnalyzer
+from typing import Dict, Any
+from .base_analyzer import SinglePassAnalyzer
 
-class ThreadAnalyzer(BaseAnalyzer):
+class ThreadAnalyzer(SinglePassAnalyzer):
     """Analyzes conversation threads and their lengths."""
 
     THREAD_TIMEOUT_MINUTES = 30  # Messages more than 30 minutes apart are considered different threads
 
+    required_fields = frozenset({'timestamp', 'sender'})
+
     @property
     def name(self) -> str:
         return "thread_analysis"
 
-    def _parse_timestamp(self, timestamp: str) -> datetime:
-        """Parse WhatsApp timestamp format."""
-        try:
-            # Try the format with AM/PM
-            return datetime.strptime(timestamp.replace('\u202f', ' '), "%d/%m/%Y, %I:%M:%S %p")
-        except ValueError:
-            # Try 24-hour format if AM/PM format fails
-            return datetime.strptime(timestamp.replace('\u202f', ' '), "%d/%m/%Y, %H:%M:%S")
-
-    def analyze(self) -> Dict[str, Any]:
-        threads = []
-        current_thread = []
-        last_message_time = None
-        
-        for msg in self.messages:
-            current_time = self._parse_timestamp(msg.timestamp)
-            
-            # Check if this message belongs to the current thread
-            if (last_message_time is None or 
-                (current_time - last_message_time).total_seconds() / 60 <= self.THREAD_TIMEOUT_MINUTES):
-                current_thread.append(msg)
+    def reset(self):
+        # Only aggregates of the finished threads are kept, plus the first and
+        # the open thread, which a merge may join with a neighbouring chunk.
+        # Threads refer to their first and last messages so timestamps are
+        # only read for the longest one.
+        self._first_thread = None
+        self._total_threads = 0
+        self._total_length = 0
+        self._longest = None
+        self._current = None
+        self._last_message = None
+
+    def process_message(self, msg):
+        current_time = msg.epoch
+
+        # Check if this message belongs to the current thread
+        if (self._last_message is None or
+            (current_time - self._last_message.epoch) / 60 <= self.THREAD_TIMEOUT_MINUTES):
+            if self._current is None:
+                self._current = self._new_thread(msg)
             else:
-                # Save the previous thread if it has more than one message
-                if len(current_thread) > 1:
-                    threads.append(current_thread)
-                current_thread = [msg]
-            
-            last_message_time = current_time
-        
+                self._current["length"] += 1
+                self._current["participants"].setdefault(msg.sender)
+        else:
+            self._current["last"] = self._last_message
+            self._finish_thread(self._current)
+            self._current = self._new_thread(msg)
+
+        self._last_message = msg
+
+    def merge(self, other: 'ThreadAnalyzer'):
+        if other._current is None:
+            return
+        if self._current is None:
+            self.__dict__.update(other.__dict__)
+            return
+
+        # The other chunk's first thread continues our open thread unless there is a gap
+        other_first = other._first_thread if other._first_thread is not None else dict(
+            other._current, last=other._last_message)
+        if (other_first["first"].epoch - self._last_message.epoch) / 60 <= self.THREAD_TIMEOUT_MINUTES:
+            leading = {
+                "length": self._current["length"] + other_first["length"],
+                "first": self._current["first"],
+                "last": other_first["last"],
+                "participants": {**self._current["participants"], **other_first["participants"]}
+            }
+        else:
+            self._current["last"] = self._last_message
+            self._finish_thread(self._current)
+            leading = other_first
+
+        if other._first_thread is not None:
+            self._finish_thread(leading)
+            self._total_threads += other._total_threads
+            self._total_length += other._total_length
+            self._record_longest(other._longest)
+            self._current = other._current
+        else:
+            self._current = leading
+        self._last_message = other._last_message
+
+    def _new_thread(self, msg) -> Dict[str, Any]:
+        """Start a thread with a single message."""
+        return {"length": 1, "first": msg, "last": None, "participants": {msg.sender: None}}
+
+    def _finish_thread(self, thread):
+        """Keep the first thread aside and add later ones to the statistics."""
+        if self._first_thread is None:
+            self._first_thread = thread
+        elif thread["length"] > 1:
+            self._total_threads += 1
+            self._total_length += thread["length"]
+            self._record_longest(thread)
+
+    def _record_longest(self, thread):
+        """Replace the longest thread if the given one is strictly longer."""
+        if thread is not None and (self._longest is None or thread["length"] > self._longest["length"]):
+            self._longest = thread
+
+    def finalize(self) -> Dict[str, Any]:
+        # Threads in chat order: the first one, the finished ones, then the open one
+        total_threads = self._total_threads
+        total_length = self._total_length
+        longest_thread = self._longest
+
+        first = self._first_thread
+        if first is not None and first["length"] > 1:
+            total_threads += 1
+            total_length += first["length"]
+            if longest_thread is None or first["length"] >= longest_thread["length"]:
+                longest_thread = first
+
         # Add the last thread if it exists
-        if len(current_thread) > 1:
-            threads.append(current_thread)
-        
-        # Analyze thread statistics
-        thread_lengths = [len(thread) for thread in threads]
-        longest_thread = max(threads, key=len) if threads else []
-        
+        current = self._current
+        if current is not None and current["length"] > 1:
+            total_threads += 1
+            total_length += current["length"]
+            if longest_thread is None or current["length"] > longest_thread["length"]:
+                longest_thread = dict(current, last=self._last_message)
+
         return {
-            "total_threads": len(threads),
-            "average_thread_length": sum(thread_lengths) / len(thread_lengths) if thread_lengths else 0,
-            "longest_thread_length": len(longest_thread),
+            "total_threads": total_threads,
+            "average_thread_length": total_length / total_threads if total_threads else 0,
+            "longest_thread_length": longest_thread["length"] if longest_thread else 0,
             "longest_thread_preview": {
-                "start_time": longest_thread[0].timestamp if longest_thread else None,
-                "end_time": longest_thread[-1].timestamp if longest_thread else None,
-                "participants": list(set(msg.sender for msg in longest_thread)) if longest_thread else []
+                "start_time": longest_thread["first"].timestamp if longest_thread else None,
+                "end_time": longest_thread["last"].timestamp if longest_thread else None,
+                "participants": list(longest_thread["participants"]) if longest_thread else []
             }
-        } 
\ No newline at end of file
+        }
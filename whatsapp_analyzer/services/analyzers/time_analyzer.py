@@ -1,89 +1,196 @@
 import re
-from collections import Counter, defaultdict
-from datetime import datetime
-from typing import Dict, Any
-from .base_analyzer import BaseAnalyzer
+from collections import Counter
+from typing import Dict, Any, List, Sequence
+from ...models.message_store import MessageStore
+from .base_analyzer import SinglePassAnalyzer
 
-class TimeAnalyzer(BaseAnalyzer):
-    """Analyzer for time-based patterns."""
+try:
+    import numpy as np
+except ImportError:  # Whole stores are then processed message by message
+    np = None
+
+class TimeAnalyzer(SinglePassAnalyzer):
+    """Analyzer for time-based patterns.
+
+    Besides counting messages per weekday and per sender, it keeps a
+    histogram of messages per hour of the week, reported per hour of the day
+    and as a weekday by hour heatmap. With NumPy installed, a whole
+    MessageStore is counted from its epoch and sender ID columns at once.
+    """
+
+    # 1970-01-01, day zero of the epoch, was a Thursday
+    DAY_NAMES = ['Thursday', 'Friday', 'Saturday', 'Sunday', 'Monday', 'Tuesday', 'Wednesday']
+    # Weekdays in the order of the heatmap, as indexes into DAY_NAMES
+    WEEK_ORDER = [4, 5, 6, 0, 1, 2, 3]
+
+    _call_pattern = re.compile(r'(?:Video call|Voice call),\s*(.*)', re.IGNORECASE)
+    # Finds messages that may be calls in UTF-8 text. Lowering text never
+    # turns other characters into ASCII letters, so this finds every message
+    # whose lowered text contains "call".
+    call_marker = re.compile(rb'call', re.IGNORECASE)
+
+    required_fields = frozenset({'sender', 'message'})
+    required_features = frozenset({'lowered'})
 
     @property
     def name(self) -> str:
         return "time_analysis"
 
-    def analyze(self) -> Dict[str, Any]:
+    def reset(self):
+        self._day_counter = Counter()
+        self._user_time_counts = {}
+        self._user_message_count = Counter()
+        self._call_seconds = 0
+        # Messages per hour of the week, by weekday (as in DAY_NAMES) * 24 + hour
+        self._hour_counts = [0] * (7 * 24)
+
+    def process_message(self, msg):
+        days, seconds = divmod(msg.epoch, 86400)
+        self._day_counter[self.DAY_NAMES[days % 7]] += 1
+
+        hour = seconds // 3600
+        self._hour_counts[days % 7 * 24 + hour] += 1
+        period = 'morning' if 6 <= hour < 18 else 'night'
+        if msg.sender not in self._user_time_counts:
+            self._user_time_counts[msg.sender] = {'morning': 0, 'night': 0}
+        self._user_time_counts[msg.sender][period] += 1
+
+        self._user_message_count[msg.sender] += 1
+
+        if 'call' in msg.lowered:
+            self._call_seconds += self.call_seconds(msg.message)
+
+    def add_counts(self, day: int, sender: str, hours: Sequence[int], call_seconds: int = 0):
+        """Add messages of one sender on one day that were counted beforehand.
+
+        ``hours`` holds the number of messages in each hour of the day. Gives
+        the same results as processing the messages themselves, which lets a
+        ``MessageIndex`` answer from its rollups.
+        """
+        weekday = day % 7
+        morning = sum(hours[6:18])
+        total = sum(hours)
+        self._day_counter[self.DAY_NAMES[weekday]] += total
+        for hour, count in enumerate(hours):
+            self._hour_counts[weekday * 24 + hour] += count
+        if sender not in self._user_time_counts:
+            self._user_time_counts[sender] = {'morning': 0, 'night': 0}
+        self._user_time_counts[sender]['morning'] += morning
+        self._user_time_counts[sender]['night'] += total - morning
+        self._user_message_count[sender] += total
+        self._call_seconds += call_seconds
+
+    def process_store(self, store: MessageStore) -> bool:
+        """Count all messages of a store from its columns with NumPy.
+
+        Weekdays, hours and periods of the day come from vectorized
+        arithmetic on the epochs and are counted with ``bincount``, as are the
+        messages of each sender. Only call notices are read one by one, after
+        a scan of the store's text. Returns False without NumPy.
+        """
+        if np is None:
+            return False
+        if not len(store):
+            return True
+
+        epochs = np.frombuffer(store.epochs, dtype=np.int64)
+        sender_ids = np.frombuffer(store.sender_ids, dtype=np.int32)
+        days, seconds = np.divmod(epochs, 86400)
+        weekdays = days % 7
+        hours = seconds // 3600
+        hour_counts = np.bincount(weekdays * 24 + hours, minlength=7 * 24)
+        day_counts = hour_counts.reshape(7, 24).sum(axis=1)
+        night = (hours < 6) | (hours >= 18)
+        period_counts = np.bincount(sender_ids.astype(np.int64) * 2 + night,
+                                    minlength=2 * len(store.senders)).reshape(-1, 2)
+
+        # Results list weekdays and senders in order of their first message
+        for weekday in _first_seen(weekdays):
+            self._day_counter[self.DAY_NAMES[weekday]] += int(day_counts[weekday])
+        for index, count in enumerate(hour_counts.tolist()):
+            self._hour_counts[index] += count
+        for sender_id in _first_seen(sender_ids):
+            morning, night_count = (int(count) for count in period_counts[sender_id])
+            sender = store.senders[sender_id]
+            if sender not in self._user_time_counts:
+                self._user_time_counts[sender] = {'morning': 0, 'night': 0}
+            self._user_time_counts[sender]['morning'] += morning
+            self._user_time_counts[sender]['night'] += night_count
+            self._user_message_count[sender] += morning + night_count
+
+        for index in store.candidates(self.call_marker):
+            text = store.text_at(index)
+            if 'call' in text.lower():
+                self._call_seconds += self.call_seconds(text)
+        return True
+
+    def call_seconds(self, message: str) -> int:
+        """Duration of the call a message reports, e.g. ``Voice call, 2 min 5 sec``, or 0."""
+        if duration_match := self._call_pattern.search(message):
+            return self._duration_to_seconds(duration_match.group(1))
+        return 0
+
+    def merge(self, other: 'TimeAnalyzer'):
+        self._day_counter.update(other._day_counter)
+        for user, counts in other._user_time_counts.items():
+            if user in self._user_time_counts:
+                self._user_time_counts[user]['morning'] += counts['morning']
+                self._user_time_counts[user]['night'] += counts['night']
+            else:
+                self._user_time_counts[user] = dict(counts)
+        self._user_message_count.update(other._user_message_count)
+        self._call_seconds += other._call_seconds
+        self._hour_counts = [a + b for a, b in zip(self._hour_counts, other._hour_counts)]
+
+    def finalize(self) -> Dict[str, Any]:
         return {
             "messages_per_day": self._get_messages_per_day(),
             "messages_by_time": self._get_messages_by_time(),
             "time_spent": self._get_time_spent(),
-            "call_duration": self._get_call_duration()
+            "call_duration": self._get_call_duration(),
+            "messages_per_hour": self._get_messages_per_hour(),
+            "weekly_heatmap": self._get_weekly_heatmap()
         }
 
     def _get_messages_per_day(self):
         """Count messages per day of the week."""
-        day_counter = Counter()
-        date_formats = [
-            '%m/%d/%y, %I:%M:%S %p',  # US format: MM/DD/YY
-            '%d/%m/%y, %I:%M:%S %p',  # International format: DD/MM/YY
-            '%m/%d/%Y, %I:%M:%S %p',  # US format with 4-digit year
-            '%d/%m/%Y, %I:%M:%S %p',  # International format with 4-digit year
-        ]
-        
-        for msg in self.messages:
-            parsed = False
-            for date_format in date_formats:
-                try:
-                    dt = datetime.strptime(msg.timestamp, date_format)
-                    day_of_week = dt.strftime('%A')
-                    day_counter[day_of_week] += 1
-                    parsed = True
-                    break
-                except ValueError:
-                    continue
-        
         return [
             {"day": day, "count": count}
-            for day, count in day_counter.items()
+            for day, count in self._day_counter.items()
         ]
 
     def _get_messages_by_time(self):
         """Count messages by time of day per user."""
-        user_time_counts = defaultdict(lambda: {'morning': 0, 'night': 0})
-        
-        for msg in self.messages:
-            time_str = msg.timestamp.split(',')[1].strip()
-            hour = int(time_str.split(':')[0])
-            period = 'morning' if 6 <= hour < 18 else 'night'
-            user_time_counts[msg.sender][period] += 1
-        
         return [
             {
                 "name": user,
                 "morning": counts['morning'],
                 "night": counts['night']
             }
-            for user, counts in user_time_counts.items()
+            for user, counts in self._user_time_counts.items()
         ]
 
     def _get_time_spent(self):
         """Calculate time spent messaging by user."""
-        user_message_count = Counter(msg.sender for msg in self.messages)
         return [
             {"name": user, "days": count / (60 * 24)}
-            for user, count in user_message_count.items()
+            for user, count in self._user_message_count.items()
+        ]
+
+    def _get_messages_per_hour(self):
+        """Count messages per hour of the day, from 0:00 to 23:00."""
+        return [sum(self._hour_counts[hour::24]) for hour in range(24)]
+
+    def _get_weekly_heatmap(self):
+        """Count messages per hour of the day for each weekday, Monday first."""
+        return [
+            {"day": self.DAY_NAMES[weekday], "hours": self._hour_counts[weekday * 24:(weekday + 1) * 24]}
+            for weekday in self.WEEK_ORDER
         ]
 
     def _get_call_duration(self):
         """Calculate total time spent on calls."""
-        total_seconds = 0
-        
-        for msg in self.messages:
-            if 'call' in msg.message.lower():
-                if duration_match := re.search(r'(?:Video call|Voice call),\s*(.*)', msg.message, re.IGNORECASE):
-                    duration = duration_match.group(1)
-                    total_seconds += self._duration_to_seconds(duration)
-        
-        return total_seconds / 3600
+        return self._call_seconds / 3600
 
     def _duration_to_seconds(self, duration: str) -> int:
         """Convert duration string to seconds."""
@@ -92,7 +199,7 @@ class TimeAnalyzer(BaseAnalyzer):
             'min': r'(\d+)\s*min',
             'sec': r'(\d+)\s*sec'
         }
-        
+
         total_seconds = 0
         for unit, pattern in patterns.items():
             if match := re.search(pattern, duration):
@@ -103,5 +210,11 @@ class TimeAnalyzer(BaseAnalyzer):
                     total_seconds += value * 60
                 else:
                     total_seconds += value
-        
-        return total_seconds 
\ No newline at end of file
+
+        return total_seconds
+
+
+def _first_seen(values) -> List[int]:
+    """The distinct values of a NumPy array in order of their first occurrence."""
+    unique, first = np.unique(values, return_index=True)
+    return unique[np.argsort(first)].tolist()
@@ -0,0 +1,118 @@
+import heapq
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+class TopKSketch:
+    """Approximate counts of the most frequent items in a fixed amount of memory.
+
+    Implements SpaceSaving: at most ``capacity`` items are counted, and a new
+    item takes over the counter of the least counted one, inheriting its count
+    as a possible overestimate. With N items added in total, every count is
+    at least the true count and at most N / capacity higher, and every item
+    seen more than N / capacity times is kept. While there are no more
+    distinct items than ``capacity``, the counts are exact.
+
+    Sketches merge by adding their counts, an item missing from a full sketch
+    counting as that sketch's smallest count, which keeps the same bounds.
+    Items must be orderable among themselves, as strings are.
+    """
+
+    __slots__ = ('capacity', 'total', '_counts', '_errors', '_heap')
+
+    def __init__(self, capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self._counts: Dict[Hashable, int] = {}
+        # Largest possible overestimate of each count
+        self._errors: Dict[Hashable, int] = {}
+        # (count, item) of every counted item. Counts here are only updated
+        # once an entry reaches the top, so they may be lower than the real ones.
+        self._heap: List[Tuple[int, Hashable]] = []
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, item: Hashable, count: int = 1):
+        self.total += count
+        counts = self._counts
+        current = counts.get(item)
+        if current is not None:
+            counts[item] = current + count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+            self._errors[item] = 0
+            heapq.heappush(self._heap, (count, item))
+        else:
+            smallest, victim = self._pop_smallest()
+            del counts[victim], self._errors[victim]
+            counts[item] = smallest + count
+            self._errors[item] = smallest
+            heapq.heappush(self._heap, (smallest + count, item))
+
+    def update(self, items: Iterable[Hashable]):
+        """Add one occurrence of each item."""
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: 'TopKSketch'):
+        if other.capacity != self.capacity:
+            raise ValueError("Cannot merge sketches with different capacities")
+        own_floor, other_floor = self._floor(), other._floor()
+        counts, errors = {}, {}
+        for item, count in self._counts.items():
+            counts[item] = count + other._counts.get(item, other_floor)
+            errors[item] = self._errors[item] + other._errors.get(item, other_floor)
+        for item, count in other._counts.items():
+            if item not in counts:
+                counts[item] = own_floor + count
+                errors[item] = own_floor + other._errors[item]
+        if len(counts) > self.capacity:
+            kept = sorted(counts, key=counts.__getitem__, reverse=True)[:self.capacity]
+            kept = set(kept)
+            counts = {item: count for item, count in counts.items() if item in kept}
+            errors = {item: errors[item] for item in counts}
+        self.total += other.total
+        self._counts, self._errors = counts, errors
+        self._heap = [(count, item) for item, count in counts.items()]
+        heapq.heapify(self._heap)
+
+    def copy(self) -> 'TopKSketch':
+        sketch = TopKSketch(self.capacity)
+        sketch.merge(self)
+        return sketch
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        """The n items with the highest counts, like ``Counter.most_common``."""
+        if n is None:
+            return sorted(self._counts.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(n, self._counts.items(), key=lambda item: item[1])
+
+    def items(self):
+        """(item, count) of every counted item."""
+        return self._counts.items()
+
+    def error(self, item: Hashable) -> int:
+        """How much the count of an item may exceed its true count."""
+        return self._errors.get(item, self._floor())
+
+    def _floor(self) -> int:
+        """The most an item that is not counted can have been seen."""
+        if len(self._counts) < self.capacity:
+            return 0
+        return self._smallest()[0]
+
+    def _smallest(self) -> Tuple[int, Hashable]:
+        """The least counted item, bringing outdated heap entries up to date on the way."""
+        heap, counts = self._heap, self._counts
+        while True:
+            count, item = heap[0]
+            current = counts[item]
+            if current == count:
+                return count, item
+            heapq.heapreplace(heap, (current, item))
+
+    def _pop_smallest(self) -> Tuple[int, Hashable]:
+        entry = self._smallest()
+        heapq.heappop(self._heap)
+        return entry
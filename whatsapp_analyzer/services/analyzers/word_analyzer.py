@@ -1,69 +1,105 @@
-import re
 from collections import Counter
-from typing import Dict, Any
-from .base_analyzer import BaseAnalyzer
+from typing import Dict, Any, Optional, Union
+from .base_analyzer import SinglePassAnalyzer
+from .top_k_sketch import TopKSketch
 
-class WordAnalyzer(BaseAnalyzer):
-    """Analyzer for word frequency and patterns."""
+class WordAnalyzer(SinglePassAnalyzer):
+    """Analyzer for word frequency and patterns.
+
+    Words are counted exactly by default. With ``top_k_capacity``, the words
+    of the whole chat and of each user are counted in a ``TopKSketch`` of that
+    many words instead, so memory no longer grows with the vocabulary. Counts
+    may then be too high by up to the number of words counted in the sketch
+    divided by ``top_k_capacity``.
+    """
+
+    EXCLUDED_WORDS = {'voice', 'call', 'missed', 'video', 'sticker', 'omitted'}
+    MIN_WORD_LENGTH = 3
+    MIN_USER_WORD_LENGTH = 4
+    TOP_WORDS_PER_USER = 8
+    # Words counted per sketch in approximate mode; None counts all words exactly
+    TOP_K_CAPACITY = None
+
+    required_fields = frozenset({'sender', 'message'})
+    required_features = frozenset({'words', 'lowered_words'})
+
+    def __init__(self, messages=None, top_k_capacity: Optional[int] = None):
+        self.top_k_capacity = top_k_capacity or self.TOP_K_CAPACITY
+        super().__init__(messages)
 
     @property
     def name(self) -> str:
         return "word_analysis"
 
-    def analyze(self) -> Dict[str, Any]:
+    def reset(self):
+        self._word_counter = self._new_counter()
+        self._user_word_counter = {}
+        self._user_word_counts = Counter()
+
+    def process_message(self, msg):
+        words = msg.lowered_words
+        excluded = self.EXCLUDED_WORDS
+
+        self._word_counter.update(
+            w for w in words if len(w) >= self.MIN_WORD_LENGTH and w not in excluded
+        )
+
+        if msg.sender not in self._user_word_counter:
+            self._user_word_counter[msg.sender] = self._new_counter()
+        self._user_word_counter[msg.sender].update(
+            w for w in words if len(w) >= self.MIN_USER_WORD_LENGTH and w not in excluded
+        )
+
+        self._user_word_counts[msg.sender] += len(msg.words)
+
+    def merge(self, other: 'WordAnalyzer'):
+        _merge_counts(self._word_counter, other._word_counter)
+        for user, counter in other._user_word_counter.items():
+            if user in self._user_word_counter:
+                _merge_counts(self._user_word_counter[user], counter)
+            else:
+                self._user_word_counter[user] = counter
+        self._user_word_counts.update(other._user_word_counts)
+
+    def _new_counter(self) -> Union[Counter, TopKSketch]:
+        return TopKSketch(self.top_k_capacity) if self.top_k_capacity else Counter()
+
+    def finalize(self) -> Dict[str, Any]:
         return {
             "most_frequent_word": self._get_most_frequent_word(),
             "words_by_user": self._get_words_by_user(),
             "word_counts": self._get_word_counts()
         }
 
-    def _get_most_frequent_word(self, min_length: int = 3):
+    def _get_most_frequent_word(self):
         """Find the most frequently used word."""
-        excluded_words = {'voice', 'call', 'missed', 'video', 'sticker', 'omitted'}
-        word_counter = Counter()
-        
-        for msg in self.messages:
-            words = re.findall(r'\b\w+\b', msg.message.lower())
-            filtered_words = [w for w in words if len(w) >= min_length and w not in excluded_words]
-            word_counter.update(filtered_words)
-        
-        if not word_counter:
+        if not self._word_counter:
             return {"message": "", "count": 0}
-        
-        word, count = word_counter.most_common(1)[0]
+
+        word, count = self._word_counter.most_common(1)[0]
         return {"message": word, "count": count}
 
-    def _get_words_by_user(self, min_length: int = 4):
+    def _get_words_by_user(self):
         """Find most used words per user."""
-        excluded_words = {'voice', 'call', 'missed', 'video', 'sticker', 'omitted'}
-        user_word_counter = {}
-        
-        for msg in self.messages:
-            if msg.sender not in user_word_counter:
-                user_word_counter[msg.sender] = Counter()
-            
-            words = re.findall(r'\b\w+\b', msg.message.lower())
-            filtered_words = [w for w in words if len(w) >= min_length and w not in excluded_words]
-            user_word_counter[msg.sender].update(filtered_words)
-        
         return {
             user: [
                 {"word": word, "count": count}
-                for word, count in counter.most_common(8)
+                for word, count in counter.most_common(self.TOP_WORDS_PER_USER)
             ]
-            for user, counter in user_word_counter.items()
+            for user, counter in self._user_word_counter.items()
         }
 
     def _get_word_counts(self):
         """Count total words used by each user."""
-        word_pattern = re.compile(r'\b\w+\b', re.UNICODE)
-        user_word_counts = Counter()
-        
-        for msg in self.messages:
-            words = word_pattern.findall(msg.message)
-            user_word_counts[msg.sender] += len(words)
-        
         return [
             {"name": user, "count": count}
-            for user, count in user_word_counts.items()
-        ] 
\ No newline at end of file
+            for user, count in self._user_word_counts.items()
+        ]
+
+
+def _merge_counts(counter: Union[Counter, TopKSketch], other: Union[Counter, TopKSketch]):
+    """Add the counts of ``other`` to ``counter``, both exact or both sketches."""
+    if isinstance(counter, TopKSketch):
+        counter.merge(other)
+    else:
+        counter.update(other)
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import pickle
+from typing import List, Optional, Set
+from .analyzers.base_analyzer import BaseAnalyzer
+
+class AnalysisCheckpoint:
+    """Analyzer state saved after analyzing a chat export up to a byte offset.
+
+    A checkpoint records the offset of the first unprocessed line, a hash of
+    the file up to that offset and the unfinalized analyzers. When the same
+    chat is exported again with new messages appended, the analyzers can be
+    restored and only the lines after the offset need to be parsed.
+
+    Checkpoints are pickled, so only load files written by this class.
+    """
+
+    VERSION = 2
+    HASH_BLOCK_SIZE = 1 << 20
+
+    def __init__(self, offset: int, prefix_hash: str, analyzer_names: List[str],
+                 heart_emojis: Set[str], analyzers: List[BaseAnalyzer]):
+        self.offset = offset
+        self.prefix_hash = prefix_hash
+        self.analyzer_names = analyzer_names
+        self.heart_emojis = sorted(heart_emojis)
+        self.analyzers = analyzers
+
+    @classmethod
+    def load(cls, path: str) -> Optional['AnalysisCheckpoint']:
+        """Load a checkpoint, or return None if it is missing or unreadable."""
+        try:
+            with open(path, 'rb') as f:
+                version, checkpoint = pickle.load(f)
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+            return None
+        return checkpoint if version == cls.VERSION else None
+
+    def save(self, path: str):
+        """Write the checkpoint atomically, replacing any previous one."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((self.VERSION, self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def is_compatible(self, analyzer_names: List[str], heart_emojis: Set[str]) -> bool:
+        """Check the checkpoint was made with the same analyzers and settings."""
+        return self.analyzer_names == analyzer_names and self.heart_emojis == sorted(heart_emojis)
+
+    @classmethod
+    def hash_prefix(cls, file, end: int, hasher=None, start: int = 0):
+        """Feed the bytes of an open binary file from ``start`` up to ``end`` into a hasher."""
+        if hasher is None:
+            hasher = hashlib.sha256()
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.read(min(cls.HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+        return hasher
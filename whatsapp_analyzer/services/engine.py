@@ -0,0 +1,144 @@
+from itertools import islice, repeat
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from ..models.message import Message
+from ..models.message_store import MessageStore
+from .analyzers.base_analyzer import BaseAnalyzer, SinglePassAnalyzer
+from .analyzers.features import MessageFeatures, build_matcher
+from .instrumentation import Instrumentation
+
+class AnalysisEngine:
+    """Drives a set of analyzers with a single pass over the messages.
+
+    Analyzers implementing ``SinglePassAnalyzer`` are fed every message from
+    one shared loop and finalized at the end. When any of them needs derived
+    features, every message is wrapped in a ``MessageFeatures`` so each
+    feature is computed at most once per message. Any other ``BaseAnalyzer``
+    is run through its own ``analyze`` method as before. Given a whole
+    ``MessageStore``, analyzers that can process its columns at once do so,
+    and only the others are fed its messages.
+
+    With ``instrumentation``, the time and memory every analyzer spends is
+    measured. Messages are then passed on in batches, each batch to one
+    analyzer after another, so timing costs nothing per message.
+    """
+
+    def __init__(self, analyzers: List[BaseAnalyzer], instrumentation: Optional[Instrumentation] = None):
+        self.analyzers = analyzers
+        self.instrumentation = instrumentation
+        self._single_pass = [a for a in analyzers if isinstance(a, SinglePassAnalyzer)]
+        self._callbacks = [a.process_message for a in self._single_pass]
+        # Derived features are shared through one MessageFeatures per message
+        self._wrap = any(a.required_features for a in self._single_pass)
+        self._matcher = build_matcher(self._single_pass) if self._wrap else None
+
+    def unsupported_for_streaming(self) -> List[str]:
+        """Names of analyzers that need the whole message list up front."""
+        return [a.name for a in self.analyzers if not isinstance(a, SinglePassAnalyzer)]
+
+    def start(self):
+        """Reset the state of all single-pass analyzers."""
+        for analyzer in self._single_pass:
+            analyzer.reset()
+
+    def feed(self, msg: Message):
+        """Pass one message to every single-pass analyzer."""
+        if self.instrumentation is not None:
+            return self._consume_measured((msg,), self._single_pass, self._callbacks, self._wrap)
+        if self._wrap:
+            msg = MessageFeatures(msg, self._matcher)
+        for callback in self._callbacks:
+            callback(msg)
+
+    def consume(self, messages: Iterable[Message]):
+        """Pass every message to the single-pass analyzers."""
+        analyzers, callbacks, wrap = self._single_pass, self._callbacks, self._wrap
+        if isinstance(messages, MessageStore):
+            analyzers = self._process_store(messages)
+            if not analyzers:
+                return
+            callbacks = [a.process_message for a in analyzers]
+            wrap = any(a.required_features for a in analyzers)
+        if self.instrumentation is not None:
+            return self._consume_measured(messages, analyzers, callbacks, wrap)
+
+        if wrap:
+            messages = map(MessageFeatures, messages, repeat(self._matcher))
+        if len(callbacks) == 1:
+            callback = callbacks[0]
+            for msg in messages:
+                callback(msg)
+            return
+
+        for msg in messages:
+            for callback in callbacks:
+                callback(msg)
+
+    def _process_store(self, store: MessageStore) -> List[SinglePassAnalyzer]:
+        """Let analyzers process a whole store; returns those that need its messages instead."""
+        remaining = []
+        for analyzer in self._single_pass:
+            if self.instrumentation is None:
+                processed = analyzer.process_store(store)
+            else:
+                with self.instrumentation.measure(analyzer.name):
+                    processed = analyzer.process_store(store)
+                if processed:
+                    self.instrumentation.add(analyzer.name, 0.0, 0.0, len(store))
+            if not processed:
+                remaining.append(analyzer)
+        return remaining
+
+    def _consume_measured(self, messages: Iterable[Message], analyzers: List[SinglePassAnalyzer],
+                          callbacks: List[Callable[[Message], None]], wrap: bool):
+        measure = self.instrumentation.measure
+        messages = iter(messages)
+        while batch := list(islice(messages, self.instrumentation.BATCH_SIZE)):
+            if wrap:
+                batch = [MessageFeatures(msg, self._matcher) for msg in batch]
+            for analyzer, callback in zip(analyzers, callbacks):
+                with measure(analyzer.name, len(batch)):
+                    for msg in batch:
+                        callback(msg)
+
+    def merge(self, analyzers: List[BaseAnalyzer]):
+        """Fold in the state of analyzers that ran on the messages following ours.
+
+        ``analyzers`` must be created from the same registry, in the same order.
+        """
+        others = [a for a in analyzers if isinstance(a, SinglePassAnalyzer)]
+        for analyzer, other in zip(self._single_pass, others):
+            if self.instrumentation is None:
+                analyzer.merge(other)
+            else:
+                with self.instrumentation.measure(analyzer.name):
+                    analyzer.merge(other)
+
+    def finish(self, on_finished: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Collect the results of all analyzers, keeping registration order.
+
+        ``on_finished`` is called with each analyzer's name once its result is ready.
+        """
+        results = {}
+        for analyzer in self.analyzers:
+            if self.instrumentation is None:
+                results[analyzer.name] = self._result(analyzer)
+            else:
+                # Analyzers that were not fed messages go through all of them now
+                messages = 0 if isinstance(analyzer, SinglePassAnalyzer) else len(analyzer.messages)
+                with self.instrumentation.measure(analyzer.name, messages):
+                    results[analyzer.name] = self._result(analyzer)
+            if on_finished is not None:
+                on_finished(analyzer.name)
+        return results
+
+    @staticmethod
+    def _result(analyzer: BaseAnalyzer) -> Dict[str, Any]:
+        if isinstance(analyzer, SinglePassAnalyzer):
+            return analyzer.finalize()
+        return analyzer.analyze()
+
+    def run(self, messages: Iterable[Message]) -> Dict[str, Any]:
+        """Analyze all messages in one pass and return the results."""
+        self.start()
+        self.consume(messages)
+        return self.finish()
@@ -0,0 +1,57 @@
+from typing import Iterable, Optional
+from ..models.message_store import MessageStore
+from .mmap_parser import MmapChatParser
+
+class IncrementalChatParser(MmapChatParser):
+    """Parser fed with chunks of an export as they arrive, e.g. from an upload.
+
+    Chunks may split lines anywhere; the incomplete tail of each chunk is held
+    back until the rest of the line arrives. Messages are added to a
+    MessageStore the same way ``MmapChatParser.parse`` does, so no copy of the
+    file is needed.
+    """
+
+    def __init__(self, dayfirst: bool = True, fields: Optional[Iterable[str]] = None):
+        super().__init__(None, dayfirst, fields)
+        self.messages = MessageStore()
+        self._sender_ids = {}
+        self._pending = b''
+        self._skipped_first_line = False
+
+    def feed(self, chunk: bytes):
+        """Parse all complete lines received so far."""
+        data = self._pending + chunk if self._pending else chunk
+        start = 0
+        if not self._skipped_first_line:
+            start = data.find(b'\n') + 1  # Skip first line
+            if start == 0:
+                self._pending = data
+                return
+            self._skipped_first_line = True
+
+        end = data.rfind(b'\n', start) + 1
+        if end == 0:
+            self._pending = data[start:]
+            return
+        self._pending = data[end:]
+        self._append(data, start, end)
+
+    def close(self) -> MessageStore:
+        """Parse the final line and return the messages."""
+        if self._pending and self._skipped_first_line:
+            self._append(self._pending, 0, len(self._pending))
+        self._pending = b''
+        return self.messages
+
+    def _append(self, data: bytes, start: int, end: int):
+        messages = self.messages
+        sender_ids = self._sender_ids
+        append = messages.append_encoded
+        keep_timestamp = self._keeps('timestamp')
+        keep_text = self._keeps('message')
+
+        for timestamp, sender, message, epoch in self._match_lines(data, start, end):
+            sender_id = sender_ids.get(sender)
+            if sender_id is None:
+                sender_id = sender_ids[sender] = messages.sender_id(sender.decode('utf-8'))
+            append(timestamp if keep_timestamp else b'', sender_id, message if keep_text else b'', epoch)
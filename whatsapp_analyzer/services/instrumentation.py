@@ -0,0 +1,119 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+class Instrumentation:
+    """Wall time, CPU time, message counts and peak memory per analysis stage.
+
+    Stages are named after what ran: ``parse`` for reading messages and the
+    result name of each analyzer, e.g. ``word_analysis``. Timings of a stage
+    add up over every time it was measured, so the fused pass over the
+    messages can measure each analyzer batch by batch. CPU time is that of
+    the measuring thread.
+
+    With ``trace_memory`` the allocations of the analysis are traced with
+    ``tracemalloc``, which costs considerably more time than the timings do.
+    The peak of a stage is the most memory that was allocated since the
+    analysis started, at any point while the stage ran.
+
+    Instances are plain data, so they can be sent to and from worker processes
+    and merged afterwards.
+    """
+
+    # Messages read at a time when timing an iterator of messages
+    BATCH_SIZE = 4096
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        # Per stage: [wall seconds, CPU seconds, messages, peak memory or None]
+        self.stages: Dict[str, list] = {}
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._started = None
+        self._started_tracing = False
+        self._memory_baseline = 0
+
+    def start(self):
+        """Start timing the whole analysis, and tracing memory if enabled."""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            self._memory_baseline = tracemalloc.get_traced_memory()[0]
+        self._started = (time.perf_counter(), time.thread_time())
+
+    def stop(self):
+        """Stop timing the whole analysis and stop tracing if ``start`` began it."""
+        if self._started is not None:
+            wall, cpu = self._started
+            self.wall_seconds += time.perf_counter() - wall
+            self.cpu_seconds += time.thread_time() - cpu
+            self._started = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def measure(self, stage: str, messages: int = 0):
+        """Add the time spent in the block, and its memory peak, to a stage."""
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            peak = max(tracemalloc.get_traced_memory()[1] - self._memory_baseline, 0) if tracing else None
+            self.add(stage, time.perf_counter() - wall, time.thread_time() - cpu, messages, peak)
+
+    def add(self, stage: str, wall_seconds: float, cpu_seconds: float, messages: int = 0,
+            peak_memory: Optional[int] = None):
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = [0.0, 0.0, 0, None]
+        stats[0] += wall_seconds
+        stats[1] += cpu_seconds
+        stats[2] += messages
+        if peak_memory is not None:
+            stats[3] = max(stats[3] or 0, peak_memory)
+
+    def timed(self, stage: str, messages: Iterable[Any]) -> Iterator[Any]:
+        """Iterate over messages, adding the time taken to produce them to a stage.
+
+        Messages are read in batches, so a parser producing them lazily is
+        timed without measuring every single message.
+        """
+        messages = iter(messages)
+        while True:
+            with self.measure(stage):
+                batch = list(islice(messages, self.BATCH_SIZE))
+            if not batch:
+                return
+            self.stages[stage][2] += len(batch)
+            yield from batch
+
+    def merge(self, other: 'Instrumentation'):
+        """Add the stages measured by another instance, e.g. in a worker process."""
+        for stage, (wall_seconds, cpu_seconds, messages, peak_memory) in other.stages.items():
+            self.add(stage, wall_seconds, cpu_seconds, messages, peak_memory)
+
+    def report(self) -> Dict[str, Any]:
+        """The measurements as returned in the ``_meta`` section of the results."""
+        stages = {}
+        for stage, (wall_seconds, cpu_seconds, messages, peak_memory) in self.stages.items():
+            stages[stage] = {
+                "wall_seconds": wall_seconds,
+                "cpu_seconds": cpu_seconds,
+                "messages": messages,
+                "messages_per_second": messages / wall_seconds if wall_seconds > 0 else 0.0
+            }
+            if peak_memory is not None:
+                stages[stage]["peak_memory_bytes"] = peak_memory
+
+        report = {"wall_seconds": self.wall_seconds, "cpu_seconds": self.cpu_seconds, "stages": stages}
+        peaks = [stats[3] for stats in self.stages.values() if stats[3] is not None]
+        if peaks:
+            report["peak_memory_bytes"] = max(peaks)
+        return report
@@ -0,0 +1,250 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Optional, Sequence, Set
+from ..exporters import ChatExporter
+from .analysis_service import ChatAnalysisService
+from .engine import AnalysisEngine
+from .zip_export import extract_chat
+
+CHAT_FILE = 'chat.txt'
+PROGRESS_FILE = 'progress.json'
+RESULT_FILE = 'result.json'
+
+class JobQueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at its limit."""
+
+
+def _write_json(path: str, data: Any):
+    """Write JSON atomically so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def run_job(job_dir: str, heart_emojis: Set[str], analyzers: Optional[Sequence[str]] = None,
+            progress_every: int = 50_000):
+    """Analyze the chat of one job, reporting progress to the job directory.
+
+    Runs in a worker process. The progress file lists the state of every
+    analyzer; the results are written to the result file and the uploaded
+    chat is deleted afterwards.
+    """
+    chat_file = os.path.join(job_dir, CHAT_FILE)
+    progress_file = os.path.join(job_dir, PROGRESS_FILE)
+    try:
+        service = ChatAnalysisService(chat_file, heart_emojis, use_mmap=True, analyzers=analyzers)
+        _write_json(progress_file, {"stage": "parsing", "analyzers": {}})
+        messages = service.parser.parse()
+
+        engine = AnalysisEngine(service.registry.create_analyzers(messages, heart_emojis, service.analyzer_names))
+        total = len(messages)
+        progress = {
+            "stage": "analyzing",
+            "messages_processed": 0,
+            "total_messages": total,
+            "analyzers": {a.name: {"status": "running", "progress": 0.0} for a in engine.analyzers}
+        }
+
+        # Feed the messages in batches and report after each one
+        engine.start()
+        remaining = iter(messages)
+        processed = 0
+        while processed < total:
+            batch = min(progress_every, total - processed)
+            engine.consume(islice(remaining, batch))
+            processed += batch
+            progress["messages_processed"] = processed
+            for state in progress["analyzers"].values():
+                state["progress"] = processed / total
+            _write_json(progress_file, progress)
+
+        progress["stage"] = "finalizing"
+        for state in progress["analyzers"].values():
+            state["status"] = "finalizing"
+            state["progress"] = 1.0
+        _write_json(progress_file, progress)
+
+        def finished(name):
+            progress["analyzers"][name]["status"] = "done"
+            _write_json(progress_file, progress)
+
+        results = engine.finish(on_finished=finished)
+        ChatExporter.export_to_json(results, os.path.join(job_dir, RESULT_FILE), compact=True)
+        progress["stage"] = "done"
+        _write_json(progress_file, progress)
+    finally:
+        if os.path.exists(chat_file):
+            os.unlink(chat_file)
+
+
+class JobManager:
+    """Runs chat analyses in the background with a pool of worker processes.
+
+    Each job gets a directory holding the upload, a progress file written by
+    the worker and, once done, the results. At most ``workers`` jobs run at a
+    time and at most ``max_pending`` may be queued or running; finished jobs
+    are removed ``ttl_seconds`` after they complete. If a worker process
+    dies, e.g. running out of memory, its jobs fail and a new pool is
+    started for the next ones.
+    """
+
+    def __init__(self, jobs_dir: str, heart_emojis: Set[str], workers: int = 2,
+                 max_pending: int = 16, ttl_seconds: float = 60 * 60):
+        self.jobs_dir = jobs_dir
+        self.heart_emojis = heart_emojis
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def submit(self, upload: BinaryIO, chunk_size: int = 1024 * 1024,
+               analyzers: Optional[Sequence[str]] = None) -> str:
+        """Store an uploaded chat and queue it for analysis. Returns the job ID.
+
+        ``analyzers`` selects the analyzers to run, by default all of them.
+        Of a zip export only the chat is stored. Raises ValueError if the
+        upload is a zip archive without a readable chat.
+        """
+        self.cleanup()
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise JobQueueFullError(f"Too many pending jobs ({pending}), try again later")
+            job_id = uuid.uuid4().hex
+            job_dir = os.path.join(self.jobs_dir, job_id)
+            # Reserve the slot before the upload is copied
+            self._jobs[job_id] = {"status": "queued", "dir": job_dir, "submitted_at": time.time(),
+                                  "finished_at": None, "error": None}
+
+        try:
+            os.makedirs(job_dir)
+            with open(os.path.join(job_dir, CHAT_FILE), 'wb') as f:
+                extract_chat(iter(lambda: upload.read(chunk_size), b''), f)
+        except Exception:
+            with self._lock:
+                del self._jobs[job_id]
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        try:
+            pool, future = self._submit(job_dir, analyzers)
+        except Exception:
+            with self._lock:
+                del self._jobs[job_id]
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        future.add_done_callback(lambda f: self._on_done(job_id, f, pool))
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status and per-analyzer progress of a job, or None if it is unknown."""
+        self.cleanup()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+
+        status = {"id": job_id, "status": job["status"], "submitted_at": job["submitted_at"],
+                  "finished_at": job["finished_at"]}
+        progress = self._read_json(os.path.join(job["dir"], PROGRESS_FILE))
+        if progress is not None:
+            if status["status"] == "queued":
+                status["status"] = "running"
+            status["progress"] = progress
+        if job["error"] is not None:
+            status["error"] = job["error"]
+        return status
+
+    def result_path(self, job_id: str) -> Optional[str]:
+        """Path of the results file of a finished job, or None if there is none."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job["status"] != "done":
+            return None
+        return os.path.join(job["dir"], RESULT_FILE)
+
+    def cleanup(self) -> int:
+        """Remove finished jobs older than the TTL and return how many were removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < cutoff]
+            dirs = {self._jobs.pop(job_id)["dir"] for job_id in expired}
+            known = {job["dir"] for job in self._jobs.values()}
+
+        # Directories left behind by an earlier process are removed once they go stale
+        for entry in os.scandir(self.jobs_dir):
+            try:
+                if entry.is_dir() and entry.path not in known and entry.stat().st_mtime < cutoff:
+                    dirs.add(entry.path)
+            except FileNotFoundError:
+                continue
+
+        for job_dir in dirs:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        return len(dirs)
+
+    def shutdown(self):
+        """Stop the worker pool, waiting for running jobs."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def _submit(self, job_dir: str, analyzers: Optional[Sequence[str]]):
+        """Queue a job, starting a pool if needed; returns the pool and the job's future.
+
+        A pool whose worker died since the last job finished cannot be used
+        any more, so it is replaced once.
+        """
+        for attempt in range(2):
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                pool = self._pool
+            try:
+                return pool, pool.submit(run_job, job_dir, self.heart_emojis, analyzers)
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                if attempt:
+                    raise
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Drop a broken pool, unless it was already replaced; the next job starts a new one."""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        pool.shutdown(wait=False)
+
+    def _on_done(self, job_id: str, future: Future, pool: ProcessPoolExecutor):
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._discard_pool(pool)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["status"] = "failed" if error is not None else "done"
+            job["error"] = str(error) if error is not None else None
+            job["finished_at"] = time.time()
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Any]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
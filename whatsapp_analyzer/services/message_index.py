@@ -0,0 +1,292 @@
+import math
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime
+from itertools import compress, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+from ..models.message_store import MessageStore, MessageView
+from .analyzers.base_analyzer import BaseAnalyzer
+from .analyzers.time_analyzer import TimeAnalyzer
+from .engine import AnalysisEngine
+from .instrumentation import Instrumentation
+from .timestamp_decoder import EPOCH_ORDINAL, SECONDS_PER_DAY
+
+SECONDS_PER_HOUR = 3600
+
+Bound = Union[int, float, date, datetime, None]
+
+
+def to_epoch(value: Bound) -> Optional[int]:
+    """Epoch seconds of a time given as epoch seconds, a date or a datetime.
+
+    Like the epochs of parsed messages, dates and datetimes are taken as the
+    chat's local wall-clock time; the time zone of an aware datetime is
+    ignored. Fractions of a second are rounded up.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return math.ceil((value.replace(tzinfo=None) - datetime(1970, 1, 1)).total_seconds())
+    if isinstance(value, date):
+        return (value.toordinal() - EPOCH_ORDINAL) * SECONDS_PER_DAY
+    return math.ceil(value)
+
+
+class MessageSelection:
+    """Messages of a MessageStore picked by their indexes, in the given order."""
+
+    def __init__(self, store: MessageStore, indexes: Sequence[int]):
+        self.store = store
+        self.indexes = indexes
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def __getitem__(self, index: int) -> MessageView:
+        return self.store[self.indexes[index]]
+
+    def __iter__(self) -> Iterator[MessageView]:
+        return map(self.store.__getitem__, self.indexes)
+
+
+class _Rollup:
+    """Message counts per sender in time buckets of ``width`` seconds.
+
+    Only buckets with messages are kept, in order of time. The entries of a
+    bucket list each of its senders once, in order of their first message in
+    the bucket, with the messages they sent in each hour of the bucket and
+    the seconds of the calls they reported.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self.slots = width // SECONDS_PER_HOUR  # hours per bucket
+        self.keys = array('q')  # epoch // width of each bucket
+        self.starts = array('q', [0])  # first entry of each bucket, and the end of the last
+        self.sender_ids = array('i')
+        self.counts = array('q')  # ``slots`` message counts per entry
+        self.call_seconds = array('q')
+
+    def add_bucket(self, key: int, entries: Dict[int, List[int]]):
+        """Add the next bucket from the message counts per hour, then the call seconds, per sender ID."""
+        self.keys.append(key)
+        for sender_id, counts in entries.items():
+            self.sender_ids.append(sender_id)
+            self.counts.extend(counts[:-1])
+            self.call_seconds.append(counts[-1])
+        self.starts.append(len(self.sender_ids))
+
+    def hours(self, bucket: int, entry: int) -> List[int]:
+        """Messages of an entry in each hour of its day."""
+        if self.slots == 24:
+            return self.counts[entry * 24:(entry + 1) * 24].tolist()
+        hours = [0] * 24
+        hours[self.keys[bucket] % 24] = self.counts[entry]
+        return hours
+
+    def buckets(self, first: int, last: int) -> range:
+        """Positions of the buckets from key ``first`` up to, not including, ``last``."""
+        return range(bisect_left(self.keys, first), bisect_left(self.keys, last))
+
+
+class MessageIndex:
+    """Time and sender index over a MessageStore for analyzing parts of a chat.
+
+    Messages are ordered by time, keeping the order of the chat for messages
+    sent in the same second, so the messages in a time range are found by
+    binary search; most exports are already in order and are not copied.
+    Senders are selected through a bitmap over their interned IDs.
+
+    ``TimeAnalyzer`` only counts messages, so it is answered from hourly and
+    daily rollups instead of from the messages themselves. Only the messages
+    before the first and after the last whole hour of a range are counted
+    one by one. The rollups are built the first time they are needed.
+    """
+
+    def __init__(self, store: MessageStore):
+        self.store = store
+        epochs = store.epochs
+        if all(a <= b for a, b in zip(epochs, islice(epochs, 1, None))):
+            # Positions in time order are the store's indexes
+            self.order = None
+            self.epochs = epochs
+            self.sender_ids = store.sender_ids
+        else:
+            self.order = array('q', sorted(range(len(epochs)), key=epochs.__getitem__))
+            self.epochs = array('q', map(epochs.__getitem__, self.order))
+            self.sender_ids = array('i', map(store.sender_ids.__getitem__, self.order))
+        self._sender_index = {sender: sender_id for sender_id, sender in enumerate(store.senders)}
+        self._hourly: Optional[_Rollup] = None
+        self._daily: Optional[_Rollup] = None
+        self._call_seconds: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def select(self, start: Bound = None, end: Bound = None,
+               senders: Optional[Iterable[str]] = None) -> MessageSelection:
+        """Messages sent from ``start`` up to, not including, ``end`` by any of ``senders``.
+
+        Omitted bounds are open and ``senders=None`` selects everyone;
+        senders that never wrote in the chat select nothing. The messages
+        are in order of time.
+        """
+        lo, hi = self._positions(start, end)
+        indexes = range(lo, hi) if self.order is None else self.order[lo:hi]
+        selected = self._selected(senders)
+        if selected is not None:
+            indexes = array('q', compress(indexes, map(selected.__getitem__, self.sender_ids[lo:hi])))
+        return MessageSelection(self.store, indexes)
+
+    def add_time_counts(self, analyzer: TimeAnalyzer, start: Bound = None, end: Bound = None,
+                        senders: Optional[Iterable[str]] = None):
+        """Add the messages ``select`` would return to a TimeAnalyzer, using the rollups."""
+        lo, hi = self._positions(start, end)
+        if lo >= hi:
+            return
+        selected = self._selected(senders)
+        first_hour = -(-self.epochs[lo] // SECONDS_PER_HOUR)
+        last_hour = (self.epochs[hi - 1] + 1) // SECONDS_PER_HOUR
+        if first_hour >= last_hour:
+            self._add_messages(analyzer, lo, hi, selected)
+            return
+
+        hourly, daily = self._rollups()
+        first_day = -(-first_hour // 24)
+        last_day = last_hour // 24
+        self._add_messages(analyzer, lo, self._position(first_hour * SECONDS_PER_HOUR), selected)
+        if first_day < last_day:
+            self._add_rollup(analyzer, hourly, first_hour, first_day * 24, selected)
+            self._add_rollup(analyzer, daily, first_day, last_day, selected)
+            self._add_rollup(analyzer, hourly, last_day * 24, last_hour, selected)
+        else:
+            self._add_rollup(analyzer, hourly, first_hour, last_hour, selected)
+        self._add_messages(analyzer, self._position(last_hour * SECONDS_PER_HOUR), hi, selected)
+
+    def analyze(self, analyzers: List[BaseAnalyzer], start: Bound = None, end: Bound = None,
+                senders: Optional[Iterable[str]] = None,
+                instrumentation: Optional[Instrumentation] = None,
+                messages: Optional[MessageSelection] = None) -> Dict[str, Any]:
+        """Run analyzers on the messages ``select`` returns and return their results.
+
+        TimeAnalyzers are answered from the rollups; the others are fed the
+        selected messages in one pass, which is only done if there are any.
+        ``messages`` can pass in what ``select`` already returned for the
+        same filters.
+        """
+        counted = [analyzer for analyzer in analyzers if isinstance(analyzer, TimeAnalyzer)]
+        engine = AnalysisEngine([analyzer for analyzer in analyzers if analyzer not in counted], instrumentation)
+        results = {}
+        if engine.analyzers:
+            results = engine.run(messages if messages is not None else self.select(start, end, senders))
+
+        for analyzer in counted:
+            analyzer.reset()
+            if instrumentation is None:
+                self.add_time_counts(analyzer, start, end, senders)
+                results[analyzer.name] = analyzer.finalize()
+            else:
+                with instrumentation.measure(analyzer.name):
+                    self.add_time_counts(analyzer, start, end, senders)
+                    results[analyzer.name] = analyzer.finalize()
+        return {analyzer.name: results[analyzer.name] for analyzer in analyzers}
+
+    def _position(self, epoch: int) -> int:
+        """Position in time order of the first message sent at or after ``epoch``."""
+        return bisect_left(self.epochs, epoch)
+
+    def _positions(self, start: Bound, end: Bound):
+        start, end = to_epoch(start), to_epoch(end)
+        lo = 0 if start is None else self._position(start)
+        hi = len(self.epochs) if end is None else self._position(end)
+        return lo, max(lo, hi)
+
+    def _selected(self, senders: Optional[Iterable[str]]) -> Optional[bytearray]:
+        """Bitmap of the selected sender IDs, or None to select everyone."""
+        if senders is None:
+            return None
+        selected = bytearray(len(self.store.senders))
+        for sender in senders:
+            sender_id = self._sender_index.get(sender)
+            if sender_id is not None:
+                selected[sender_id] = 1
+        return selected
+
+    def _add_messages(self, analyzer: TimeAnalyzer, lo: int, hi: int, selected: Optional[bytearray]):
+        """Add the messages at positions ``lo`` up to ``hi`` one by one."""
+        senders = self.store.senders
+        call_seconds = self._calls()
+        for position in range(lo, hi):
+            sender_id = self.sender_ids[position]
+            if selected is not None and not selected[sender_id]:
+                continue
+            days, seconds = divmod(self.epochs[position], SECONDS_PER_DAY)
+            hours = [0] * 24
+            hours[seconds // SECONDS_PER_HOUR] = 1
+            analyzer.add_counts(days, senders[sender_id], hours, call_seconds.get(position, 0))
+
+    def _add_rollup(self, analyzer: TimeAnalyzer, rollup: _Rollup, first: int, last: int,
+                    selected: Optional[bytearray]):
+        """Add the buckets of a rollup from key ``first`` up to ``last``."""
+        senders = self.store.senders
+        add_counts = analyzer.add_counts
+        for bucket in rollup.buckets(first, last):
+            day = rollup.keys[bucket] * rollup.width // SECONDS_PER_DAY
+            for entry in range(rollup.starts[bucket], rollup.starts[bucket + 1]):
+                sender_id = rollup.sender_ids[entry]
+                if selected is None or selected[sender_id]:
+                    add_counts(day, senders[sender_id], rollup.hours(bucket, entry), rollup.call_seconds[entry])
+
+    def _calls(self) -> Dict[int, int]:
+        """Seconds of the calls reported by messages, by position in time order."""
+        if self._call_seconds is None:
+            analyzer = TimeAnalyzer()
+            calls = {}
+            for index in self.store.candidates(TimeAnalyzer.call_marker):
+                text = self.store.text_at(index)
+                if 'call' in text.lower() and (seconds := analyzer.call_seconds(text)):
+                    calls[index] = seconds
+            if self.order is not None and calls:
+                calls = {position: calls[index] for position, index in enumerate(self.order) if index in calls}
+            self._call_seconds = calls
+        return self._call_seconds
+
+    def _rollups(self):
+        """The hourly and daily rollups, built from the messages on first use."""
+        if self._hourly is None:
+            call_seconds = self._calls()
+            hourly = _Rollup(SECONDS_PER_HOUR)
+            entries, current = {}, None
+            for position, (epoch, sender_id) in enumerate(zip(self.epochs, self.sender_ids)):
+                hour = epoch // SECONDS_PER_HOUR
+                if hour != current:
+                    if entries:
+                        hourly.add_bucket(current, entries)
+                    entries, current = {}, hour
+                entry = entries.get(sender_id)
+                if entry is None:
+                    entry = entries[sender_id] = [0, 0]
+                entry[0] += 1
+                if position in call_seconds:
+                    entry[1] += call_seconds[position]
+            if entries:
+                hourly.add_bucket(current, entries)
+
+            daily = _Rollup(SECONDS_PER_DAY)
+            entries, current = {}, None
+            for bucket, hour in enumerate(hourly.keys):
+                day = hour // 24
+                if day != current:
+                    if entries:
+                        daily.add_bucket(current, entries)
+                    entries, current = {}, day
+                for entry in range(hourly.starts[bucket], hourly.starts[bucket + 1]):
+                    counts = entries.get(hourly.sender_ids[entry])
+                    if counts is None:
+                        counts = entries[hourly.sender_ids[entry]] = [0] * 25
+                    counts[hour % 24] += hourly.counts[entry]
+                    counts[24] += hourly.call_seconds[entry]
+            if entries:
+                daily.add_bucket(current, entries)
+            self._hourly, self._daily = hourly, daily
+        return self._hourly, self._daily
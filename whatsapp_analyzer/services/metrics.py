@@ -0,0 +1,104 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Sequence
+
+# Bucket upper bounds of the histograms
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+THROUGHPUT_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+MEMORY_BUCKETS = tuple(float(1 << shift) for shift in range(16, 34, 2))  # 64 KiB to 4 GiB
+
+class Histogram:
+    """Cumulative histogram of observed values, split by a ``stage`` label."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Per stage: [count per bucket plus one for +Inf, sum, count]
+        self._series: Dict[str, list] = {}
+
+    def observe(self, stage: str, value: float):
+        series = self._series.get(stage)
+        if series is None:
+            series = self._series[stage] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for stage, (counts, total, count) in self._series.items():
+            label = _escape(stage)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{stage="{label}",le="{_format(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{stage="{label}"}} {_format(total)}')
+            lines.append(f'{self.name}_count{{stage="{label}"}} {count}')
+        return lines
+
+
+class AnalysisMetrics:
+    """Aggregates the ``_meta`` reports of analyses for the ``/metrics`` endpoint.
+
+    Every stage of every analysis, and the analysis as a whole under the
+    stage ``total``, is observed in histograms of wall time, CPU time,
+    throughput and, where memory was traced, peak memory. ``render`` returns
+    them in the Prometheus text format.
+    """
+
+    PREFIX = 'whatsapp_analyzer'
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.analyses = 0
+        self.wall_seconds = Histogram(f'{self.PREFIX}_stage_wall_seconds',
+                                      "Wall-clock time spent in each stage of an analysis.", DURATION_BUCKETS)
+        self.cpu_seconds = Histogram(f'{self.PREFIX}_stage_cpu_seconds',
+                                     "CPU time spent in each stage of an analysis.", DURATION_BUCKETS)
+        self.messages_per_second = Histogram(f'{self.PREFIX}_stage_messages_per_second',
+                                             "Messages processed per second of wall time in each stage.",
+                                             THROUGHPUT_BUCKETS)
+        self.peak_memory = Histogram(f'{self.PREFIX}_stage_peak_memory_bytes',
+                                     "Peak memory allocated by the analysis while each stage ran.",
+                                     MEMORY_BUCKETS)
+        self._histograms = (self.wall_seconds, self.cpu_seconds, self.messages_per_second, self.peak_memory)
+
+    def observe(self, meta: Dict[str, Any]):
+        """Add the ``_meta`` section of one analysis."""
+        with self._lock:
+            self.analyses += 1
+            self.wall_seconds.observe('total', meta['wall_seconds'])
+            self.cpu_seconds.observe('total', meta['cpu_seconds'])
+            if 'peak_memory_bytes' in meta:
+                self.peak_memory.observe('total', meta['peak_memory_bytes'])
+            for stage, stats in meta['stages'].items():
+                self.wall_seconds.observe(stage, stats['wall_seconds'])
+                self.cpu_seconds.observe(stage, stats['cpu_seconds'])
+                # Stages that only finalize their results process no messages
+                if stats['messages']:
+                    self.messages_per_second.observe(stage, stats['messages_per_second'])
+                if 'peak_memory_bytes' in stats:
+                    self.peak_memory.observe(stage, stats['peak_memory_bytes'])
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                f"# HELP {self.PREFIX}_analyses_total Analyses that were measured.",
+                f"# TYPE {self.PREFIX}_analyses_total counter",
+                f"{self.PREFIX}_analyses_total {self.analyses}",
+            ]
+            for histogram in self._histograms:
+                lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _format(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,99 @@
+import mmap
+import re
+from typing import Iterator, Optional, Tuple
+from ..models.message import Message
+from ..models.message_store import MessageStore
+from .parser import ChatParser
+from .zip_export import is_zip_export, open_export
+
+class MmapChatParser(ChatParser):
+    """Bytes-level parser that memory-maps the export file.
+
+    Lines are matched with a bytes regex directly against the mapped file, so
+    nothing is decoded up front. Timestamps are decoded from bytes into epoch
+    seconds, sender names are decoded once per distinct sender, and message
+    text is copied into the MessageStore as UTF-8 and only decoded when an
+    analyzer reads it.
+    """
+
+    _line_pattern = re.compile(rb'^\[(.*?)\] (.*?): (.*?)\r?$', re.MULTILINE)
+    _phone_change = b"changed their phone number"
+
+    def parse(self) -> MessageStore:
+        """Parse WhatsApp chat file and return the messages as a MessageStore."""
+        messages = MessageStore()
+        sender_ids = {}
+        append = messages.append_encoded
+        keep_timestamp = self._keeps('timestamp')
+        keep_text = self._keeps('message')
+
+        for timestamp, sender, message, epoch in self._iter_raw():
+            sender_id = sender_ids.get(sender)
+            if sender_id is None:
+                sender_id = sender_ids[sender] = messages.sender_id(sender.decode('utf-8'))
+            append(timestamp if keep_timestamp else b'', sender_id, message if keep_text else b'', epoch)
+
+        return messages
+
+    def iter_messages(self, start: Optional[int] = None, end: Optional[int] = None) -> Iterator[Message]:
+        """Parse WhatsApp chat file lazily, yielding one Message at a time.
+
+        ``start`` and ``end`` restrict parsing to a byte range whose bounds
+        are at line starts; by default the whole file after the first line is
+        parsed.
+        """
+        senders = {}
+        keep_timestamp = self._keeps('timestamp')
+        keep_text = self._keeps('message')
+        for timestamp, sender, message, epoch in self._iter_raw(start, end):
+            name = senders.get(sender)
+            if name is None:
+                name = senders[sender] = sender.decode('utf-8')
+            yield Message(timestamp.decode('utf-8') if keep_timestamp else '', name,
+                          message.decode('utf-8') if keep_text else '', epoch)
+
+    def _iter_raw(self, start: Optional[int] = None,
+                  end: Optional[int] = None) -> Iterator[Tuple[bytes, bytes, bytes, int]]:
+        """Yield the raw timestamp, sender and text bytes and the epoch of every message line."""
+        if is_zip_export(self.file_path):
+            # The chat of a zip export cannot be mapped, so it is decompressed into memory
+            with open_export(self.file_path) as file:
+                yield from self._match_buffer(file.read(), start, end)
+            return
+
+        with open(self.file_path, 'rb') as file:
+            try:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                return
+
+            with buffer:
+                yield from self._match_buffer(buffer, start, end)
+
+    def _match_buffer(self, buffer, start: Optional[int],
+                      end: Optional[int]) -> Iterator[Tuple[bytes, bytes, bytes, int]]:
+        """Same as ``_match_lines``, by default for everything after the first line."""
+        if start is None:
+            start = buffer.find(b'\n') + 1  # Skip first line
+            if start == 0:
+                return
+        if end is None:
+            end = len(buffer)
+        yield from self._match_lines(buffer, start, end)
+
+    def _match_lines(self, buffer, start: int, end: int) -> Iterator[Tuple[bytes, bytes, bytes, int]]:
+        """Yield the raw fields and the epoch of every message line in ``buffer[start:end]``."""
+        decode = self._decoder.decode_bytes
+        phone_change = self._phone_change
+
+        for match in self._line_pattern.finditer(buffer, start, end):
+            timestamp, sender, message = match.groups()
+            # Skip system messages about phone number changes
+            if phone_change not in message:
+                try:
+                    epoch = decode(timestamp)
+                except ValueError:
+                    # Not a message header, e.g. a bracketed continuation line
+                    continue
+                yield timestamp, sender, message, epoch
@@ -0,0 +1,127 @@
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from .analyzers import AnalyzerRegistry
+from .analyzers.base_analyzer import BaseAnalyzer
+from .engine import AnalysisEngine
+from .instrumentation import Instrumentation
+from .mmap_parser import MmapChatParser
+
+def split_ranges(file_path: str, chunks: int, start: Optional[int] = None,
+                 end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Split the export into byte ranges at line boundaries.
+
+    By default the whole file after its first line is split; ``start`` and
+    ``end`` (both at line starts) restrict the split to part of the file.
+    """
+    with open(file_path, 'rb') as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return []
+
+        with buffer:
+            size = len(buffer) if end is None else min(end, len(buffer))
+            if start is None:
+                start = buffer.find(b'\n') + 1  # Skip first line
+                if start == 0:
+                    return []
+            if start >= size:
+                return []
+
+            bounds = [start]
+            for i in range(1, chunks):
+                target = start + (size - start) * i // chunks
+                if target <= bounds[-1]:
+                    continue
+                # Move the boundary to the start of the next line
+                newline = buffer.find(b'\n', target - 1)
+                if newline == -1 or newline + 1 >= size:
+                    break
+                if newline + 1 > bounds[-1]:
+                    bounds.append(newline + 1)
+            bounds.append(size)
+
+    return list(zip(bounds, bounds[1:]))
+
+
+def analyze_range(file_path: str, start: int, end: int, registry: AnalyzerRegistry,
+                  heart_emojis: Set[str], names: Optional[Sequence[str]] = None) -> List[BaseAnalyzer]:
+    """Run the analyzers over one byte range and return them with their partial state."""
+    analyzers = registry.create_analyzers(None, heart_emojis, names)
+    engine = AnalysisEngine(analyzers)
+    engine.start()
+    parser = MmapChatParser(file_path, fields=registry.required_fields(names))
+    engine.consume(parser.iter_messages(start, end))
+    return analyzers
+
+
+def analyze_range_measured(file_path: str, start: int, end: int, registry: AnalyzerRegistry,
+                           heart_emojis: Set[str], names: Optional[Sequence[str]] = None,
+                           trace_memory: bool = False) -> Tuple[List[BaseAnalyzer], Instrumentation]:
+    """Like ``analyze_range``, also returning how long parsing and each analyzer took."""
+    instrumentation = Instrumentation(trace_memory)
+    instrumentation.start()
+    try:
+        analyzers = registry.create_analyzers(None, heart_emojis, names)
+        engine = AnalysisEngine(analyzers, instrumentation)
+        engine.start()
+        parser = MmapChatParser(file_path, fields=registry.required_fields(names))
+        engine.consume(instrumentation.timed('parse', parser.iter_messages(start, end)))
+    finally:
+        instrumentation.stop()
+    return analyzers, instrumentation
+
+
+def merge_ranges(engine: AnalysisEngine, file_path: str, ranges: List[Tuple[int, int]],
+                 registry: AnalyzerRegistry, heart_emojis: Set[str], workers: int = 1,
+                 names: Optional[Sequence[str]] = None):
+    """Analyze byte ranges and merge their states into the engine in file order.
+
+    With more than one worker the ranges are analyzed in a process pool. If
+    the engine is instrumented, the measurements of every range are added
+    to its instrumentation, so stage times add up over the workers.
+    """
+    instrumentation = engine.instrumentation
+    if instrumentation is None:
+        task, options = analyze_range, ()
+    else:
+        task, options = analyze_range_measured, (instrumentation.trace_memory,)
+
+    def merge(result):
+        if instrumentation is not None:
+            result, measured = result
+            instrumentation.merge(measured)
+        engine.merge(result)
+
+    if workers <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            merge(task(file_path, start, end, registry, heart_emojis, names, *options))
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        futures = [
+            pool.submit(task, file_path, start, end, registry, heart_emojis, names, *options)
+            for start, end in ranges
+        ]
+        for future in futures:
+            merge(future.result())
+
+
+def analyze_parallel(file_path: str, heart_emojis: Set[str], registry: AnalyzerRegistry,
+                     workers: int, names: Optional[Sequence[str]] = None,
+                     instrumentation: Optional[Instrumentation] = None) -> Dict[str, Any]:
+    """Analyze a chat export with a pool of worker processes.
+
+    The file is split into one byte range per worker. Each worker parses its
+    range and runs the analyzers on it, and the partial analyzer states are
+    then merged in file order, which gives the same results as a serial run.
+    """
+    engine = AnalysisEngine(registry.create_analyzers(None, heart_emojis, names), instrumentation)
+    if unsupported := engine.unsupported_for_streaming():
+        raise ValueError(f"Analyzers {unsupported} need the full message list and cannot run in parallel")
+
+    engine.start()
+    merge_ranges(engine, file_path, split_ranges(file_path, workers), registry, heart_emojis, workers, names)
+    return engine.finish()
@@ -0,0 +1,212 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+from ..models.message_store import MessageStore
+from .parser import ChatParser
+
+class ParseCache:
+    """On-disk cache of parsed chats, stored as binary MessageStore files.
+
+    An entry is keyed by a hash of the chat's content and the parser settings
+    (parser, date order and the fields kept), and is opened memory-mapped, so
+    an unchanged export is loaded without parsing or copying it. Small index
+    files map a file's identity (path, size and modification time) to its
+    entry, so the content only needs hashing when the file is new or has
+    changed; a copy or a re-export with the same content still finds the
+    entry through the hash.
+
+    The entries in ``cache_dir`` are kept under ``max_bytes`` in total by
+    deleting the least recently used ones.
+    """
+
+    VERSION = 1
+    HASH_BLOCK_SIZE = 1 << 20
+    SUFFIX = '.msgs'
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index_dir = os.path.join(cache_dir, 'index')
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self._index_dir, exist_ok=True)
+
+    def parse(self, parser: ChatParser) -> MessageStore:
+        """Return the parser's messages from the cache, parsing and caching them on a miss."""
+        messages, stat, content_hash = self._lookup(parser)
+        if messages is None:
+            messages = parser.parse()
+            self._store(parser, messages, stat, content_hash)
+        return messages
+
+    def load(self, parser: ChatParser) -> Optional[MessageStore]:
+        """Return the cached messages for the parser's file, or None on a miss."""
+        return self._lookup(parser)[0]
+
+    def _lookup(self, parser: ChatParser) -> Tuple[Optional[MessageStore], os.stat_result, str]:
+        """The cached messages, or None, with the file's stat and content hash from before the lookup."""
+        settings = self._settings(parser)
+        stat = os.stat(parser.file_path)
+        identity = self._identity_key(parser.file_path, stat, settings)
+        key = self._read_index(identity)
+        messages = self._open(key) if key is not None else None
+        content_hash = None
+        if messages is None:
+            content_hash = self._hash_file(parser.file_path)
+            key = self._entry_key(content_hash, settings)
+            messages = self._open(key)
+            if messages is not None:
+                self._write_index(identity, key)
+
+        with self._lock:
+            if messages is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return messages, stat, content_hash
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters and the size of the cached entries."""
+        entries = self._entries()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes
+            }
+
+    def evict(self) -> int:
+        """Delete the least recently used entries until the cache fits ``max_bytes``.
+
+        Index files pointing to entries that no longer exist are removed too.
+        Returns how many entries were deleted.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry_size for _, entry_size, _ in entries)
+        removed = 0
+        for path, entry_size, _ in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+        for entry in os.scandir(self._index_dir):
+            key = self._read_index(entry.name)
+            if key is None or not os.path.exists(self._entry_path(key)):
+                self._unlink(entry.path)
+        return removed
+
+    def _store(self, parser: ChatParser, messages: MessageStore, stat: os.stat_result, content_hash: str):
+        """Cache parsed messages, unless the file changed since it was hashed."""
+        after = os.stat(parser.file_path)
+        if (stat.st_size, stat.st_mtime_ns) != (after.st_size, after.st_mtime_ns):
+            return
+
+        settings = self._settings(parser)
+        key = self._entry_key(content_hash, settings)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                messages.write(f, {"content_hash": content_hash})
+                size = f.tell()
+            if size > self.max_bytes:
+                return
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            return
+        finally:
+            self._unlink(tmp_path)
+
+        self._write_index(self._identity_key(parser.file_path, stat, settings), key)
+        self.evict()
+
+    def _open(self, key: str) -> Optional[MessageStore]:
+        """Memory-map an entry and mark it as recently used; a damaged entry is deleted."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing, or empty, which cannot be mapped
+            return None
+        try:
+            messages = MessageStore.from_buffer(buffer)
+        except (ValueError, KeyError, TypeError):
+            # The map is closed once nothing refers to it any more
+            self._unlink(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return messages
+
+    def _settings(self, parser: ChatParser) -> str:
+        """What, besides the file's content, decides the parsed messages."""
+        fields = ','.join(sorted(parser.fields)) if parser.fields is not None else '*'
+        return f"{self.VERSION}|{type(parser).__name__}|{parser._decoder.dayfirst}|{fields}"
+
+    @staticmethod
+    def _identity_key(path: str, stat: os.stat_result, settings: str) -> str:
+        identity = f"{os.path.realpath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{settings}"
+        return hashlib.sha256(identity.encode('utf-8', 'surrogateescape')).hexdigest()
+
+    @staticmethod
+    def _entry_key(content_hash: str, settings: str) -> str:
+        return hashlib.sha256(f"{content_hash}|{settings}".encode('utf-8')).hexdigest()
+
+    @classmethod
+    def _hash_file(cls, path: str) -> str:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while block := f.read(cls.HASH_BLOCK_SIZE):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def _entries(self):
+        """(path, size, last used) of every cached entry."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _read_index(self, identity: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._index_dir, identity), 'r', encoding='ascii') as f:
+                return f.read().strip() or None
+        except (OSError, ValueError):
+            return None
+
+    def _write_index(self, identity: str, key: str):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='ascii') as f:
+                f.write(key)
+            os.replace(tmp_path, os.path.join(self._index_dir, identity))
+        except OSError:
+            self._unlink(tmp_path)
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
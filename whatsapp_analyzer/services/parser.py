@@ -1,25 +1,59 @@
+import io
 import re
-from typing import List
+from typing import Iterable, Iterator, Optional, Tuple
 from ..models.message import Message
+from ..models.message_store import MessageStore
+from .timestamp_decoder import TimestampDecoder
+from .zip_export import open_export
 
 class ChatParser:
-    """Parser for WhatsApp chat export files."""
-    
-    def __init__(self, file_path: str):
+    """Parser for WhatsApp chat export files.
+
+    ``fields`` limits which message fields are kept; the timestamp text and
+    the message text are left empty unless listed. By default all are kept.
+    The file may also be a zip export, whose chat is read without extracting
+    it or its media.
+    """
+
+    def __init__(self, file_path: str, dayfirst: bool = True, fields: Optional[Iterable[str]] = None):
         self.file_path = file_path
+        self.fields = frozenset(fields) if fields is not None else None
         self._pattern = re.compile(r'\[(.*?)\] (.*?): (.*)')
+        self._decoder = TimestampDecoder(dayfirst)
+
+    def parse(self) -> MessageStore:
+        """Parse WhatsApp chat file and return the messages as a MessageStore."""
+        messages = MessageStore()
+        for timestamp, sender, message, epoch in self._iter_fields():
+            messages.append(timestamp, sender, message, epoch)
+        return messages
+
+    def iter_messages(self) -> Iterator[Message]:
+        """Parse WhatsApp chat file lazily, yielding one Message at a time."""
+        for timestamp, sender, message, epoch in self._iter_fields():
+            yield Message(timestamp, sender, message, epoch)
+
+    def _keeps(self, field: str) -> bool:
+        """Whether a message field is kept by the parser."""
+        return self.fields is None or field in self.fields
+
+    def _iter_fields(self) -> Iterator[Tuple[str, str, str, int]]:
+        """Yield the timestamp, sender, text and epoch of every message line."""
+        decode = self._decoder.decode
+        keep_timestamp = self._keeps('timestamp')
+        keep_text = self._keeps('message')
 
-    def parse(self) -> List[Message]:
-        """Parse WhatsApp chat file and return list of Message objects."""
-        messages = []
-        
-        with open(self.file_path, 'r', encoding='utf-8') as file:
-            next(file)  # Skip first line
+        with io.TextIOWrapper(open_export(self.file_path), encoding='utf-8') as file:
+            next(file, None)  # Skip first line
             for line in file:
                 if match := self._pattern.match(line):
                     timestamp, sender, message = match.groups()
                     # Skip system messages about phone number changes
                     if "changed their phone number" not in message:
-                        messages.append(Message(timestamp, sender, message))
-        
-        return messages 
\ No newline at end of file
+                        try:
+                            epoch = decode(timestamp)
+                        except ValueError:
+                            # Not a message header, e.g. a bracketed continuation line
+                            continue
+                        yield (timestamp if keep_timestamp else '', sender,
+                               message if keep_text else '', epoch)
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+class ResultCache:
+    """Two-tier cache for serialized analysis results.
+
+    Entries are keyed by ``make_key`` from a hash of the chat file and the
+    analysis settings, and hold the result as encoded bytes so a hit can be
+    returned without serializing again. The in-memory tier is an LRU bounded
+    by the total size of its values. If ``cache_dir`` is given, entries are
+    also written there and expire ``ttl_seconds`` after they were stored.
+    Expired entries are deleted by ``put`` every ``ttl_seconds / 10`` at
+    most, so the directory stays bounded in a long-running server.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, cache_dir: Optional[str] = None,
+                 ttl_seconds: float = 24 * 60 * 60):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # When ``put`` next deletes expired entries from the disk tier
+        self._next_purge = 0.0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash: str, analyzer_names: Iterable[str], heart_emojis: Iterable[str],
+                 version: str = '') -> str:
+        """Build a cache key from the file hash, the analyzers and the heart emojis."""
+        key = hashlib.sha256()
+        for part in (version, content_hash, ','.join(analyzer_names), ','.join(sorted(heart_emojis))):
+            key.update(part.encode('utf-8'))
+            key.update(b'\0')
+        return key.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for the key, or None on a miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, value)
+        return value
+
+    def put(self, key: str, value: bytes):
+        """Cache a value in memory and, if enabled, on disk."""
+        with self._lock:
+            self._store(key, value)
+            now = time.time()
+            purge = self.cache_dir and now >= self._next_purge
+            if purge:
+                self._next_purge = now + self.ttl_seconds / 10
+        if self.cache_dir:
+            self._write_disk(key, value)
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete expired entries from the disk tier and return how many were removed.
+
+        Temporary files left behind by interrupted writes are deleted once
+        they are as old.
+        """
+        if not self.cache_dir:
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(('.json', '.tmp')):
+                continue
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters and the size of the in-memory tier."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes
+            }
+
+    def _store(self, key: str, value: bytes):
+        """Insert into the LRU tier and evict the least recently used entries. Needs the lock."""
+        if len(value) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        """Read an entry from the disk tier, deleting it if it has expired."""
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if os.path.getmtime(path) < time.time() - self.ttl_seconds:
+                os.unlink(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, value: bytes):
+        """Write an entry to the disk tier atomically."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
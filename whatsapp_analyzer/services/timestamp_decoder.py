@@ -0,0 +1,96 @@
+import re
+from datetime import date
+from typing import Dict
+
+SECONDS_PER_DAY = 86400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class TimestampDecoder:
+    """Decodes WhatsApp timestamps into epoch seconds.
+
+    Timestamps look like ``15/03/2023, 10:15:32 PM`` (the space before AM/PM is
+    often a narrow no-break space) or ``15/03/2023, 22:15:32``. The wall-clock
+    time is kept as-is, so the result counts seconds since 1970-01-01 00:00 in
+    the chat's local time. Dates are memoized because a whole day of messages
+    shares the same date prefix; the time of day is computed arithmetically.
+    """
+
+    _date_separator = re.compile(r'[/.\-]')
+    _date_separator_bytes = re.compile(rb'[/.\-]')
+    _narrow_space_bytes = '\u202f'.encode('utf-8')
+
+    def __init__(self, dayfirst: bool = True):
+        self.dayfirst = dayfirst
+        self._day_cache: Dict[str, int] = {}
+        self._day_cache_bytes: Dict[bytes, int] = {}
+
+    def decode(self, timestamp: str) -> int:
+        """Return the epoch seconds of a timestamp, raising ValueError if it is invalid."""
+        date_part, _, time_part = timestamp.partition(',')
+        days = self._day_cache.get(date_part)
+        if days is None:
+            days = self._decode_date(date_part, self._date_separator)
+            self._day_cache[date_part] = days
+
+        time_part = time_part.strip()
+        suffix = time_part[-2:].upper()
+        if suffix == 'AM' or suffix == 'PM':
+            seconds = self._decode_time(time_part[:-2].rstrip().split(':'), suffix == 'PM')
+        else:
+            seconds = self._decode_time(time_part.split(':'), None)
+        return days * SECONDS_PER_DAY + seconds
+
+    def decode_bytes(self, timestamp: bytes) -> int:
+        """Same as ``decode`` for a UTF-8 encoded timestamp, without decoding it to str."""
+        date_part, _, time_part = timestamp.partition(b',')
+        days = self._day_cache_bytes.get(date_part)
+        if days is None:
+            days = self._decode_date(date_part, self._date_separator_bytes)
+            self._day_cache_bytes[date_part] = days
+
+        time_part = time_part.replace(self._narrow_space_bytes, b' ').strip()
+        suffix = time_part[-2:].upper()
+        if suffix == b'AM' or suffix == b'PM':
+            seconds = self._decode_time(time_part[:-2].rstrip().split(b':'), suffix == b'PM')
+        else:
+            seconds = self._decode_time(time_part.split(b':'), None)
+        return days * SECONDS_PER_DAY + seconds
+
+    def _decode_date(self, date_part, separator) -> int:
+        """Convert a date to days since the epoch."""
+        fields = separator.split(date_part.strip())
+        if len(fields) != 3:
+            raise ValueError(f"Invalid date: {date_part!r}")
+
+        if len(fields[0]) == 4:
+            year, month, day = (int(field) for field in fields)
+        else:
+            first, second, year = (int(field) for field in fields)
+            if len(fields[2]) == 2:
+                year += 2000
+            day, month = (first, second) if self.dayfirst else (second, first)
+            # Fall back to the other order when the preferred one cannot be a date
+            if month > 12 >= day:
+                day, month = month, day
+
+        return date(year, month, day).toordinal() - EPOCH_ORDINAL
+
+    def _decode_time(self, fields, pm) -> int:
+        """Convert hour, minute and optional second fields to seconds since midnight.
+
+        ``pm`` is None for 24-hour times, otherwise whether the time is PM.
+        """
+        if not 2 <= len(fields) <= 3:
+            raise ValueError(f"Invalid time: {fields!r}")
+
+        hour = int(fields[0])
+        minute = int(fields[1])
+        second = int(fields[2]) if len(fields) == 3 else 0
+        if pm is not None:
+            if not 1 <= hour <= 12:
+                raise ValueError(f"Invalid time: {fields!r}")
+            hour = hour % 12 + (12 if pm else 0)
+        if not (0 <= hour <= 23 and 0 <= minute <= 59 and 0 <= second <= 59):
+            raise ValueError(f"Invalid time: {fields!r}")
+
+        return hour * 3600 + minute * 60 + second
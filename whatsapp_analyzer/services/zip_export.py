@@ -0,0 +1,237 @@
+import struct
+import zipfile
+import zlib
+from typing import BinaryIO, Iterable, List, Optional
+
+ZIP_MAGIC = b'PK\x03\x04'
+# Signatures of the records that follow the last member of an archive
+_END_SIGNATURES = (b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06', b'PK\x06\x07')
+_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+_ZIP64_EXTRA = 0x0001
+_STORED, _DEFLATED = 0, 8
+
+
+def is_chat_member(name: str) -> bool:
+    """Whether a member of a zip export is the chat text.
+
+    iOS names it ``_chat.txt`` and Android ``WhatsApp Chat with <name>.txt``;
+    text documents sent in the chat keep their own names.
+    """
+    base = name.rsplit('/', 1)[-1]
+    return base == '_chat.txt' or (base.startswith('WhatsApp Chat') and base.endswith('.txt'))
+
+
+def is_zip_export(path: str) -> bool:
+    """Whether a file is a zip archive rather than a plain chat export."""
+    with open(path, 'rb') as file:
+        return file.read(len(ZIP_MAGIC)) == ZIP_MAGIC
+
+
+def open_export(path: str) -> BinaryIO:
+    """Open the chat text of an export for binary reading.
+
+    The chat member of a zip export is decompressed while it is read; the
+    media next to it are never touched.
+    """
+    if not is_zip_export(path):
+        return open(path, 'rb')
+    archive = zipfile.ZipFile(path)
+    member = next((name for name in archive.namelist() if is_chat_member(name)), None)
+    if member is None:
+        archive.close()
+        raise ValueError("The zip archive contains no WhatsApp chat")
+    # The archive file stays open until the member is closed
+    return archive.open(member)
+
+
+class ChatTextReader:
+    """Pulls the chat text out of an uploaded export as it streams in.
+
+    A plain export is passed through. A zip export is read member by member
+    from its local headers, so no seeking is needed: the chat member is
+    decompressed, media are skipped without being decompressed or stored
+    where the archive records their size, and everything after the chat is
+    ignored. The CRC of the chat is checked.
+    """
+
+    _local_header = struct.Struct('<4sHHHHHIIIHH')
+
+    def __init__(self):
+        self.is_zip: Optional[bool] = None
+        self.member: Optional[str] = None
+        self.done = False
+        self._ended = False
+        self._pending = bytearray()
+        self._chunks: List[bytes] = []
+        self._entry = None
+        self._state = 'header'
+
+    def write(self, data: bytes) -> List[bytes]:
+        """Read part of the upload and return the chat text it contained."""
+        if self.is_zip is None:
+            self._pending += data
+            if len(self._pending) < len(ZIP_MAGIC):
+                return []
+            self.is_zip = self._pending.startswith(ZIP_MAGIC)
+            if not self.is_zip:
+                data, self._pending = bytes(self._pending), bytearray()
+                return [data]
+        elif not self.is_zip:
+            return [data] if data else []
+        elif not self.done:
+            self._pending += data
+
+        try:
+            while not self.done and self._step():
+                pass
+        except zlib.error as e:
+            raise ValueError(f"The zip archive is damaged ({e})") from None
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def finalize(self) -> List[bytes]:
+        """Return any remaining chat text; raises ValueError if a zip export had no complete chat."""
+        if self.is_zip is None:
+            # Too short to be a zip archive
+            self.is_zip = False
+            return [bytes(self._pending)] if self._pending else []
+        if self.is_zip and not self.done:
+            if self.member is None and self._ended:
+                raise ValueError("The zip archive contains no WhatsApp chat")
+            raise ValueError("The zip archive ends before the end of the chat")
+        return []
+
+    def _step(self) -> bool:
+        """Process what the pending bytes allow in the current state; False if more bytes are needed."""
+        pending = self._pending
+        if self._state == 'header':
+            if len(pending) < 4:
+                return False
+            if pending[:4] in _END_SIGNATURES:
+                # No more members; the chat was not among them
+                self._ended = True
+                self._pending = bytearray()
+                return False
+            if pending[:4] != ZIP_MAGIC:
+                raise ValueError("The zip archive is damaged")
+            if len(pending) < self._local_header.size:
+                return False
+            (_, _, flags, method, _, _, crc, compressed_size, _, name_length,
+             extra_length) = self._local_header.unpack_from(pending)
+            header_end = self._local_header.size + name_length + extra_length
+            if len(pending) < header_end:
+                return False
+
+            name = bytes(pending[self._local_header.size:self._local_header.size + name_length])
+            name = name.decode('utf-8' if flags & 0x800 else 'cp437')
+            extra = bytes(pending[header_end - extra_length:header_end])
+            zip64 = self._zip64_sizes(extra)
+            if zip64 is not None and compressed_size == 0xFFFFFFFF:
+                compressed_size = zip64
+            is_chat = self.member is None and is_chat_member(name)
+            if is_chat:
+                self.member = name
+                if flags & 0x1:
+                    raise ValueError("The chat in the zip archive is encrypted")
+                if method not in (_STORED, _DEFLATED):
+                    raise ValueError(f"The chat in the zip archive uses unsupported compression {method}")
+            # With a data descriptor, the size only follows the data, so the
+            # end of the member is found by decompressing it
+            sized = not flags & 0x8
+            if not sized and method != _DEFLATED:
+                raise ValueError(f"Cannot find the end of '{name}' in the zip archive without its size")
+            self._entry = {
+                "chat": is_chat,
+                "method": method,
+                "remaining": compressed_size,
+                "sized": sized,
+                "crc": crc,
+                "zip64": zip64 is not None,
+                "inflater": zlib.decompressobj(-15) if method == _DEFLATED and (is_chat or not sized) else None,
+                "checksum": 0,
+            }
+            del pending[:header_end]
+            self._state = 'data'
+            return True
+
+        entry = self._entry
+        if self._state == 'data':
+            if entry["sized"]:
+                size = min(entry["remaining"], len(pending))
+                if entry["chat"]:
+                    data = bytes(pending[:size])
+                    self._emit(entry["inflater"].decompress(data) if entry["inflater"] else data)
+                del pending[:size]
+                entry["remaining"] -= size
+                if entry["remaining"]:
+                    return False
+                if entry["inflater"] is not None:
+                    self._emit(entry["inflater"].flush())
+                    if not entry["inflater"].eof:
+                        raise ValueError("The chat in the zip archive is damaged")
+                return self._end_entry(entry["crc"])
+
+            if not pending:
+                return False
+            inflater = entry["inflater"]
+            data = inflater.decompress(bytes(pending))
+            if entry["chat"]:
+                self._emit(data)
+            if not inflater.eof:
+                self._pending = bytearray()
+                return False
+            self._pending = bytearray(inflater.unused_data)
+            self._state = 'descriptor'
+            return True
+
+        # The data descriptor: an optional signature, the CRC and both sizes
+        length = 4 + (16 if entry["zip64"] else 8)
+        if len(pending) < 4:
+            return False
+        if pending[:4] == _DESCRIPTOR_SIGNATURE:
+            length += 4
+        if len(pending) < length:
+            return False
+        crc, = struct.unpack_from('<I', pending, length - (20 if entry["zip64"] else 12))
+        del pending[:length]
+        return self._end_entry(crc)
+
+    def _emit(self, data: bytes):
+        if data:
+            self._chunks.append(data)
+            self._entry["checksum"] = zlib.crc32(data, self._entry["checksum"])
+
+    def _end_entry(self, crc: int) -> bool:
+        if self._entry["chat"]:
+            if self._entry["checksum"] != crc:
+                raise ValueError("The chat in the zip archive is damaged (CRC mismatch)")
+            # Nothing after the chat is needed
+            self.done = True
+            self._pending = bytearray()
+        self._entry = None
+        self._state = 'header'
+        return not self.done
+
+    @staticmethod
+    def _zip64_sizes(extra: bytes) -> Optional[int]:
+        """The compressed size from a zip64 extra field, or None if there is none."""
+        position = 0
+        while position + 4 <= len(extra):
+            field, length = struct.unpack_from('<HH', extra, position)
+            if field == _ZIP64_EXTRA and length >= 16:
+                # Uncompressed size, then compressed size
+                return struct.unpack_from('<Q', extra, position + 12)[0]
+            position += 4 + length
+        return None
+
+
+def extract_chat(chunks: Iterable[bytes], file: BinaryIO) -> int:
+    """Write the chat text of an export given in chunks to a binary file and return its size."""
+    reader = ChatTextReader()
+    size = 0
+    for chunk in chunks:
+        for data in reader.write(chunk):
+            size += file.write(data)
+    for data in reader.finalize():
+        size += file.write(data)
+    return size